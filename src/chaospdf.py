@@ -4,37 +4,105 @@
  (c) 2023 Akram Radwan
  Contains code for image recovery with PyMuPDF by (c) 2018 Jorj X. McKie
  
+ time for the startup profile
+ sys for the output of the startup profile
+ signal for stopping the watch mode with Ctrl+C
+ json for the JSON Lines output of the pipe mode
+ re for checking page ranges and shards
  argparse for parsing the command line arguments
  pathlib for accessing files
  logging for handling the log file
  logger for log file configuration
  pdffiles for handling PDF files and file locations
+ config for a general program configuration
+ 
+ Imported when needed to keep the startup fast:
  fitzdoc for handling PDF documents with PyMuPDF
  outfile for output file handling
- config for a general program configuration
+ streamwriter for waiting for compressed output files
  tui for the text menu
+ multiprocessing and concurrent.futures for the worker pool of the watch mode
+ watcher for finding new files in the watch mode
+ service for the HTTP extraction service
+ supervisor for processing documents with time and memory limits
+ scheduler for parallel batches, longest documents first
+ workqueue for shards and the work queue shared by several nodes
 """
+import time
+STARTUP_BEGIN = time.perf_counter()
+import sys
+import signal
+import json
+import re
 import argparse
 from pathlib import Path
 import logging
-import logging.config
 from logger import Logger
 from pdffiles import PDFFiles
-from fitzdoc import Fitzdoc
-from outfile import Outfile
 from config import Config
-from tui import TUI
+
+startup_marks = [('imports', time.perf_counter())]  # Stages of the startup with time stamps
+
+
+def mark_startup(stage:str):
+    """
+    mark_startup records the time stamp when a stage of the startup is finished.
+
+    :param stage: Name of the stage
+    :type stage: str
+    """
+    startup_marks.append((stage, time.perf_counter()))
+
+
+def print_startup_profile():
+    """
+    print_startup_profile prints the duration of each startup stage and the total 
+    time from the start of the program until the first page is touched.
+    The time for starting the Python interpreter itself is not included.
+    """
+    print('\nStartup profile', file=sys.stderr)
+    previous = STARTUP_BEGIN
+    for stage, timestamp in startup_marks:
+        print(f'  {stage:<24}{(timestamp-previous)*1000:8.1f} ms', file=sys.stderr)
+        previous = timestamp
+    print(f'  {"total":<24}{(previous-STARTUP_BEGIN)*1000:8.1f} ms\n', file=sys.stderr)
 
 
 def main(args):
+    output = sys.stdout
+    if args.source == '-':
+        # stdout only carries the JSON Lines, all messages go to stderr
+        sys.stdout = sys.stderr
     print('ChaosPDF extraction tool version 0.2.1')
     print('Copyright (c) 2023  Akram Radwan')
+    mark_startup('arguments')
     # Initialize logging
-    cfg = Config()
+    cfg = Config(read_file=False)  # evaluate_args reads the configuration file
     cfg.evaluate_args(args)
+    if cfg.cfg.fitz.pages.ranges:
+        # Page ranges from the configuration file are not checked by argparse
+        try:
+            page_ranges(cfg.cfg.fitz.pages.ranges)
+        except argparse.ArgumentTypeError as err:
+            print(f'Error: {err}')
+            return 2
+    if args.source == '-':
+        cfg.cfg.config.log_stream = 'stderr'
+    mark_startup('configuration')
     log = Logger(cfg)  # Initialization is necessary, might not be needed to assign to variable, though
     mainlog = logging.getLogger('main')
+    mark_startup('logging')
     mainlog.info('Start extraction session')
+    if args.source == '-':
+        return process_stream(cfg, args, output)
+    if args.serve and not cfg.cfg.config.interactive:
+        from service import ExtractionService
+        ExtractionService(cfg).run(import_pymupdf)
+        return
+    if args.watch and not cfg.cfg.config.interactive:
+        # The watcher scans the input directories itself
+        watch(cfg)
+        return
     files = PDFFiles(cfg)
     for folder in cfg.cfg.input.input_dirs:
         if Path(folder).exists():
@@ -42,43 +110,520 @@ def main(args):
             files.search_files()
         else:
             mainlog.error('Cannot find directory %s', folder)
+    if cfg.cfg.batch.shard:
+        select_shard(cfg, files)
+    mark_startup('file search')
     if cfg.cfg.config.interactive:
+        from tui import TUI
         if not TUI(cfg).tui():
             print('\nNo files processed\n')
         return
     print('If you see error messages, check the log file for more context')
+    if cfg.cfg.fitz.text.tier == 'fast' and cfg.cfg.fitz.export.write_html:
+        mainlog.warning('The fast extraction tier does not create HTML, ' +
+                        'only plain text is written')
     # config.print_config()
-    for file in files.filelist:
-        doc = Fitzdoc(file, cfg)
-        out = Outfile(file, cfg)
-        # Page offset
-        if cfg.cfg.fitz.text.detect_page_offset:
-            offset = doc.detect_page_offset()
-        else:
-            offset = cfg.cfg.fitz.text.page_offset
-        # Extract HTML and text
-        if cfg.cfg.fitz.text.page_separator:
-            doc.process_pages_separately(offset)
-        else:
-            doc.process_pages(offset)
-        # Write HTML and text files
-        if cfg.cfg.fitz.export.write_html:
-            out.save_text(doc.html, 'html')
-        if cfg.cfg.fitz.export.write_text:
-            out.save_text(doc.text, 'txt')
-        if cfg.cfg.fitz.export.write_toc:
-            out.save_text(doc.process_toc(offset), 'toc.txt')
-        # Write images
-        if cfg.cfg.fitz.export.write_all_images:
-            doc.extract_images()
+    if not files.filelist:
+        mainlog.warning('No PDF files found')
+        if args.startup_profile:
+            print_startup_profile()
+        return
+    from outfile import corpus_writer
+    from streamwriter import wait_for_writers
+    import_pymupdf()
+    mark_startup('PyMuPDF import')
+    if cfg.cfg.batch.queue_dir and (cfg.cfg.batch.supervised or cfg.cfg.batch.parallel):
+        mainlog.warning('The work queue is not used with --supervised or --parallel')
+    if cfg.cfg.batch.supervised:
+        supervise(cfg, files.filelist)
+        return
+    if cfg.cfg.batch.parallel:
+        schedule(cfg, files.filelist)
+        return
+    corpus = corpus_writer(cfg) if cfg.cfg.fitz.export.write_corpus else None
+    if cfg.cfg.batch.queue_dir:
+        process_queue(cfg, files.filelist, corpus)
+    else:
+        for file in files.filelist:
+            opened = None
+            if args.startup_profile and file == files.filelist[0]:
+                def opened():
+                    mark_startup('first document opened')
+                    print_startup_profile()
+            process_document(file, cfg, corpus, opened)
+    if corpus:
+        corpus.close()
+    if not wait_for_writers():
+        print('Error writing compressed files, check the log file')
     mainlog.info('End extraction session')
     # Cleanup log
 
+def process_document(file:Path, cfg:Config, corpus=None, opened=None, parts:int=0):
+    """
+    process_document extracts text, HTML, TOC and images of a single PDF file 
+    and writes all output files. The pages of a document that was split into 
+    parts are taken from the checkpoints of the chunks.
+
+    :param file: Path of the PDF file
+    :type file: Path
+    :param cfg: Program configuration or a snapshot of it
+    :type cfg: Config
+    :param corpus: CorpusWriter or CorpusClient for the corpus database or None
+    :type corpus: CorpusWriter
+    :param opened: Function that is called when the document is opened
+    :type opened: Callable
+    :param parts: Number of chunks processed by process_chunk_worker
+    :type parts: int
+    """
+    from fitzdoc import Fitzdoc
+    from outfile import Outfile
+    mainlog = logging.getLogger('main')
+    settings = cfg.snapshot()
+    doc = Fitzdoc(file, settings)
+    if doc.encryption:
+        return
+    if not doc.selected_pages:
+        mainlog.warning('No pages selected in "%s", skipping the document', file)
+        return
+    out = Outfile(file, settings)
+    out.record_manifest(file)
+    if opened:
+        opened()
+    # Resume an interrupted document with the page offset and the repeating
+    # text of the first run
+    checkpoint = out.checkpoint(file) if settings.batch.checkpoint or parts else None
+    chunks = [out.checkpoint(file, part) for part in range(parts)]
+    merged = [checkpoint.merge(chunk) for chunk in chunks]
+    if not all(merged):
+        mainlog.warning('%d of %d chunks of "%s" are missing, processing their pages again',
+                        merged.count(False), parts, file)
+    if checkpoint and (checkpoint.resumed or any(merged)):
+        offset = checkpoint.page_offset
+        doc.repeating_text_to_remove = list(checkpoint.repeating_text)
+    elif settings.fitz.text.detect_page_offset:
+        offset = doc.detect_page_offset()
+    else:
+        offset = settings.fitz.text.page_offset
+    if checkpoint:
+        out.create_directory()
+        checkpoint.start(offset, doc.repeating_text_to_remove)
+        doc.checkpoint = checkpoint
+    # Extract HTML and text, stream the pages into the JSON Lines file
+    # and the corpus database. Restored pages are written again, that the
+    # JSON Lines file is never appended to when a checkpoint is used.
+    append = settings.fitz.export.append_jsonl and checkpoint is None
+    jsonl = out.jsonl_writer(append) if settings.fitz.export.write_jsonl else None
+    sinks = [jsonl.write] if jsonl else []
+    if corpus:
+        # Files in different directories can have the same name
+        path = str(Path(file).absolute())
+        corpus.add_document(out.basename, path, doc.doc.metadata, doc.doc.get_toc())
+        sinks.append(corpus.sink(path))
+    def sink(result):
+        for page_sink in sinks:
+            page_sink(result)
+    try:
+        if settings.fitz.text.page_separator:
+            doc.process_pages_separately(offset, sink if sinks else None)
+        else:
+            doc.process_pages(offset, sink if sinks else None)
+    finally:
+        if jsonl:
+            jsonl.close()
+        if checkpoint:
+            checkpoint.close()
+    # Write HTML and text files
+    if settings.fitz.export.write_html and settings.fitz.text.tier != 'fast':
+        out.save_text(doc.html, 'html')
+    if settings.fitz.export.write_text:
+        out.save_text(doc.text, 'txt')
+    if settings.fitz.export.write_toc:
+        out.save_text(doc.process_toc(offset), 'toc.txt')
+    # Write images
+    if settings.fitz.export.write_all_images:
+        doc.extract_images()
+    if checkpoint:
+        checkpoint.finish()
+        for chunk in chunks:
+            chunk.finish()
+
+
+def process_stream(cfg:Config, args, output):
+    """
+    process_stream reads a PDF file from stdin and writes one JSON record per 
+    page to the output. Images are only written if an image directory is given.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    :param args: Command line arguments
+    :type args: argparse.Namespace
+    :param output: Stream for the JSON Lines, usually the original stdout
+    :type output: io.TextIOBase
+    :return: Exit code, 0 on success
+    :rtype: int
+    """
+    from fitzdoc import Fitzdoc
+    from streamwriter import wait_for_writers
+    mainlog = logging.getLogger('main')
+    if args.image_dir:
+        cfg.cfg.fitz.export.output_dir = str(Path(args.image_dir).absolute())
+        cfg.cfg.fitz.export.use_pdf_output_dir = False
+    settings = cfg.snapshot()
+    data = sys.stdin.buffer.read()
+    if not data:
+        mainlog.error('No PDF file on stdin')
+        return 1
+    try:
+        doc = Fitzdoc(data, settings, args.doc_id)
+    except RuntimeError as err:
+        mainlog.error('Cannot open the PDF file from stdin: %s', err)
+        return 1
+    if doc.encryption:
+        return 1
+    if not doc.selected_pages:
+        mainlog.warning('No pages selected in the PDF file from stdin')
+        return 0
+    doc.collect_image_xrefs = True
+    if settings.fitz.text.detect_page_offset:
+        offset = doc.detect_page_offset()
+    else:
+        offset = settings.fitz.text.page_offset
+    def sink(result):
+        output.write(json.dumps(result.to_record(args.doc_id), ensure_ascii=False) + '\n')
+    try:
+        if settings.fitz.text.page_separator:
+            doc.process_pages_separately(offset, sink)
+        else:
+            doc.process_pages(offset, sink)
+        output.flush()
+    except BrokenPipeError:
+        # The reader of the pipe stopped, e.g. head
+        return 1
+    if args.image_dir and settings.fitz.export.write_all_images:
+        doc.extract_images()
+        if not wait_for_writers():
+            return 1
+    return 0
+
+
+def select_shard(cfg:Config, files:PDFFiles):
+    """
+    select_shard keeps only the files of the shard of this node. The shards 
+    are computed from the paths relative to the input directories, that all 
+    nodes get the same partition.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    :param files: Files found in the input directories
+    :type files: PDFFiles
+    """
+    from workqueue import relative_key, in_shard
+    mainlog = logging.getLogger('main')
+    index, count = (int(value) for value in cfg.cfg.batch.shard.split('/'))
+    roots = cfg.cfg.input.input_dirs
+    selected = [file for file in files.filelist
+                if in_shard(relative_key(file, roots), index, count)]
+    mainlog.info('Shard %d/%d: processing %d of %d files',
+                 index, count, len(selected), len(files.filelist))
+    files.filelist = selected
+
+
+def process_queue(cfg:Config, filelist:list, corpus=None):
+    """
+    process_queue processes the documents that this node can claim in the 
+    shared work queue, other nodes work on the same list at the same time.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    :param filelist: Paths of the PDF files
+    :type filelist: list
+    :param corpus: CorpusWriter for the corpus database or None
+    :type corpus: CorpusWriter
+    """
+    from workqueue import WorkQueue, relative_key
+    mainlog = logging.getLogger('main')
+    settings = cfg.snapshot()
+    batch = settings.batch
+    roots = settings.input.input_dirs
+    processed = 0
+    with WorkQueue(batch.queue_dir, batch.lease_time, batch.node) as work:
+        mainlog.info('Node %s uses the work queue "%s"', work.node, batch.queue_dir)
+        for file in filelist:
+            key = relative_key(file, roots)
+            if not work.claim(key):
+                continue
+            try:
+                process_document(file, settings, corpus)
+            except Exception as err:  # pylint: disable=broad-except
+                mainlog.error('Processing "%s" failed: %s', file, err)
+                work.complete(key, 'failed')
+            else:
+                work.complete(key)
+                processed += 1
+    print(f'Processed {processed} of {len(filelist)} files on node {work.node}')
+
+
+def supervise(cfg:Config, filelist:list):
+    """
+    supervise processes each document in a supervised process with time and 
+    memory limits, failed documents are retried once and then quarantined.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    :param filelist: Paths of the PDF files
+    :type filelist: list
+    """
+    from multiprocessing.managers import SyncManager
+    from supervisor import DocumentSupervisor
+    from outfile import corpus_writer
+    settings = cfg.snapshot()
+    corpus = None
+    if settings.fitz.export.write_corpus:
+        # The supervised processes pass their pages through a shared queue
+        manager = SyncManager()
+        manager.start(ignore_interrupt)
+        corpus = corpus_writer(cfg, manager.Queue())
+    supervisor = DocumentSupervisor(cfg)
+    processed = supervisor.run(filelist, process_document_worker,
+                               (settings, corpus.client() if corpus else None))
+    if corpus:
+        corpus.close()
+        manager.shutdown()
+    print(f'Processed {processed} of {len(filelist)} files')
+    if supervisor.failures:
+        print(f'{len(supervisor.failures)} files failed, see {supervisor.failures_file}')
+
+
+def import_pymupdf():
+    """
+    import_pymupdf imports PyMuPDF, e.g. when a worker process starts that the 
+    workers are warm when files arrive.
+    """
+    import fitzdoc  # pylint: disable=unused-import,import-outside-toplevel
+
+
+def init_worker():
+    """
+    init_worker prepares a worker process of the watch mode. PyMuPDF is imported 
+    once that the workers are warm when files arrive. Ctrl+C is only handled by 
+    the main process, which lets the running documents finish.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import_pymupdf()
+
+
+def ignore_interrupt():
+    """
+    ignore_interrupt lets a helper process ignore Ctrl+C.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def process_document_worker(file:Path, settings, corpus=None, parts:int=0):
+    """
+    process_document_worker processes a document in a worker process and waits 
+    for the compressed files of the document.
+
+    :param file: Path of the PDF file
+    :type file: Path
+    :param settings: Snapshot of the program configuration
+    :type settings: FrozenSettings
+    :param corpus: CorpusClient for the corpus database or None
+    :type corpus: CorpusClient
+    :param parts: Number of chunks processed by process_chunk_worker
+    :type parts: int
+    :return: True if all output files could be written
+    :rtype: bool
+    """
+    from streamwriter import wait_for_writers
+    process_document(file, settings, corpus, parts=parts)
+    return wait_for_writers()
+
+
+def process_chunk_worker(file:Path, settings, pages:list, offset:int, part:int):
+    """
+    process_chunk_worker extracts a chunk of pages of a document in a worker 
+    process and saves the results in the checkpoint of the chunk. The output 
+    files are written by process_document_worker after the last chunk.
+
+    :param file: Path of the PDF file
+    :type file: Path
+    :param settings: Snapshot of the program configuration
+    :type settings: FrozenSettings
+    :param pages: Page indices of the chunk
+    :type pages: list
+    :param offset: Page offset of the whole document
+    :type offset: int
+    :param part: Number of the chunk
+    :type part: int
+    :return: Number of processed pages
+    :rtype: int
+    """
+    from fitzdoc import Fitzdoc
+    from outfile import Outfile
+    doc = Fitzdoc(file, settings)
+    doc.selected_pages = pages
+    out = Outfile(file, settings)
+    out.create_directory()
+    checkpoint = out.checkpoint(file, part)
+    checkpoint.start(offset, doc.repeating_text_to_remove)
+    doc.checkpoint = checkpoint
+    try:
+        for _ in doc.iter_processed_pages(offset, keep_results=False):
+            pass
+    finally:
+        checkpoint.close()
+    return len(pages)
+
+
+def schedule(cfg:Config, filelist:list):
+    """
+    schedule processes the documents with a pool of worker processes, the 
+    longest documents first, large documents are split into chunks of pages.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    :param filelist: Paths of the PDF files
+    :type filelist: list
+    """
+    from multiprocessing.managers import SyncManager
+    from scheduler import BatchScheduler
+    from outfile import corpus_writer
+    mainlog = logging.getLogger('main')
+    settings = cfg.snapshot()
+    corpus = None
+    if settings.fitz.export.write_corpus:
+        # The worker processes pass their pages through a shared queue
+        manager = SyncManager()
+        manager.start(ignore_interrupt)
+        corpus = corpus_writer(cfg, manager.Queue())
+    scheduler = BatchScheduler(cfg)
+    jobs = scheduler.plan(filelist)
+    predicted = scheduler.predict_makespan(jobs)
+    print(f'Processing {len(filelist)} files in {len(jobs)} jobs with ' +
+          f'{scheduler.workers} workers, predicted time {predicted:.1f} s')
+    processed = scheduler.run(jobs, process_document_worker, process_chunk_worker,
+                              (settings, corpus.client() if corpus else None),
+                              init_worker)
+    if corpus:
+        corpus.close()
+        manager.shutdown()
+    print(f'Processed {processed} of {len(filelist)} files in {scheduler.makespan:.1f} s ' +
+          f'(predicted {predicted:.1f} s)')
+    mainlog.info('Makespan %.1f s, predicted %.1f s with %d workers',
+                 scheduler.makespan, predicted, scheduler.workers)
+
+
+def watch(cfg:Config):
+    """
+    watch keeps a pool of warm worker processes and processes new or changed 
+    PDF files of the input directories until the program is interrupted.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    """
+    from multiprocessing.managers import SyncManager
+    from concurrent.futures import ProcessPoolExecutor
+    from watcher import FolderWatcher
+    from outfile import corpus_writer
+    mainlog = logging.getLogger('main')
+    settings = cfg.snapshot()
+    watcher = FolderWatcher(settings.input.input_dirs, settings.input.settle_time,
+                            Path(settings.input.watch_state_file).absolute())
+    corpus = None
+    if settings.fitz.export.write_corpus:
+        # The worker processes pass their pages through a shared queue
+        manager = SyncManager()
+        manager.start(ignore_interrupt)
+        corpus = corpus_writer(cfg, manager.Queue())
+    workers = settings.config.workers or None
+    running = {}  # Future to (path, signature)
+
+    def collect():
+        for future in [future for future in running if future.done()]:
+            path, signature = running.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                if not future.result():
+                    mainlog.error('Not all output files of "%s" could be written', path)
+                mainlog.info('Processed file "%s"', path)
+            except Exception as err:  # pylint: disable=broad-except
+                mainlog.error('Processing "%s" failed: %s', path, err)
+            # Failed files are not retried until they change
+            watcher.mark_processed(path, signature)
+
+    print(f'Watching {", ".join(str(d) for d in watcher.directories)}, press Ctrl+C to stop')
+    mainlog.info('Start watching the input directories')
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        try:
+            while True:
+                queued = {path for path, signature in running.values()}
+                for path, signature in watcher.poll():
+                    if path not in queued:
+                        mainlog.info('Queue file "%s"', path)
+                        future = pool.submit(process_document_worker, path, settings,
+                                             corpus.client() if corpus else None)
+                        running[future] = (path, signature)
+                collect()
+                time.sleep(settings.input.watch_interval)
+        except KeyboardInterrupt:
+            print('\nStopping, waiting for running documents')
+            pool.shutdown(wait=True, cancel_futures=True)
+            collect()
+    if corpus:
+        corpus.close()
+        manager.shutdown()
+    mainlog.info('Stopped watching the input directories')
+
+
+def shard_spec(value:str):
+    """
+    shard_spec checks the syntax of the shard command line argument.
+
+    :param value: Shard and number of shards like 2/4
+    :type value: str
+    :raises argparse.ArgumentTypeError: when the syntax is invalid
+    :return: The unchanged value
+    :rtype: str
+    """
+    m = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f'Invalid shard "{value}", use I/N with 1 <= I <= N')
+    return value
+
+
+def page_ranges(value:str):
+    """
+    page_ranges checks the syntax of the page ranges command line argument.
+
+    :param value: Comma-separated page numbers and ranges like 1-20,300-310
+    :type value: str
+    :raises argparse.ArgumentTypeError: when the syntax is invalid
+    :return: The unchanged value
+    :rtype: str
+    """
+    if not re.fullmatch(r'\s*(\d*\s*-?\s*\d*\s*)(,\s*\d*\s*-?\s*\d*\s*)*', value):
+        raise argparse.ArgumentTypeError(f'Invalid page ranges "{value}"')
+    for item in value.split(','):
+        first, separator, last = item.strip().partition('-')
+        first = int(first) if first.strip() else 1
+        last = int(last) if separator and last.strip() else None
+        if first < 1 or (last is not None and last < first):
+            # Same rules as parse_page_ranges in fitzdoc
+            raise argparse.ArgumentTypeError(f'Invalid page range "{item.strip()}"')
+    return value
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
-        description='Processes PDF files to extract text and images',
-        prefix_chars='-/'
+        description='Processes PDF files to extract text and images'
         )
+    parser.add_argument('source',
+                        nargs='?',
+                        choices=['-'],
+                        help='- reads a PDF file from stdin and writes one JSON record\n' +
+                        'per page to stdout, all messages go to stderr.')
     parser.add_argument('-v', '--verbosity',
                         default=1,
                         type=int,
@@ -113,6 +658,116 @@ if __name__ == '__main__':
     parser.add_argument('-nc', '--notoc',
                         action='store_false',
                         help='Do not extract the table of contents.')
+    parser.add_argument('-t', '--tier',
+                        choices=['fast', 'dict', 'quality'],
+                        help='Extraction tier: fast only extracts plain text without\n' +
+                        'XHTML processing, dict renders HTML and text from a single\n' +
+                        'extraction, quality (default) recovers the paragraphs of\n' +
+                        'HTML and text from two extractions.')
+    parser.add_argument('--pages',
+                        type=page_ranges,
+                        help='Process only the listed pages, starting at 1, e.g.\n' +
+                        '1-20,300-310. Open ranges like 10- are allowed.')
+    parser.add_argument('--sample',
+                        type=int,
+                        default=0,
+                        help='Process only this number of pages that are spread\n' +
+                        'evenly over the (selected) pages for a preview.')
+    parser.add_argument('-j', '--jsonl',
+                        action='store_true',
+                        help='Write one JSON record per page into a JSON Lines file.')
+    parser.add_argument('--append-jsonl',
+                        action='store_true',
+                        help='Append the records to an existing JSON Lines file\n' +
+                        'instead of replacing it.')
+    parser.add_argument('--gzip-jsonl',
+                        action='store_true',
+                        help='Write the JSON Lines file with gzip compression.')
+    parser.add_argument('-z', '--compress',
+                        choices=['gzip', 'zstd'],
+                        help='Compress the text, HTML and JSON Lines files while\n' +
+                        'extracting. zstd needs the zstandard package.')
+    parser.add_argument('--compression-level',
+                        type=int,
+                        choices=range(1,23),
+                        metavar='1-22',
+                        help='Compression level (default 6, gzip uses at most 9).')
+    parser.add_argument('--sharded',
+                        action='store_true',
+                        help='Store the output of each document in hashed two-level\n' +
+                        'subdirectories listed in chaospdf-manifest.jsonl.')
+    parser.add_argument('--image-archive',
+                        choices=['zip', 'tar'],
+                        help='Pack the images of each document into one uncompressed\n' +
+                        'archive with an index instead of single files.')
+    parser.add_argument('--checkpoint',
+                        action='store_true',
+                        help='Save the processed pages of each document regularly, an\n' +
+                        'interrupted document resumes after the last saved page.')
+    parser.add_argument('--corpus',
+                        nargs='?',
+                        const='',
+                        metavar='FILE',
+                        help='Write the page text, metadata and TOC into a SQLite\n' +
+                        'database with a full text index (default chaospdf.sqlite\n' +
+                        'in the output directory).')
+    parser.add_argument('-w', '--watch',
+                        action='store_true',
+                        help='Keep running and process new or changed PDF files of\n' +
+                        'the input directories with a pool of worker processes.')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=0,
+                        help='Number of worker processes for --watch, --parallel and\n' +
+                        '--supervised (default: number of CPUs).')
+    parser.add_argument('--parallel',
+                        action='store_true',
+                        help='Process the documents with a pool of worker processes,\n' +
+                        'the longest documents first. Large documents are split\n' +
+                        'into chunks of pages.')
+    parser.add_argument('--chunk-pages',
+                        type=int,
+                        help='Split documents with more pages for --parallel (default\n' +
+                        '500, 0 to never split).')
+    parser.add_argument('--shard',
+                        type=shard_spec,
+                        metavar='I/N',
+                        help='Process only shard I of N of the input files, e.g. 2/4.\n' +
+                        'The shards are stable hashes of the relative paths.')
+    parser.add_argument('--queue',
+                        metavar='DIR',
+                        help='Claim the documents in a work queue directory on a shared\n' +
+                        'file system, that several nodes can process one corpus.')
+    parser.add_argument('--supervised',
+                        action='store_true',
+                        help='Process each document in its own process with a time and\n' +
+                        'memory limit, failed documents are retried once and then\n' +
+                        'listed in chaospdf-failures.jsonl.')
+    parser.add_argument('--timeout',
+                        type=int,
+                        help='Time limit per document in seconds (default 600).')
+    parser.add_argument('--memory-limit',
+                        type=int,
+                        metavar='MIB',
+                        help='Memory limit per document in MiB (default no limit, Unix only).')
+    parser.add_argument('--serve',
+                        action='store_true',
+                        help='Run a local HTTP extraction service: POST a PDF file\n' +
+                        'or ?path=FILE to /extract?format=jsonl|text|xhtml|images,\n' +
+                        'metrics at /metrics.')
+    parser.add_argument('--port',
+                        type=int,
+                        help='Port of the HTTP extraction service (default 8750).')
+    parser.add_argument('--doc-id',
+                        default='stdin',
+                        help='Document name in the JSON records of the pipe mode.')
+    parser.add_argument('--image-dir',
+                        help='Directory for the images of the pipe mode, images are\n' +
+                        'written to IMAGE_DIR/DOC_ID. Without it no images are written.')
+    parser.add_argument('--startup-profile',
+                        action='store_true',
+                        help='Print the time of each startup stage until the first\n' +
+                        'page is processed.')
     args = parser.parse_args()
     # args = parser.parse_args(['-p', '..'])  # Development only!
-    main(args)
+    sys.exit(main(args))
@@ -0,0 +1,181 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ json for the checkpoint file
+ os for writing the checkpoints to disk
+ logging for logging and debugging
+ hashlib for the key of the extraction settings
+ pathlib to access the file system
+ pageresult for the results of single pages
+"""
+import json
+import os
+import logging
+import hashlib
+from pathlib import Path
+from pageresult import PageResult
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_key(settings):
+    """
+    checkpoint_key creates a key of all settings that change the extracted pages.
+    Output settings do not change the key.
+
+    :param settings: Snapshot of the program configuration
+    :type settings: FrozenSettings
+    :return: Hash of the text extraction and page selection settings
+    :rtype: str
+    """
+    content = settings.fitz.text.digest + settings.fitz.pages.digest
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class Checkpoint():
+    """
+    Checkpoint stores the results of processed pages next to the outputs, that
+    an interrupted document resumes after the last checkpoint instead of the
+    first page. The file is a JSON Lines file with a header line with the
+    document state (page offset, repeating text) and one line per page. Pages
+    are appended every interval pages, a partially written last line is
+    dropped. A checkpoint is only used if the PDF file (size and modification
+    time) and the extraction settings did not change.
+    """
+    def __init__(self, path:Path, source:Path, key:str, interval:int=50):
+        self.log = logging.getLogger('file')
+        self.path = path
+        stat = source.stat()
+        self.source = [stat.st_size, stat.st_mtime_ns]
+        self.key = key
+        self.interval = max(1, interval)
+        self.results = {}  # Restored results by page index
+        self.page_offset = 0
+        self.repeating_text = []
+        self.buffer = []  # Records that are not written yet
+        self.fp = None
+        self.valid_size = 0  # Size of the complete lines of a resumed checkpoint
+        self.resumed = self.load()
+
+    def load(self):
+        """
+        load reads an existing checkpoint of the same document and settings.
+
+        :return: True if the checkpoint can be used
+        :rtype: bool
+        """
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path, 'rb') as fp:
+                line = fp.readline()
+                header = json.loads(line)
+                if (header.get('version') != CHECKPOINT_VERSION or
+                        header.get('source') != self.source or header.get('key') != self.key):
+                    self.log.info('Checkpoint "%s" is outdated, starting from the first page',
+                                  self.path)
+                    return False
+                self.valid_size = len(line)
+                for line in fp:
+                    if not line.endswith(b'\n'):
+                        # Interrupted while writing the last line
+                        break
+                    state = json.loads(line)
+                    result = PageResult(*state[:-1], tuple(state[-1]))
+                    self.results[result.index] = result
+                    self.valid_size += len(line)
+        except (OSError, ValueError, TypeError) as err:
+            self.log.warning('Cannot read checkpoint "%s": %s', self.path, err)
+            self.results = {}
+            return False
+        self.page_offset = header['page_offset']
+        self.repeating_text = header['repeating_text']
+        self.log.info('Resuming from checkpoint "%s" with %d pages', self.path, len(self.results))
+        return True
+
+    def merge(self, other):
+        """
+        merge takes over the pages of the checkpoint of a chunk of the document,
+        e.g. from a parallel run.
+
+        :param other: Checkpoint of a chunk
+        :type other: Checkpoint
+        :return: True if the chunk checkpoint could be used
+        :rtype: bool
+        """
+        if not other.resumed:
+            return False
+        self.results.update(other.results)
+        self.page_offset = other.page_offset
+        self.repeating_text = other.repeating_text
+        return True
+
+    def start(self, page_offset:int, repeating_text:list):
+        """
+        start opens the checkpoint for writing. A new checkpoint starts with the
+        header, a resumed checkpoint keeps its content.
+
+        :param page_offset: Page offset of the document
+        :type page_offset: int
+        :param repeating_text: Repeating text removed from the pages
+        :type repeating_text: list
+        """
+        if self.resumed:
+            # Drop an incomplete last line before appending
+            os.truncate(self.path, self.valid_size)
+            self.fp = open(self.path, 'a', encoding='utf-8')
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.page_offset = page_offset
+        self.repeating_text = list(repeating_text)
+        self.fp = open(self.path, 'w', encoding='utf-8')
+        self.fp.write(json.dumps({'version': CHECKPOINT_VERSION,
+                                  'source': self.source,
+                                  'key': self.key,
+                                  'page_offset': page_offset,
+                                  'repeating_text': self.repeating_text},
+                                 ensure_ascii=False) + '\n')
+
+    def add(self, result:PageResult):
+        """
+        add remembers the result of a processed page and writes a checkpoint
+        every interval pages.
+
+        :param result: Result of a processed page
+        :type result: PageResult
+        """
+        self.buffer.append(json.dumps(list(result.__getstate__()), ensure_ascii=False) + '\n')
+        if len(self.buffer) >= self.interval:
+            self.write()
+
+    def write(self):
+        """
+        write appends the buffered pages and makes sure they are on disk.
+        """
+        if not self.buffer or self.fp is None:
+            return
+        self.fp.write(''.join(self.buffer))
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.buffer = []
+
+    def close(self):
+        """
+        close writes the remaining pages and closes the checkpoint, e.g. when
+        the processing is stopped.
+        """
+        if self.fp is not None:
+            self.write()
+            self.fp.close()
+            self.fp = None
+
+    def finish(self):
+        """
+        finish deletes the checkpoint after all output files are written.
+        """
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+        self.buffer = []
+        self.path.unlink(missing_ok=True)
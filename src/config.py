@@ -4,11 +4,13 @@
  
  pathlib for file access
  json for formatting
+ hashlib for the content hash of configuration snapshots
  pdffiles for adding and removing PDF files
  argparse for handling the argparse objects
 """
 from pathlib import Path
 import json
+import hashlib
 # import argparse  # ? Is this needed for evaluate_args?
 
 class Settings:
@@ -20,6 +22,139 @@ class Settings:
         self.__dict__.update(settings)
 
 
+class FrozenSettings:
+    """
+    FrozenSettings is an immutable snapshot of the settings hierarchy with 
+    attribute access like Settings. Lists become tuples and paths become 
+    strings. The snapshot has a stable content hash, can be used as cache key, 
+    and is cheap to pickle for worker processes.
+    """
+    __slots__ = ('_values', '_digest')
+
+    def __init__(self, settings: dict):
+        object.__setattr__(self, '_values',
+                           {key: self._freeze(value) for key, value in settings.items()})
+        object.__setattr__(self, '_digest', None)
+
+    @classmethod
+    def _freeze(cls, value):
+        """
+        _freeze converts a settings value into an immutable value.
+
+        :param value: Value of a setting
+        :type value: Any
+        :return: Immutable value
+        :rtype: Any
+        """
+        if isinstance(value, dict):
+            return cls(value)
+        if isinstance(value, Settings):
+            return cls(vars(value))
+        if isinstance(value, (list, tuple)):
+            return tuple(cls._freeze(item) for item in value)
+        if isinstance(value, Path):
+            return str(value)
+        return value
+
+    @classmethod
+    def _thaw(cls, value):
+        """
+        _thaw converts an immutable value back into a value for the settings 
+        dictionary.
+
+        :param value: Immutable value
+        :type value: Any
+        :return: Value for the settings dictionary
+        :rtype: Any
+        """
+        if isinstance(value, FrozenSettings):
+            return value.to_dict()
+        if isinstance(value, tuple):
+            return [cls._thaw(item) for item in value]
+        return value
+
+    def to_dict(self):
+        """
+        to_dict returns the snapshot as dictionary with the same hierarchy as 
+        the default settings dict.
+
+        :return: Dictionary with all settings
+        :rtype: dict
+        """
+        return {key: self._thaw(value) for key, value in self._values.items()}
+
+    def snapshot(self):
+        """
+        snapshot returns the snapshot itself that Config and FrozenSettings can 
+        be used in the same way.
+
+        :return: The snapshot
+        :rtype: FrozenSettings
+        """
+        return self
+
+    def replace(self, options: dict):
+        """
+        replace creates a new snapshot with some settings changed.
+
+        :param options: New values by dotted name, e.g. {'fitz.text.tier': 'fast'}
+        :type options: dict
+        :raises KeyError: when a setting does not exist
+        :return: Changed snapshot
+        :rtype: FrozenSettings
+        """
+        settings = self.to_dict()
+        for name, value in options.items():
+            *path, key = name.split('.')
+            section = settings
+            for part in path:
+                section = section.get(part) if isinstance(section, dict) else None
+            if not isinstance(section, dict) or key not in section:
+                raise KeyError(f'No setting named {name}')
+            section[key] = value
+        return FrozenSettings(settings)
+
+    @property
+    def digest(self):
+        """
+        digest is a stable hash of the content of the snapshot.
+
+        :return: SHA-256 hex digest of the sorted JSON representation
+        :rtype: str
+        """
+        if self._digest is None:
+            content = json.dumps(self.to_dict(), sort_keys=True)
+            object.__setattr__(self, '_digest',
+                               hashlib.sha256(content.encode('utf-8')).hexdigest())
+        return self._digest
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(f'No setting named {name}') from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('FrozenSettings cannot be changed')
+
+    def __delattr__(self, name):
+        raise AttributeError('FrozenSettings cannot be changed')
+
+    def __reduce__(self):
+        return (FrozenSettings, (self.to_dict(),))
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenSettings):
+            return NotImplemented
+        return self.digest == other.digest
+
+    def __hash__(self):
+        return int(self.digest[:16], 16)
+
+    def __repr__(self):
+        return f'FrozenSettings({self.to_dict()!r})'
+
+
 class Config():
     """
     Config handles the management of the settings.
@@ -29,12 +164,18 @@ class Config():
     config = {}
     cfg = object()
 
-    def __init__(self):
+    def __init__(self, read_file: bool = True):
+        """
+        :param read_file: False to skip reading the default configuration file, 
+        e.g. because evaluate_args reads the file from the command line anyway
+        :type read_file: bool
+        """
         if not self.config:
-            if Path('chaospdf.json').exists():
-                self.read_config()
             self.default_config()
             self.cfg = json.loads(json.dumps(self.config), object_hook=Settings)
+            if read_file and Path(self.cfg.config.config_dir,
+                                  self.cfg.config.config_file).exists():
+                self.read_config()
 
     def default_config(self):
         """
@@ -45,26 +186,73 @@ class Config():
                                            'write_toc': True,
                                            'write_all_images': True,
                                            'write_page_images': False,
+                                           'write_jsonl': False,
+                                           'compress_jsonl': False,
+                                           'append_jsonl': False,
+                                           'compression': '',
+                                           'compression_level': 6,
+                                           'write_corpus': False,
+                                           'corpus_file': 'chaospdf.sqlite',
+                                           'corpus_batch_size': 500,
                                            'create_sub_dirs': True,
+                                           'layout': 'document',
+                                           'shard_levels': 2,
                                            'use_pdf_output_dir': True,
                                            'output_dir': str(Path('.').absolute())},
+                                'pages': {'ranges': '',
+                                          'sample': 0},
                                 'images': {'image_size_min': 5000,
                                            'image_dimension_x_min': 130,
                                            'image_dimension_y_min': 130,
-                                           'compression_limit': 0.05},
+                                           'compression_limit': 0.05,
+                                           'archive': ''},
                                 'text': {'remove_page_numbers': True,
                                          'remove_repeating_text': False,
+                                         'repeating_text_capacity': 1000,
                                          'detect_page_offset': True,
                                          'page_offset': 0,
-                                         'page_separator': True}
+                                         'offset_sample_pages': 40,
+                                         'offset_min_votes': 5,
+                                         'offset_confidence': 0.75,
+                                         'page_separator': True,
+                                         'tier': 'quality',
+                                         'classify_pages': True}
                                 },
                        'input': {'input_dir': str(Path('.').absolute()),
                                  'input_files': [],
-                                 'input_dirs': ['.']},
+                                 'input_dirs': ['.'],
+                                 'watch_interval': 5,
+                                 'settle_time': 2,
+                                 'watch_state_file': 'chaospdf-watch.json'},
+                       'batch': {'supervised': False,
+                                 'timeout': 600,
+                                 'memory_limit': 0,
+                                 'retries': 1,
+                                 'failures_file': 'chaospdf-failures.jsonl',
+                                 'checkpoint': False,
+                                 'checkpoint_interval': 50,
+                                 'parallel': False,
+                                 'chunk_pages': 500,
+                                 'count_images': False,
+                                 'cost_per_page': 0.05,
+                                 'cost_per_mib': 0.02,
+                                 'cost_per_image': 0.01,
+                                 'shard': '',
+                                 'queue_dir': '',
+                                 'lease_time': 300,
+                                 'node': ''},
+                       'service': {'host': '127.0.0.1',
+                                   'port': 8750,
+                                   'workers': 0,
+                                   'queue_size': 8,
+                                   'timeout': 120,
+                                   'max_upload': 256 * 1024 * 1024},
                        'config': {'config_dir': str(Path('.').absolute()),
                                   'config_file': 'chaospdf.json',
                                   'interactive': True,
-                                  'logging_level': 3}
+                                  'logging_level': 3,
+                                  'log_stream': 'stdout',
+                                  'workers': 0}
                        }
 
     def __to_dict(self, settings_obj:Settings):
@@ -85,7 +273,6 @@ class Config():
         if not isinstance(settings_dict, dict):
             raise TypeError(f'Dict expected but got {type(settings_dict)}')
         for key in settings_dict.keys():
-            print(key, settings_dict[key])
             if isinstance(settings_dict[key], Settings):
                 output_dict = output_dict | {key: self.__to_dict(settings_dict[key])}
             else:
@@ -99,16 +286,45 @@ class Config():
         """
         self.config = self.__to_dict(self.cfg)
 
+    def snapshot(self):
+        """
+        snapshot creates an immutable copy of the current settings. Later 
+        changes of the configuration do not affect the snapshot.
+
+        :return: Immutable settings with the same hierarchy as self.cfg
+        :rtype: FrozenSettings
+        """
+        return FrozenSettings(self.__to_dict(self.cfg))
+
     def read_config(self):
         """
-        read_config reads the configuration file.
+        read_config reads the configuration file. The settings of the file are 
+        merged into the current settings, settings that are missing in the file, 
+        e.g. in a file written by an older version, keep their current value.
         """
         cfg_file = Path(self.cfg.config.config_dir,
                         self.cfg.config.config_file)
         with open(cfg_file, 'r', encoding='utf-8') as fp:
-            self.config = json.load(fp)
-            self.cfg = json.loads(json.dumps(self.config),
-                                  object_hook=Settings)
+            loaded = json.load(fp)
+        self.config_to_dict()
+        self.__merge_dict(self.config, loaded)
+        self.cfg = json.loads(json.dumps(self.config, default=str),
+                              object_hook=Settings)
+
+    def __merge_dict(self, target:dict, source:dict):
+        """
+        __merge_dict merges a dictionary recursively into another one.
+
+        :param target: Dictionary that is changed
+        :type target: dict
+        :param source: Dictionary with the new values
+        :type source: dict
+        """
+        for key, value in source.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                self.__merge_dict(target[key], value)
+            else:
+                target[key] = value
 
     def write_config(self):
         """
@@ -139,6 +355,52 @@ class Config():
         self.cfg.fitz.export.write_html = args.nohtml
         self.cfg.fitz.export.write_toc = args.notoc
         self.cfg.input.input_dirs = args.pdffolder
+        if args.workers:
+            self.cfg.config.workers = args.workers
+        if args.supervised:
+            self.cfg.batch.supervised = True
+        if args.timeout:
+            self.cfg.batch.timeout = args.timeout
+        if args.memory_limit:
+            self.cfg.batch.memory_limit = args.memory_limit
+        if args.checkpoint:
+            self.cfg.batch.checkpoint = True
+        if args.parallel:
+            self.cfg.batch.parallel = True
+        if args.chunk_pages is not None:
+            self.cfg.batch.chunk_pages = args.chunk_pages
+        if args.shard:
+            self.cfg.batch.shard = args.shard
+        if args.queue:
+            self.cfg.batch.queue_dir = str(Path(args.queue).absolute())
+        if args.port:
+            self.cfg.service.port = args.port
+        if args.tier:
+            self.cfg.fitz.text.tier = args.tier
+        if args.pages:
+            self.cfg.fitz.pages.ranges = args.pages
+        if args.sample:
+            self.cfg.fitz.pages.sample = args.sample
+        if args.jsonl:
+            self.cfg.fitz.export.write_jsonl = True
+        if args.append_jsonl:
+            self.cfg.fitz.export.write_jsonl = True
+            self.cfg.fitz.export.append_jsonl = True
+        if args.gzip_jsonl:
+            self.cfg.fitz.export.write_jsonl = True
+            self.cfg.fitz.export.compress_jsonl = True
+        if args.compress:
+            self.cfg.fitz.export.compression = args.compress
+        if args.compression_level:
+            self.cfg.fitz.export.compression_level = args.compression_level
+        if args.sharded:
+            self.cfg.fitz.export.layout = 'sharded'
+        if args.image_archive:
+            self.cfg.fitz.images.archive = args.image_archive
+        if args.corpus is not None:
+            self.cfg.fitz.export.write_corpus = True
+            if args.corpus:
+                self.cfg.fitz.export.corpus_file = args.corpus
 
     def __evaluate_args_config(self, args):
         """
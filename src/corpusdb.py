@@ -0,0 +1,336 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ sqlite3 for the corpus database with the FTS5 full text index
+ json for storing metadata and table of contents
+ logging for logging and debugging
+ queue for the queue of the writer thread
+ threading for the single writer thread
+ pathlib to access the database file
+ pageresult for the results of single pages
+"""
+import sqlite3
+import json
+import logging
+import queue
+import threading
+from pathlib import Path
+from pageresult import PageResult
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    metadata TEXT,
+    toc TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_name ON documents(name);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_index INTEGER NOT NULL,
+    page_number INTEGER,
+    page_class TEXT,
+    text TEXT,
+    UNIQUE (doc_id, page_index)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    text, content='pages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO pages_fts(rowid, text) VALUES (new.id, new.text);
+END;
+PRAGMA user_version = 1;
+'''
+SCHEMA_VERSION = 1
+
+
+class CorpusStore():
+    """
+    CorpusStore writes documents and the text of their pages into a SQLite
+    database with an FTS5 index. The page text is stored once in the pages table,
+    the index refers to it as external content. The database runs in WAL mode
+    that readers, e.g. a search front end, are not blocked while documents are
+    written. Pages are inserted in transactions of batch_size pages.
+    Documents are identified by the absolute path of the PDF file, the name is 
+    only stored for display, because files in different directories can have 
+    the same name.
+    A connection must only be used by the thread that created it, use
+    CorpusWriter to write from several threads or processes.
+    """
+    def __init__(self, path:Path, batch_size:int=500):
+        self.log = logging.getLogger('file')
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.pending = 0  # Pages written since the last commit
+        self.doc_ids = {}  # Document path to id
+        self.con = sqlite3.connect(path)
+        self.con.execute('PRAGMA journal_mode=WAL')
+        self.con.execute('PRAGMA synchronous=NORMAL')
+        self.con.execute('PRAGMA foreign_keys=ON')
+        try:
+            self.check_version()
+            self.con.executescript(SCHEMA)
+        except sqlite3.OperationalError as err:
+            self.con.close()
+            self.log.error('Cannot create the corpus database "%s": %s', path, err)
+            raise
+        self.log.info('Opened corpus database "%s"', path)
+
+    def check_version(self):
+        """
+        check_version makes sure that an existing database has the current schema.
+
+        :raises sqlite3.OperationalError: when the database was created with an 
+        older schema
+        """
+        version = self.con.execute('PRAGMA user_version').fetchone()[0]
+        exists = self.con.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents'").fetchone()
+        if exists and version < SCHEMA_VERSION:
+            raise sqlite3.OperationalError('the database was created by an older version, ' +
+                                           'remove it to create it again')
+
+    def add_document(self, name:str, path:str, metadata:dict, toc:list):
+        """
+        add_document inserts a document or replaces all data of a document with
+        the same path, e.g. when a file is processed again.
+
+        :param name: Name of the document for display
+        :type name: str
+        :param path: Absolute path of the PDF file, identifies the document
+        :type path: str
+        :param metadata: Metadata of the PDF file
+        :type metadata: dict
+        :param toc: Table of contents as returned by get_toc
+        :type toc: list
+        :return: Id of the document
+        :rtype: int
+        """
+        cur = self.con.execute('SELECT id FROM documents WHERE path = ?', (path,))
+        row = cur.fetchone()
+        if row:
+            doc_id = row[0]
+            self.con.execute('DELETE FROM pages WHERE doc_id = ?', (doc_id,))
+            self.con.execute('UPDATE documents SET name = ?, metadata = ?, toc = ? WHERE id = ?',
+                             (name, json.dumps(metadata, ensure_ascii=False),
+                              json.dumps(toc, ensure_ascii=False), doc_id))
+        else:
+            cur = self.con.execute('INSERT INTO documents (name, path, metadata, toc) VALUES (?, ?, ?, ?)',
+                                   (name, path, json.dumps(metadata, ensure_ascii=False),
+                                    json.dumps(toc, ensure_ascii=False)))
+            doc_id = cur.lastrowid
+        self.doc_ids[path] = doc_id
+        return doc_id
+
+    def add_page(self, path:str, index:int, number:int, page_class:str, text:str):
+        """
+        add_page inserts the text of a single page. The transaction is committed
+        after batch_size pages.
+
+        :param path: Path of the document that was added with add_document
+        :type path: str
+        :param index: Page index in the PDF document, starting with 0
+        :type index: int
+        :param number: Page number printed on the page
+        :type number: int
+        :param page_class: Content class of the page
+        :type page_class: str
+        :param text: Plain text of the page
+        :type text: str
+        """
+        self.con.execute('INSERT OR REPLACE INTO pages (doc_id, page_index, page_number, page_class, text) ' +
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (self.doc_ids[path], index, number, page_class, text))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        """
+        commit finishes the current transaction.
+        """
+        self.con.commit()
+        self.pending = 0
+
+    def close(self):
+        """
+        close commits the pending pages and closes the database.
+        """
+        self.commit()
+        self.con.close()
+        self.log.info('Closed corpus database "%s"', self.path)
+
+
+class CorpusSink():
+    """
+    CorpusSink passes the pages of one document to the queue of a CorpusWriter.
+    It can be pickled with a multiprocessing queue and used as the sink of
+    Fitzdoc.process_pages in a worker process.
+    """
+    def __init__(self, messages, path:str):
+        self.messages = messages
+        self.path = path
+
+    def __call__(self, result:PageResult):
+        self.messages.put(('page', self.path, result.index, result.printed_number,
+                           result.page_class, result.text))
+
+
+class CorpusClient():
+    """
+    CorpusClient passes documents and pages to the queue of a CorpusWriter. It
+    can be pickled with a multiprocessing queue and used in worker processes
+    like the CorpusWriter itself.
+    """
+    def __init__(self, messages):
+        self.messages = messages
+
+    def add_document(self, name:str, path:str, metadata:dict, toc:list):
+        """
+        add_document queues a document, see CorpusStore.add_document.
+
+        :param name: Name of the document for display
+        :type name: str
+        :param path: Absolute path of the PDF file, identifies the document
+        :type path: str
+        :param metadata: Metadata of the PDF file
+        :type metadata: dict
+        :param toc: Table of contents as returned by get_toc
+        :type toc: list
+        """
+        self.messages.put(('document', name, path, metadata, toc))
+
+    def sink(self, path:str):
+        """
+        sink creates a sink for the pages of a document.
+
+        :param path: Path of the document that was added with add_document
+        :type path: str
+        :return: Callable that queues a PageResult
+        :rtype: CorpusSink
+        """
+        return CorpusSink(self.messages, path)
+
+
+class CorpusWriter(threading.Thread):
+    """
+    CorpusWriter is the single writer of the corpus database. All documents and
+    pages are passed as messages through a queue, that threads and worker
+    processes never compete for the write lock of the database.
+    Without a queue argument a thread queue is used, pass a multiprocessing
+    queue, e.g. from multiprocessing.Manager().Queue(), to write from a
+    process pool.
+    """
+    def __init__(self, path:Path, batch_size:int=500, messages=None):
+        super().__init__(name='corpus-writer', daemon=True)
+        self.log = logging.getLogger('file')
+        self.path = path
+        self.batch_size = batch_size
+        self.messages = messages if messages is not None else queue.Queue()
+        self.error = None
+        self.opened = threading.Event()
+
+    def run(self):
+        """
+        run writes the messages of the queue until close is called. Pending
+        pages are committed when the queue is idle for a second.
+        """
+        try:
+            store = CorpusStore(self.path, self.batch_size)
+        except sqlite3.Error as err:
+            self.error = err
+            self.opened.set()
+            return
+        self.opened.set()
+        try:
+            while True:
+                try:
+                    message = self.messages.get(timeout=1)
+                except queue.Empty:
+                    store.commit()
+                    continue
+                if message is None:
+                    break
+                if message[0] == 'page':
+                    store.add_page(*message[1:])
+                elif message[0] == 'document':
+                    store.add_document(*message[1:])
+        except sqlite3.Error as err:
+            self.error = err
+            self.log.error('Writing the corpus database "%s" failed: %s', self.path, err)
+        finally:
+            store.close()
+
+    def start(self):
+        """
+        start starts the writer thread and waits until the database is opened.
+
+        :raises sqlite3.Error: when the database cannot be opened
+        """
+        super().start()
+        self.opened.wait()
+        if self.error:
+            raise self.error
+
+    def add_document(self, name:str, path:str, metadata:dict, toc:list):
+        """
+        add_document queues a document, see CorpusStore.add_document.
+
+        :param name: Name of the document for display
+        :type name: str
+        :param path: Absolute path of the PDF file, identifies the document
+        :type path: str
+        :param metadata: Metadata of the PDF file
+        :type metadata: dict
+        :param toc: Table of contents as returned by get_toc
+        :type toc: list
+        """
+        self.client().add_document(name, path, metadata, toc)
+
+    def sink(self, path:str):
+        """
+        sink creates a sink for the pages of a document.
+
+        :param path: Path of the document that was added with add_document
+        :type path: str
+        :return: Callable that queues a PageResult
+        :rtype: CorpusSink
+        """
+        return self.client().sink(path)
+
+    def client(self):
+        """
+        client creates a picklable client for worker processes. The writer
+        must use a multiprocessing queue for this.
+
+        :return: Client that writes into the queue of the writer
+        :rtype: CorpusClient
+        """
+        return CorpusClient(self.messages)
+
+    def close(self):
+        """
+        close writes all queued messages and stops the writer thread.
+
+        :raises sqlite3.Error: when writing the database failed
+        """
+        self.messages.put(None)
+        self.join()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
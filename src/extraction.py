@@ -0,0 +1,67 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Library interface to use ChaosPDF from other programs.
+
+ config for the default settings
+ fitzdoc for handling PDF documents with PyMuPDF
+"""
+from config import Config
+from fitzdoc import Fitzdoc
+
+
+def iter_pages(source, options:dict=None, document_id:str=None, cfg:Config=None,
+               cancel=None):
+    """
+    iter_pages extracts a PDF file page by page and yields a PageResult for each
+    page as soon as it is processed. Breaking out of the loop or closing the
+    generator stops the extraction, the remaining pages are never parsed and
+    the document is closed.
+
+    Example::
+
+        for result in iter_pages('book.pdf', {'fitz.text.tier': 'fast'}):
+            print(result.printed_number, result.text[:80])
+            if 'Index' in result.text:
+                break
+
+    :param source: Path of the PDF file or the PDF file in memory
+    :type source: Path | str | bytes | bytearray | memoryview
+    :param options: Settings to change by dotted name, e.g.
+    {'fitz.pages.ranges': '1-10', 'fitz.text.tier': 'dict'}
+    :type options: dict
+    :param document_id: Name of the document, required for PDF files in memory
+    :type document_id: str
+    :param cfg: Configuration or snapshot to start from instead of the defaults
+    :type cfg: Config
+    :param cancel: Object with an is_set method, e.g. threading.Event, that
+    stops the extraction from another thread before the next page
+    :type cancel: threading.Event
+    :raises KeyError: when an option does not exist
+    :raises ValueError: when the document is encrypted
+    :return: Generator with the result of each selected page
+    :rtype: Generator
+    """
+    settings = (cfg or Config(read_file=False)).snapshot()
+    if options:
+        settings = settings.replace(options)
+    doc = Fitzdoc(source, settings, document_id)
+    try:
+        if doc.encryption:
+            raise ValueError(f'Document "{doc.source}" is encrypted')
+        if not doc.selected_pages:
+            # Nothing to yield, e.g. page ranges outside the document
+            return
+        doc.collect_image_xrefs = True
+        if settings.fitz.text.detect_page_offset:
+            offset = doc.detect_page_offset()
+        else:
+            offset = settings.fitz.text.page_offset
+        for result in doc.iter_processed_pages(offset, keep_results=False):
+            yield result
+            # The next page is only parsed when the consumer asks for it
+            if cancel is not None and cancel.is_set():
+                break
+    finally:
+        doc.doc.close()
@@ -8,6 +8,7 @@
  collections for finding unique items of lists
  fitz from pymupdf to process PDF documents
  fitzpage to handle individual PDF pages
+ heavyhitters for bounded-memory detection of repeating text
  config to use the global configuration
  outfile for image output
 """
@@ -16,32 +17,145 @@ import logging
 import re
 from collections import Counter
 import fitz
-from fitzpage import Fitzpage
+from fitzpage import Fitzpage, PAGE_EMPTY, PAGE_IMAGE, PAGE_MIXED
+from heavyhitters import SpaceSaving, text_hash
 from config import Config
 from outfile import Outfile
 
+def parse_page_ranges(ranges:str, page_count:int):
+    """
+    parse_page_ranges converts a list of page ranges with page numbers starting 
+    at 1, e.g. "1-20,300-310", into page indices starting at 0. Open ranges like 
+    "10-" or "-5" are allowed, pages outside the document are ignored.
+
+    :param ranges: Comma-separated page numbers and ranges
+    :type ranges: str
+    :param page_count: Number of pages in the document
+    :type page_count: int
+    :raises ValueError: when a range cannot be parsed
+    :return: Sorted list of page indices
+    :rtype: list
+    """
+    indices = set()
+    for item in ranges.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        first, separator, last = item.partition('-')
+        first = int(first) if first.strip() else 1
+        if separator:
+            # An open range ends with the document, also if it starts after it
+            last = int(last) if last.strip() else max(first, page_count)
+        else:
+            last = first
+        if first < 1 or last < first:
+            raise ValueError(f'Invalid page range "{item}"')
+        indices.update(range(first-1, min(last, page_count)))
+    return sorted(indices)
+
+
+def sample_page_indices(pages:list, sample:int):
+    """
+    sample_page_indices selects a number of pages that are spread evenly over a 
+    list of pages.
+
+    :param pages: Page indices to select from
+    :type pages: list
+    :param sample: Number of pages to select
+    :type sample: int
+    :return: Sorted list of selected page indices
+    :rtype: list
+    """
+    if sample >= len(pages):
+        return list(pages)
+    return sorted({pages[i * len(pages) // sample] for i in range(sample)})
+
+
 class Fitzdoc():
     """
     Fitzdoc handles PDF documents as a whole.
     Calls Fitzpage for accessing page content.
     Image extraction is on document level.
+    The file is either a path or a PDF file in memory (bytes, bytearray or 
+    memoryview), which needs a document_id. Documents in memory never touch 
+    the file system if the pages and images are passed to sinks.
     """
-    def __init__(self, file:Path, cfg:Config):
+    def __init__(self, file, cfg:Config, document_id:str=None):
         self.log = logging.getLogger('doc')
-        self.log.info('Initializing document for "%s"', file)
-        self.file = file
-        self.page_text = []
-        self.doc = fitz.open(self.file)
+        in_memory = isinstance(file, (bytes, bytearray, memoryview))
+        if in_memory and not document_id:
+            raise ValueError('A document in memory needs a document id')
+        self.file = None if in_memory else file  # None for documents in memory
+        self.document_id = document_id or Path(file).stem
+        self.source = f'{self.document_id} (in memory)' if in_memory else file  # For log messages
+        self.log.info('Initializing document for "%s"', self.source)
+        self.page_results = []  # PageResult for each processed page
+        self.cfg = cfg
+        # Resolve the settings once per document
+        self.settings = cfg.snapshot()
+        self.tier = self.settings.fitz.text.tier
+        self.classify_pages = self.settings.fitz.text.classify_pages
+        self.remove_page_numbers = self.settings.fitz.text.remove_page_numbers
+        self.collect_image_xrefs = self.settings.fitz.export.write_jsonl
+        if in_memory:
+            self.doc = fitz.open(stream=file, filetype='pdf')
+        else:
+            self.doc = fitz.open(self.file)
         self.encryption = self.check_encryption()
         if self.encryption:
-            self.log.warning('Document "%s" is encryptet, processing stopped', self.file)
+            self.log.warning('Document "%s" is encryptet, processing stopped', self.source)
             return
         self.toc = []
         self.tocstr = ''
         self.repeating_text_to_remove = []
+        self.page_classes = Counter()  # Number of pages for each page class
+        self.aligned_pages = 0  # Number of pages that skipped the paragraph recovery
         self.html = ''
         self.text = ''
-        self.cfg = cfg
+        self.selected_pages = self.select_pages()  # Page indices for processing
+        self.checkpoint = None  # Checkpoint to resume from and to write to
+
+    def select_pages(self):
+        """
+        select_pages determines the pages for processing from the page ranges and 
+        the number of sample pages in the settings. Pages that are not selected 
+        are never parsed.
+
+        :return: Sorted list of page indices
+        :rtype: list
+        """
+        self.log.debug('Entering method "select_pages"')
+        pages = list(range(self.doc.page_count))
+        ranges = self.settings.fitz.pages.ranges
+        if ranges:
+            pages = parse_page_ranges(ranges, self.doc.page_count)
+        sample = self.settings.fitz.pages.sample
+        if sample > 0:
+            pages = sample_page_indices(pages, sample)
+        if len(pages) < self.doc.page_count:
+            self.log.info('Selected %d of %d pages for processing',
+                          len(pages), self.doc.page_count)
+        return pages
+
+    def iter_selected_pages(self):
+        """
+        iter_selected_pages yields the index and the page for all selected pages.
+
+        :return: Generator with tuples of page index and page
+        :rtype: Generator
+        """
+        for pn in self.selected_pages:
+            yield pn, self.doc[pn]
+
+    @property
+    def page_text(self):
+        """
+        page_text returns the XHTML code of each processed page.
+
+        :return: List with the XHTML code of each page
+        :rtype: list
+        """
+        return [result.xhtml for result in self.page_results]
 
     def check_encryption(self):
         """
@@ -54,9 +168,9 @@ class Fitzdoc():
         self.log.debug('Entering method "check_encryption"')
         encryption = self.doc.needs_pass
         if encryption:
-            self.log.error('Document "%s" is encrypted and cannot be processed', self.file)
+            self.log.error('Document "%s" is encrypted and cannot be processed', self.source)
         else:
-            self.log.info('Document "%s" is not encrypted and can be processed normally', self.file)
+            self.log.info('Document "%s" is not encrypted and can be processed normally', self.source)
         return encryption
 
     def get_toc(self):
@@ -81,7 +195,11 @@ class Fitzdoc():
         if not self.toc:
             self.get_toc()
         self.tocstr = ''
+        selected = set(self.selected_pages)
         for item in self.toc:
+            if item[2]-1 not in selected:
+                # Skip entries for pages that are not selected
+                continue
             # print(item)
             # Indent by 5 spaces for each heading level
             # Document title has item[0] == 1
@@ -114,28 +232,29 @@ class Fitzdoc():
             # Heading level, heading, page number, ...
             print(' '*(item[0]-1) + item[1])
 
-    def process_pages(self, page_offset:int):
+    def process_pages(self, page_offset:int, sink=None):
         """
         process_pages runs the XHTML text extraction for the whole document.
 
         :param page_offset: Offset for page number removal and logging
         :type page_offset: int
+        :param sink: Callable that receives the PageResult of each page as soon 
+        as the page is processed, e.g. JSONLWriter.write
+        :type sink: Callable
         :return: Text with HTML formatting for the whole document
         :rtype: str
         """
         self.log.debug('Entering method "process_pages"')
-        self.page_text = []
         self.html = ''
         self.text = ''
-        for pn, page in enumerate(self.doc):
-            p = Fitzpage(page, pn+page_offset)
-            content = self.extract_text_from_page(p)
-            self.page_text.append(content)
+        for pn, result, content in self._iter_page_contents(page_offset, sink):
             self.html += content
-            self.text += p.text
+            self.text += result.text
+        self.log.info('Skipped paragraph recovery for %d of %d pages',
+                      self.aligned_pages, len(self.selected_pages))
         return self.html
 
-    def process_pages_separately(self, page_offset:int):
+    def process_pages_separately(self, page_offset:int, sink=None):
         """
         process_pages_separately runs the XHTML text extraction for the whole document. 
         It also adds additional h1 entries as page separator which makes it easier to 
@@ -143,26 +262,180 @@ class Fitzdoc():
 
         :param page_offset: Offset for page number removal and logging
         :type page_offset: int
+        :param sink: Callable that receives the PageResult of each page as soon 
+        as the page is processed, e.g. JSONLWriter.write
+        :type sink: Callable
         :return: Text with HTML formatting for the whole document with additional 
         page separation headings
         :rtype: str
         """
         self.log.debug('Entering method "process_pages_separately"')
-        self.page_text = []
         self.html = ''
         self.text = ''
-        for pn, page in enumerate(self.doc):
-            p = Fitzpage(page, pn+page_offset)
-            content = self.extract_text_from_page(p)
-            self.page_text.append(content)
+        for pn, result, content in self._iter_page_contents(page_offset, sink):
             if content:
                 self.html += f'\n\n<h1>====== Page {pn-page_offset:04d} ======</h1>\n\n'
                 self.html += content
-            if p.text:
+            if result.text:
                 self.text += f'\n\n====== Page {pn-page_offset:04d} ======\n\n'
-                self.text += p.text
+                self.text += result.text
+        self.log.info('Skipped paragraph recovery for %d of %d pages',
+                      self.aligned_pages, len(self.selected_pages))
         return self.html
 
+    def iter_processed_pages(self, page_offset:int, keep_results:bool=True):
+        """
+        iter_processed_pages runs the extraction page by page and yields the 
+        result of each page as soon as it is processed. Pages after an early 
+        break are never parsed. html and text are not assembled.
+
+        :param page_offset: Offset for page number removal and logging
+        :type page_offset: int
+        :param keep_results: False to not store the results in page_results, 
+        which keeps the memory constant for long documents
+        :type keep_results: bool
+        :return: Generator with the result of each selected page
+        :rtype: Generator
+        """
+        self.log.debug('Entering method "iter_processed_pages"')
+        for pn, result, content in self._iter_page_contents(page_offset, None, keep_results):
+            yield result
+
+    def _iter_page_contents(self, page_offset:int, sink, keep_results:bool=True):
+        """
+        _iter_page_contents processes the selected pages one by one. Pages from 
+        a resumed checkpoint are not processed again, new results are added to 
+        the checkpoint.
+
+        :param page_offset: Offset for page number removal and logging
+        :type page_offset: int
+        :param sink: Callable that receives the PageResult or None
+        :type sink: Callable
+        :param keep_results: False to not store the results in page_results
+        :type keep_results: bool
+        :return: Generator with tuples of page index, PageResult and XHTML code
+        :rtype: Generator
+        """
+        self.page_results = []
+        self.page_classes = Counter()
+        self.aligned_pages = 0
+        restored = self.checkpoint.results if self.checkpoint else {}
+        for pn in self.selected_pages:
+            if pn in restored:
+                result = restored[pn]
+                content = result.xhtml
+                if result.page_class:
+                    self.page_classes[result.page_class] += 1
+                if result.aligned:
+                    self.aligned_pages += 1
+                self.page_results.append(result)
+                if sink is not None:
+                    sink(result)
+            else:
+                p = Fitzpage(self.doc[pn], pn+page_offset)
+                content = self.extract_page(p)
+                result = self._add_page_result(p, page_offset, sink)
+                if self.checkpoint:
+                    self.checkpoint.add(result)
+            if not keep_results:
+                self.page_results.clear()
+            yield pn, result, content
+
+    def _add_page_result(self, page:Fitzpage, page_offset:int, sink):
+        """
+        _add_page_result stores the result of a processed page and passes it to 
+        the sink.
+
+        :param page: A processed page from the document
+        :type page: Fitzpage
+        :param page_offset: Offset for page number removal and logging
+        :type page_offset: int
+        :param sink: Callable that receives the PageResult or None
+        :type sink: Callable
+        :return: Result of the page
+        :rtype: PageResult
+        """
+        result = page.result()
+        result.printed_number = page.pagenumber - page_offset
+        if self.collect_image_xrefs:
+            result.image_xrefs = tuple(sorted({img[0] for img in page.page.get_images()}))
+        self.page_results.append(result)
+        if sink is not None:
+            sink(result)
+        return result
+
+    def extract_page(self, page:Fitzpage):
+        """
+        extract_page runs the text extraction for the configured tier. The 
+        "quality" tier runs the full XHTML extraction, the "dict" tier renders 
+        XHTML and text from a single extraction, and the "fast" tier only 
+        extracts the plain text and leaves the XHTML empty.
+        Pages without text are skipped if the page classification is enabled.
+
+        :param page: A single page from the document
+        :type page: Fitzpage
+        :return: Extracted text with HTML format tags, empty for the fast tier
+        :rtype: str
+        """
+        if self.classify_pages:
+            page_class = page.classify_page()
+            self.page_classes[page_class] += 1
+            if page_class in (PAGE_EMPTY, PAGE_IMAGE):
+                self.log.info('Skipping text extraction for page %s with class %s',
+                              page.pagenumber, page_class)
+                return ''
+        if self.tier == 'fast':
+            self.extract_plain_text_from_page(page)
+            return ''
+        if self.tier == 'dict':
+            return self.extract_dict_text_from_page(page)
+        return self.extract_text_from_page(page)
+
+    def extract_plain_text_from_page(self, page:Fitzpage):
+        """
+        extract_plain_text_from_page runs only the plain text extraction and 
+        clean-up methods from the Fitzpage class without any XHTML processing.
+
+        :param page: A single page from the document
+        :type page: Fitzpage
+        :return: Extracted plain text
+        :rtype: str
+        """
+        self.log.debug('Entering method "extract_plain_text_from_page"')
+        page.get_block_text(False, join_lines=True)
+        if not page.text:
+            return page.text
+        page.fix_text_ligature_spaces()
+        if self.repeating_text_to_remove:
+            for text in self.repeating_text_to_remove:
+                page.remove_text_repeating(text)
+        if self.remove_page_numbers:
+            page.remove_text_page_number()
+        return page.text
+
+    def extract_dict_text_from_page(self, page:Fitzpage):
+        """
+        extract_dict_text_from_page renders XHTML and plain text from a single 
+        dictionary extraction without the paragraph recovery.
+
+        :param page: A single page from the document
+        :type page: Fitzpage
+        :return: Extracted text with HTML format tags
+        :rtype: str
+        """
+        self.log.debug('Entering method "extract_dict_text_from_page"')
+        page.get_dict_xhtml()
+        if not page.xhtml:
+            return page.xhtml
+        if self.repeating_text_to_remove:
+            for text in self.repeating_text_to_remove:
+                page.remove_xhtml_repeating(text)
+                page.remove_text_repeating(text)
+        if self.remove_page_numbers:
+            page.remove_xhtml_page_number()
+            page.remove_text_page_number()
+        return page.xhtml
+
     def extract_text_from_page(self, page:Fitzpage):
         """
         extract_text_from_page runs the XHTML text extraction methods from the 
@@ -180,7 +453,9 @@ class Fitzdoc():
         if self.repeating_text_to_remove:
             for text in self.repeating_text_to_remove:
                 page.remove_xhtml_repeating(text)
-        if self.cfg.cfg.fitz.text.remove_page_numbers:
+        if page.executed['fix_xhtml_line_breaks_aligned']:
+            self.aligned_pages += 1
+        if self.remove_page_numbers:
             page.remove_xhtml_page_number()
         return page.xhtml
 
@@ -188,48 +463,124 @@ class Fitzdoc():
         """
         detect_page_offset tries to detect the page numbering offset that 
         the page number can be removed from the detected text.
+        Pages are probed in a spread order over the whole document and the 
+        votes are tallied until one offset is confident enough. Only an 
+        ambiguous vote falls back to a scan of all remaining pages.
 
         :return: Offset to be added to page number iterator.
         :rtype: int
         """
         # ! There is no good handling what happens if there are no page numbers detected
         self.log.debug('Entering method "detect_page_offset"')
-        page_numbers = []
-        for pn, page in enumerate(self.doc):
-            p = Fitzpage(page, pn)
-            p.get_block_text(False)
-            numbers_on_page = []
-            for paragraph in p.textblocks:
-                # Find only strings that start with a number, see
-                # https://regextutorial.org/regex-for-numbers-and-ranges.php
-                m = re.match(r'\d+', paragraph)
-                if m is not None:
-                    numbers_on_page.append(m.group(0))
-                    # break
-            page_numbers.append(numbers_on_page)
+        pages = self.selected_pages
+        page_count = len(pages)
         # ? Return 0 if there are no pages
-        if len(page_numbers) == 0:
+        if page_count == 0:
             self.log.critical('Something went really wrong! Debugging needed!')
             return 0
-        potential_offsets = []
-        for pn, numbers in enumerate(page_numbers):
-            if not len(numbers) == 1:
-                continue
-            potential_offsets.append(pn-int(numbers[0]))
+        sample_pages = self.settings.fitz.text.offset_sample_pages
+        potential_offsets = Counter()
+        probed_pages = set()
+        for position in self._spread_page_order(page_count):
+            if len(probed_pages) >= sample_pages:
+                break
+            pn = pages[position]
+            probed_pages.add(pn)
+            offset = self._page_offset_candidate(pn)
+            if offset is not None:
+                potential_offsets[offset] += 1
+            if self._page_offset_confident(potential_offsets):
+                most_probable_offset = potential_offsets.most_common(1)[0][0]
+                self.log.info('Probable page offset: %d (sampled %d of %d pages)',
+                              most_probable_offset, len(probed_pages), page_count)
+                return most_probable_offset
+        # Ambiguous vote, scan the pages that were not sampled yet
+        if len(probed_pages) < page_count:
+            self.log.info('Page offset vote is ambiguous after %d pages, ' +
+                          'scanning all pages', len(probed_pages))
+            for pn in pages:
+                if pn in probed_pages:
+                    continue
+                offset = self._page_offset_candidate(pn)
+                if offset is not None:
+                    potential_offsets[offset] += 1
         # Return 0 if no line starts with a number
         if len(potential_offsets) == 0:
             self.log.warning('Could not find any potential page numbers in document')
             return 0
-        # For a discussion on this see
-        # https://stackoverflow.com/questions/6987285/find-the-item-with-maximum-occurrences-in-a-list
-        most_probable_offset = max(potential_offsets, key=potential_offsets.count)
+        most_probable_offset = potential_offsets.most_common(1)[0][0]
         self.log.info('Probable page offset: %d', most_probable_offset)
         return most_probable_offset
 
+    def _page_offset_candidate(self, pn:int):
+        """
+        _page_offset_candidate extracts the text blocks of a single page and 
+        derives the page offset if exactly one paragraph starts with a number.
+
+        :param pn: Index of the page in the document
+        :type pn: int
+        :return: Offset candidate of the page or None if there is no unique number
+        :rtype: int
+        """
+        p = Fitzpage(self.doc[pn], pn)
+        p.get_block_text(False)
+        numbers_on_page = []
+        for paragraph in p.textblocks:
+            # Find only strings that start with a number, see
+            # https://regextutorial.org/regex-for-numbers-and-ranges.php
+            m = re.match(r'\d+', paragraph)
+            if m is not None:
+                numbers_on_page.append(m.group(0))
+        if not len(numbers_on_page) == 1:
+            return None
+        return pn-int(numbers_on_page[0])
+
+    def _page_offset_confident(self, potential_offsets:Counter):
+        """
+        _page_offset_confident checks if the leading offset has enough votes and 
+        a large enough share of all votes to stop sampling.
+
+        :param potential_offsets: Votes for each offset candidate
+        :type potential_offsets: Counter
+        :return: True if the leading offset is confident
+        :rtype: bool
+        """
+        if not potential_offsets:
+            return False
+        votes = potential_offsets.most_common(1)[0][1]
+        total = sum(potential_offsets.values())
+        return (votes >= self.settings.fitz.text.offset_min_votes and
+                votes / total >= self.settings.fitz.text.offset_confidence)
+
+    @staticmethod
+    def _spread_page_order(page_count:int):
+        """
+        _spread_page_order yields all page indices of a document in an order 
+        that spreads the first pages over the whole document, e.g. 0, 8, 4, 12, 
+        2, 6, ... for 16 pages.
+
+        :param page_count: Number of pages in the document
+        :type page_count: int
+        :return: Generator with page indices
+        :rtype: Generator
+        """
+        step = 1 << page_count.bit_length()
+        seen = set()
+        while step >= 1:
+            for pn in range(0, page_count, step):
+                if pn not in seen:
+                    seen.add(pn)
+                    yield pn
+            step //= 2
+
     def detect_repeating_text(self):
         """
         detect_repeating_text analyzes the full text to find paragraphs with repeating 
         content.
+        The first pass streams the hashes of all normalized text blocks into a 
+        space-saving summary with a fixed number of counters. The second pass 
+        counts only the candidates exactly, so the memory usage does not depend 
+        on the size of the document.
         There is a very high risk that this method detects too many repeating text 
         blocks! User interaction is highly recommended.
 
@@ -238,31 +589,64 @@ class Fitzdoc():
         """
         self.log.debug('Entering method "detect_repeating_text"')
         detection_threshold = 5  # How often must paragraph texts repeat to count?
-        all_blocks = []
-        for pn, page in enumerate(self.doc):
-            p = Fitzpage(page, pn)
-            p.get_block_text(False)
-            if not p.textblocks:
-                continue
-            for paragraph in p.textblocks:
-                all_blocks.append(paragraph)
-        unique_paragraphs = Counter(all_blocks)
+        summary = SpaceSaving(self.settings.fitz.text.repeating_text_capacity)
+        for paragraph in self._iter_text_blocks():
+            summary.add(text_hash(paragraph))
+        candidates = summary.candidates(detection_threshold)
+        self.log.info('Found %d candidates for repeating text', len(candidates))
+        if not candidates:
+            return []
+        # Confirm the candidates with exact counts
+        counts = Counter()
+        paragraphs = {}  # First original text for each candidate hash
+        for paragraph in self._iter_text_blocks():
+            block_hash = text_hash(paragraph)
+            if block_hash in candidates:
+                counts[block_hash] += 1
+                paragraphs.setdefault(block_hash, paragraph)
         repeating_paragraphs = []
-        for paragraph, num in unique_paragraphs.items():
+        for block_hash, num in counts.items():
             if num > detection_threshold:
-                repeating_paragraphs.append((paragraph, num))
+                repeating_paragraphs.append((paragraphs[block_hash], num))
         return repeating_paragraphs
 
-    def extract_images(self):
+    def _iter_text_blocks(self):
+        """
+        _iter_text_blocks yields the text blocks of all selected pages one after 
+        another without keeping them in memory.
+
+        :return: Generator with the text blocks of the document
+        :rtype: Generator
+        """
+        for pn, page in self.iter_selected_pages():
+            p = Fitzpage(page, pn)
+            p.get_block_text(False)
+            yield from p.textblocks
+
+    def extract_images(self, sink=None):
         """Extract images from a PDF document and write them to the output directory.
         Inspired by https://github.com/pymupdf/PyMuPDF-Utilities/blob/master/examples/extract-images/extract-from-xref.py
         License: GNU GPL V3
         (c) 2018 Jorj X. McKie
         
         Some parts are rewritten for the purpose of this method.
+
+        :param sink: Callable that receives image data, name, xref, width and 
+        height of each image instead of writing files, e.g. ImageArchive.add
+        :type sink: Callable
         """
         self.log.debug('Entering method "extract_images"')
-        outfile = Outfile(self.file, self.cfg)
+        if (sum(self.page_classes.values()) == len(self.selected_pages) and
+                not self.page_classes[PAGE_IMAGE] and not self.page_classes[PAGE_MIXED]):
+            self.log.info('No page of "%s" shows an image, skipping image extraction',
+                          self.source)
+            return
+        outfile = archive = None
+        if sink is None:
+            outfile = Outfile(self.file, self.settings, self.document_id)
+            archive = outfile.image_archive()
+            if archive:
+                sink = archive.add
         #
         xref_count = self.doc.xref_length()
         softmasks = set()
@@ -271,9 +655,23 @@ class Fitzdoc():
         softmask_count = 0
         recover_count = 0
         remove_count = 0
+        x_min = self.settings.fitz.images.image_dimension_x_min
+        y_min = self.settings.fitz.images.image_dimension_y_min
+        size_min = self.settings.fitz.images.image_size_min
+        compression_limit = self.settings.fitz.images.compression_limit
+        if len(self.selected_pages) < self.doc.page_count:
+            # Only the images shown on the selected pages
+            xrefs = sorted({img[0] for pn, page in self.iter_selected_pages()
+                            for img in page.get_images(full=True)})
+        else:
+            xrefs = range(1, xref_count)
+        if sink:
+            # Images passed to a sink cannot be removed later, find the soft 
+            # masks before passing any image
+            softmasks = self.find_softmasks(xrefs)
         #
         # Loop over all cross references of the document
-        for xref in range(1, xref_count):
+        for xref in xrefs:
             try:
                 if self.doc.xref_get_key(xref, 'Subtype')[1] != '/Image':
                     # Skip all cross references that are not images
@@ -306,11 +704,10 @@ class Fitzdoc():
             height = imgdict['height']
             imgsize = len(imgdata)
             #
-            if width <= self.cfg.cfg.fitz.images.image_dimension_x_min or\
-               height <= self.cfg.cfg.fitz.images.image_dimension_y_min:
+            if width <= x_min or height <= y_min:
                 # Skip image if an edge is too small
                 continue
-            if imgsize < self.cfg.cfg.fitz.images.image_size_min:
+            if imgsize < size_min:
                 # Skip image if its total file size is too small
                 continue
             #
@@ -341,19 +738,25 @@ class Fitzdoc():
                 samplesize = width * height * 3
                 imgsize = len(imgdata)
             #
-            if imgsize / samplesize <= self.cfg.cfg.fitz.images.compression_limit:
+            if imgsize / samplesize <= compression_limit:
                 # Skip image if it's compressed to less than 5% (compression_limit) of its full size
                 # These are typically unicolor images that are of no interest
                 continue
             #
             # Write image
             imgname = str(xref) + '.' + extension
-            outfile.save_fitz_image(imgdata, imgname)
+            if sink:
+                sink(imgdata, imgname, xref, width, height)
+            else:
+                outfile.save_fitz_image(imgdata, imgname)
             img_count += 1
         #
         # Remove all soft masks that were written as image file because they slipped
         # through the previous filter process
-        if len(softmasks) > 0:
+        if archive:
+            remove_count = archive.remove(softmasks)
+            archive.close()
+        elif outfile and len(softmasks) > 0:
             remove_count = outfile.remove_fitz_softmasks(softmasks)
         #
         self.log.debug('Detected cross references: %d', xref_count)
@@ -363,7 +766,27 @@ class Fitzdoc():
         self.log.debug('Recovered transparency with soft masks: %d',
                        recover_count)
         self.log.debug('Cleanup of slipped soft masks: %d', remove_count)
-        self.log.debug('Finished image extraction for %s', self.doc.name)
+        self.log.debug('Finished image extraction for %s', self.source)
+
+    def find_softmasks(self, xrefs):
+        """
+        find_softmasks collects the soft masks of all images from the image 
+        dictionaries without decoding any image.
+
+        :param xrefs: Cross references to check
+        :type xrefs: Iterable
+        :return: Cross references of the soft masks
+        :rtype: set
+        """
+        softmasks = set()
+        for xref in xrefs:
+            try:
+                smask = self.doc.xref_get_key(xref, 'SMask')
+            except RuntimeError:
+                continue
+            if smask[0] == 'xref':
+                softmasks.add(int(smask[1].split()[0]))
+        return softmasks
 
     def recover_picture(self, doc:fitz.Document, imgdict):
         """Code from: https://github.com/pymupdf/PyMuPDF-Utilities/blob/master/examples/extract-images/extract-from-xref.py
@@ -5,10 +5,373 @@
  logging for logging and debugging
  re for regex replacements
  fitz from pymupdf to process PDF documents
+ pageresult for the compact result of a page
 """
 import logging
 import re
 import fitz
+from pageresult import PageResult
+
+# Page classes detected by Fitzpage.classify_page
+PAGE_EMPTY = 'empty'
+PAGE_IMAGE = 'image'
+PAGE_TEXT = 'text'
+PAGE_MIXED = 'mixed'
+
+
+# Replacements of HTML codes for non-ASCII characters in XHTML extractions
+# Replacements: https://de.wikipedia.org/wiki/Hilfe:Sonderzeichenreferenz
+XHTML_CHARACTERS = {
+    '&#x21;': '!',
+    '&#x23;': '#',
+    '&#x24;': '$',
+    '&#x25;': '%',
+    '&#x26;': '&',
+    '&#x27;': "'",
+    '&#x28;': '(',
+    '&#x29;': ')',
+    '&#x2a;': '*',
+    '&#x2b;': '+',
+    '&#x2c;': ',',
+    '&#x2e;': '.',
+    '&#x2f;': '/',
+    '&#x3a;': ':',
+    '&#x3b;': ';',
+    '&#x3d;': '=',
+    '&#x3f;': '?',
+    '&#x40;': '@',
+    '&#x5b;': '[',
+    '&#x5d;': ']',
+    '&#x5c;': '\\',
+    '&#xa0;': ' ',
+    '&#xa1;': '¡',
+    '&#xa2;': '¢',
+    '&#xa3;': '£',
+    '&#xa4;': '¤',
+    '&#xa5;': '¥',
+    '&#xa6;': '¦',
+    '&#xa7;': '§',
+    '&#xa8;': '¨',
+    '&#xa9;': '©',
+    '&#xaa;': 'ª',
+    '&#xab;': '«',
+    '&#xac;': '¬',
+    '&#xae;': '®',
+    '&#xaf;': '¯',
+    '&#xb0;': '°',
+    '&#xb1;': '±',
+    '&#xb2;': '²',
+    '&#xb3;': '³',
+    '&#xb4;': '´',
+    '&#xb5;': 'µ',
+    '&#xb6;': '¶',
+    '&#xb7;': '·',
+    '&#xb8;': '¸',
+    '&#xb9;': '¹',
+    '&#xba;': 'º',
+    '&#xbb;': '»',
+    '&#xbc;': '¼',
+    '&#xbd;': '½',
+    '&#xbe;': '¾',
+    '&#xbf;': '¿',
+    '&#xc0;': 'À',
+    '&#xc1;': 'Á',
+    '&#xc2;': 'Â',
+    '&#xc3;': 'Ã',
+    '&#xc4;': 'Ä',
+    '&#xc5;': 'Å',
+    '&#xc6;': 'Æ',
+    '&#xc7;': 'Ç',
+    '&#xc8;': 'È',
+    '&#xc9;': 'É',
+    '&#xca;': 'Ê',
+    '&#xcb;': 'Ë',
+    '&#xcc;': 'Ì',
+    '&#xcd;': 'Í',
+    '&#xce;': 'Î',
+    '&#xcf;': 'Ï',
+    '&#xd0;': 'Ð',
+    '&#xd1;': 'Ñ',
+    '&#xd2;': 'Ò',
+    '&#xd3;': 'Ó',
+    '&#xd4;': 'Ô',
+    '&#xd5;': 'Õ',
+    '&#xd6;': 'Ö',
+    '&#xd7;': '×',
+    '&#xd8;': 'Ø',
+    '&#xd9;': 'Ù',
+    '&#xda;': 'Ú',
+    '&#xdb;': 'Û',
+    '&#xdc;': 'Ü',
+    '&#xdd;': 'Ý',
+    '&#xde;': 'Þ',
+    '&#xdf;': 'ß',
+    '&#xe0;': 'à',
+    '&#xe1;': 'á',
+    '&#xe2;': 'â',
+    '&#xe3;': 'ã',
+    '&#xe4;': 'ä',
+    '&#xe5;': 'å',
+    '&#xe6;': 'æ',
+    '&#xe7;': 'ç',
+    '&#xe8;': 'è',
+    '&#xe9;': 'é',
+    '&#xea;': 'ê',
+    '&#xeb;': 'ë',
+    '&#xec;': 'ì',
+    '&#xed;': 'í',
+    '&#xee;': 'î',
+    '&#xef;': 'ï',
+    '&#xf0;': 'ð',
+    '&#xf1;': 'ñ',
+    '&#xf2;': 'ò',
+    '&#xf3;': 'ó',
+    '&#xf4;': 'ô',
+    '&#xf5;': 'õ',
+    '&#xf6;': 'ö',
+    '&#xf7;': '÷',
+    '&#xf8;': 'ø',
+    '&#xf9;': 'ù',
+    '&#xfa;': 'ú',
+    '&#xfb;': 'û',
+    '&#xfc;': 'ü',
+    '&#xfd;': 'ý',
+    '&#xfe;': 'þ',
+    '&#xff;': 'ÿ',
+    '&#x152;': 'Œ',
+    '&#x153;': 'œ',
+    '&#x101;': 'ā',
+    '&#x113;': 'ē',
+    '&#x11b;': 'ě',
+    '&#x12b;': 'ī',
+    '&#x14d;': 'ō',
+    '&#x16b;': 'ū',
+    '&#x1ce;': 'ǎ',
+    '&#x1d0;': 'ǐ',
+    '&#x1d2;': 'ǒ',
+    '&#x1d4;': 'ǔ',
+    '&#x1d6;': 'ǖ',
+    '&#x1d8;': 'ǘ',
+    '&#x1da;': 'ǚ',
+    '&#x1dc;': 'ǜ',
+    '&#x391;': 'Α',
+    '&#x392;': 'Β',
+    '&#x393;': 'Γ',
+    '&#x394;': 'Δ',
+    '&#x395;': 'Ε',
+    '&#x396;': 'Ζ',
+    '&#x397;': 'Η',
+    '&#x398;': 'Θ',
+    '&#x399;': 'Ι',
+    '&#x39a;': 'Κ',
+    '&#x39b;': 'Λ',
+    '&#x39c;': 'Μ',
+    '&#x39d;': 'Ν',
+    '&#x39e;': 'Ξ',
+    '&#x39f;': 'Ο',
+    '&#x3a0;': 'Π',
+    '&#x3a1;': 'Ρ',
+    '&#x3a3;': 'Σ',
+    '&#x3a4;': 'Τ',
+    '&#x3a5;': 'Υ',
+    '&#x3a6;': 'Φ',
+    '&#x3a7;': 'Χ',
+    '&#x3a8;': 'Ψ',
+    '&#x3a9;': 'Ω',
+    '&#x3b1;': 'α',
+    '&#x3b2;': 'β',
+    '&#x3b3;': 'γ',
+    '&#x3b4;': 'δ',
+    '&#x3b5;': 'ε',
+    '&#x3b6;': 'ζ',
+    '&#x3b7;': 'η',
+    '&#x3b8;': 'θ',
+    '&#x3b9;': 'ι',
+    '&#x3ba;': 'κ',
+    '&#x3bb;': 'λ',
+    '&#x3bc;': 'μ',
+    '&#x3bd;': 'ν',
+    '&#x3be;': 'ξ',
+    '&#x3bf;': 'ο',
+    '&#x3c0;': 'π',
+    '&#x3c1;': 'ρ',
+    '&#x3c2;': 'ς',
+    '&#x3c3;': 'σ',
+    '&#x3c4;': 'τ',
+    '&#x3c5;': 'υ',
+    '&#x3c6;': 'φ',
+    '&#x3c7;': 'χ',
+    '&#x3c8;': 'ψ',
+    '&#x3c9;': 'ω',
+    '&#x3d0;': 'ϐ',
+    '&#x3d1;': 'ϑ',
+    '&#x3d2;': 'ϒ',
+    '&#x3d5;': 'ϕ',
+    '&#x3d6;': 'ϖ',
+    '&#x3d7;': 'ϗ',
+    '&#x3d8;': 'Ϙ',
+    '&#x3d9;': 'ϙ',
+    '&#x3da;': 'Ϛ',
+    '&#x3db;': 'ϛ',
+    '&#x3dc;': 'Ϝ',
+    '&#x3dd;': 'ϝ',
+    '&#x3de;': 'Ϟ',
+    '&#x3df;': 'ϟ',
+    '&#x3f0;': 'ϰ',
+    '&#x3f1;': 'ϱ',
+    '&#x3f7;': 'Ϸ',
+    '&#x3f8;': 'ϸ',
+    '&#x3fb;': 'ϻ',
+    '&#x2032;': '′',
+    '&#x2033;': '″',
+    '&#x2044;': '⁄',
+    '&#x2111;': 'ℑ',
+    '&#x2118;': '℘',
+    '&#x211c;': 'ℜ',
+    '&#x2135;': 'ℵ',
+    '&#x2200;': '∀',
+    '&#x2202;': '∂',
+    '&#x2203;': '∃',
+    '&#x2205;': '∅',
+    '&#x2207;': '∇',
+    '&#x2208;': '∈',
+    '&#x2209;': '∉',
+    '&#x220b;': '∋',
+    '&#x220f;': '∏',
+    '&#x2211;': '∑',
+    '&#x2212;': '−',
+    '&#x2217;': '∗',
+    '&#x221a;': '√',
+    '&#x221d;': '∝',
+    '&#x221e;': '∞',
+    '&#x2220;': '∠',
+    '&#x2227;': '∧',
+    '&#x2228;': '∨',
+    '&#x2229;': '∩',
+    '&#x222a;': '∪',
+    '&#x222b;': '∫',
+    '&#x2234;': '∴',
+    '&#x223c;': '∼',
+    '&#x2245;': '≅',
+    '&#x2248;': '≈',
+    '&#x2260;': '≠',
+    '&#x2261;': '≡',
+    '&#x2264;': '≤',
+    '&#x2265;': '≥',
+    '&#x2282;': '⊂',
+    '&#x2283;': '⊃',
+    '&#x2284;': '⊄',
+    '&#x2286;': '⊆',
+    '&#x2287;': '⊇',
+    '&#x2295;': '⊕',
+    '&#x2297;': '⊗',
+    '&#x22a5;': '⊥',
+    '&#x22c5;': '⋅',
+    '&#x25ca;': '◊',
+    '&#x2011;': '‑',
+    '&#x2013;': '–',
+    '&#x2014;': '—',
+    '&#x2018;': '‘',
+    '&#x2019;': '’',
+    '&#x201a;': '‚',
+    '&#x201c;': '“',
+    '&#x201d;': '”',
+    '&#x201e;': '„',
+    '&#x2020;': '†',
+    '&#x2021;': '‡',
+    '&#x2022;': '•',
+    '&#x202f;': ' ',
+    '&#x2030;': '‰',
+    '&#x2039;': '‹',
+    '&#x203a;': '›',
+    '&#x20ac;': '€',
+    '&#x2122;': '™',
+    '&#x25cf;': '♠',
+    '&#x2663;': '♣',
+    '&#x2665;': '♥',
+    '&#x2666;': '♦',
+    '&#x2026;': '...',
+    '&#x10c;': 'Č',
+    '&#x25a0;': '■',
+    '&#x2009;': ' ',
+    '&lt;': '‹',
+    '&gt;': '›',
+    '&#x25ba;': '►',
+    '&#xfffd;': '.',
+    '&#x2751;': '❑',
+    '&#x25c6;': '◆',
+    '&#x2c7;': 'ˇ',
+    '&#x17d;': 'Ž',
+    '&#x17e;': 'ž',
+    '&#x2bc;': 'ʼ',
+    '&#x18f;': 'Ə',
+    '&#x2752;': '❒',
+    '&#x141;': 'Ł',
+    # This is a soft-hyphen but needs a symbol to handle it during paragraph recovery
+    '&#xad;': '※',
+    # Private use, could be anything, replaced during paragraph recovery
+    '&#xf0e9;': '⊂',
+    # Private use, could be anything, replaced during paragraph recovery
+    '&#xf0ea;': '⊂',
+    '&#xf051;': '⊂',
+    '&#xf0a1;': '⊂',
+    '&#xf04e;': '⊂',
+    # Ligatures
+    '&#xfb00; ': 'ff',
+    '&#xfb01; ': 'fi',
+    '&#xfb02; ': 'fl',
+    '&#xfb03; ': 'ffi',
+    '&#xfb04; ': 'ffl',
+    '&#xfb05; ': 'ft',
+    '&#xfb06; ': 'st',
+    '&#xfb00;': 'ff',
+    '&#xfb01;': 'fi',
+    '&#xfb02;': 'fl',
+    '&#xfb03;': 'ffi',
+    '&#xfb04;': 'ffl',
+    '&#xfb05;': 'ft',
+    '&#xfb06;': 'st',
+}
+# All HTML codes in XHTML extractions, including a trailing space for ligatures
+XHTML_CHARACTER_PATTERN = re.compile(r'&(?:#x[0-9a-f]+|lt|gt);(?: )?')
+# Tags of XHTML extractions
+XHTML_TAG_PATTERN = re.compile(r'<[^>]*>')
+# Headings that are directly followed by a paragraph
+INLINE_HEADING_PATTERN = re.compile(r'(</h[1-6]>)(?=<p>)')
+# Ligatures in dictionary extractions, including a trailing space
+LIGATURE_PATTERN = re.compile('([\ufb00-\ufb06]) ?')
+LIGATURES = {'\ufb00': 'ff', '\ufb01': 'fi', '\ufb02': 'fl', '\ufb03': 'ffi',
+             '\ufb04': 'ffl', '\ufb05': 'ft', '\ufb06': 'st'}
+# Character replacements for dictionary extractions, the same that the
+# paragraph recovery applies to XHTML and text extractions
+DICT_CHARACTERS = str.maketrans({'\xa0': ' ', '\u2009': ' ', '\u202f': ' ',
+                                 '\u2026': '...', '\xad': '', '\ufffd': '.',
+                                 '\uf0e9': '.', '\uf0ea': '.', '\uf051': '.',
+                                 '\uf0a1': '.', '\uf04e': '.'})
+# Characters that cannot be used in XHTML code directly
+DICT_XHTML_CHARACTERS = str.maketrans({'<': '‹', '>': '›'})
+
+
+def _replace_xhtml_character(match: re.Match):
+    """
+    _replace_xhtml_character returns the replacement for a single HTML code found 
+    by XHTML_CHARACTER_PATTERN. Unknown codes are kept unchanged.
+
+    :param match: Match of XHTML_CHARACTER_PATTERN
+    :type match: re.Match
+    :return: Replacement string
+    :rtype: str
+    """
+    code = match.group(0)
+    replacement = XHTML_CHARACTERS.get(code)
+    if replacement is not None:
+        return replacement
+    if code.endswith(' '):
+        # Only ligatures consume the following space
+        replacement = XHTML_CHARACTERS.get(code[:-1])
+        if replacement is not None:
+            return replacement + ' '
+    return code
 
 
 class Fitzpage():
@@ -18,11 +381,16 @@ class Fitzpage():
     some of the original formatting in old-school HTML without CSS.
     """
 
+    log = logging.getLogger('page')
+    __slots__ = ('page', 'pagenumber', 'index', 'text', 'textblocks', 'html', 'xhtml',
+                 'xhtml_ligatures', 'dicttext', 'page_class', 'executed',
+                 'text_new', 'xhtml_new', 'html_offset', 'text_offset',
+                 'i_text', 'i_html', 'ct', 'ch', 'mismatch')
+
     def __init__(self, page: fitz.Page, index: int):
-        self.log = logging.getLogger('page')
-        self.log.debug('Initializing page %s', str(index))
+        self.log.debug('Initializing page %s', index)
         self.page = page
-        self.pagenumber = str(self.page).split()[1]  # PDF page from document
+        self.pagenumber = page.number  # PDF page from document
         self.index = index  # Page number including offset
         self.text = ''  # Extracted text (by get_plain_text or get_block_text)
         self.textblocks = []  # Extracted text blocks by get_block_text
@@ -32,6 +400,7 @@ class Fitzpage():
         # processing ligatures
         # NOT USED, CODE IS STILL IN BUT DISABLED
         self.dicttext = {}  # Extracted dictionary by get_dict
+        self.page_class = ''  # Content class detected by classify_page
         self.executed = {'get_plain_text': False,
                          'get_block_text': False,
                          'fix_text_ligature_spaces': False,
@@ -41,22 +410,59 @@ class Fitzpage():
                          'repeating_text': [],
                          'get_html': False,
                          'get_dict_text': False,
+                         'get_dict_xhtml': False,
                          'get_xhtml': False,
                          'fix_xhtml_ligature_spaces': False,
                          'remove_xhtml_repeating': False,
                          'repeating_xhtml': [],
                          'remove_xhtml_page_number': False,
                          'fix_xhtml_line_breaks': False,
+                         'fix_xhtml_line_breaks_aligned': False,
                          'fix_xhtml_utf_characters': False}
-        self.text_new = ''
-        self.xhtml_new = ''
-        self.html_offset = 0
-        self.text_offset = 0
-        self.i_text = ''
-        self.i_html = ''
-        self.ct = ''
-        self.ch = ''
-        self.mismatch = False
+        # The state of the paragraph recovery is only set by
+        # _xhtml_line_breaks_recover_breaks when it is needed
+
+    def result(self):
+        """
+        result creates the compact result of the page that can be kept after 
+        the processing of the page is finished.
+
+        :return: Result of the page
+        :rtype: PageResult
+        """
+        return PageResult(self.pagenumber, self.index, self.text, self.xhtml,
+                          self.page_class, self.executed['fix_xhtml_line_breaks_aligned'])
+
+    def classify_page(self):
+        """
+        classify_page detects if a page contains text, images, both, or nothing 
+        at all. It only uses the bounding box log of MuPDF, which is much cheaper 
+        than any text extraction. Invisible text like an OCR layer counts as text.
+
+        :return: One of PAGE_EMPTY, PAGE_IMAGE, PAGE_TEXT, or PAGE_MIXED
+        :rtype: str
+        """
+        self.log.debug('Entering method "classify_page"')
+        has_text = False
+        has_image = False
+        for item_type, _ in self.page.get_bboxlog():
+            if item_type.endswith('-text'):
+                has_text = True
+            elif item_type in ('fill-image', 'fill-imgmask'):
+                has_image = True
+            if has_text and has_image:
+                break
+        if has_text and has_image:
+            self.page_class = PAGE_MIXED
+        elif has_text:
+            self.page_class = PAGE_TEXT
+        elif has_image:
+            self.page_class = PAGE_IMAGE
+        else:
+            self.page_class = PAGE_EMPTY
+        self.log.debug('Page %s with index %s classified as %s',
+                       self.pagenumber, self.index, self.page_class)
+        return self.page_class
 
     def get_plain_text(self, sorting: bool):
         """
@@ -80,13 +486,16 @@ class Fitzpage():
         self.executed['get_plain_text'] = True
         return self.text
 
-    def get_block_text(self, sorting: bool):
+    def get_block_text(self, sorting: bool, join_lines: bool = False):
         """
         get_block_text Extracts text from a PDF file block by block or 
         paragraph by paragraph
 
         :param sorting: True to attempt sorting the PDF elements from top to bottom
         :type sorting: bool
+        :param join_lines: True to join the lines of a block with a space instead 
+        of removing the line breaks, needed if the text is not aligned with XHTML
+        :type join_lines: bool
         :return: The detected text as one string
         :rtype: str
         """
@@ -101,7 +510,10 @@ class Fitzpage():
             # Remove page number
             # if block[4].startswith(str(self.index)) or block[4].endswith(str(self.index)):
             #     continue
-            self.textblocks.append(block[4].replace('\n', ''))
+            if join_lines:
+                self.textblocks.append(re.sub(r' *\n', ' ', block[4]).rstrip(' '))
+            else:
+                self.textblocks.append(block[4].replace('\n', ''))
         if len(self.textblocks) == 0:
             self.log.warning('Could not detect any text in block format ' +
                            'on page %s with index %s, attempting to get plain text',
@@ -213,7 +625,7 @@ class Fitzpage():
         else:
             self.log.debug(
                 'Attempting to remove the page number somewhere else on the page')
-            self.text = self.text.replace(f'\n{self.index}\n', '')
+            self.text = self.text.replace(f'\n{self.index}\n', '\n')
         self.executed['remove_text_page_number'] = True
         return self.text
 
@@ -309,6 +721,154 @@ class Fitzpage():
         self.executed['get_dict_text'] = True
         return self.dicttext
 
+    def get_dict_xhtml(self):
+        """
+        get_dict_xhtml renders the XHTML code and the block text from a single 
+        dictionary extraction. Each text block becomes a paragraph or a heading 
+        depending on its font size, like MuPDF does it for XHTML extractions, with 
+        bold and italic spans. Because XHTML and text come from the same blocks, 
+        they have identical paragraphs and fix_xhtml_line_breaks() is not needed.
+        It overwrites self.xhtml, self.text and self.textblocks.
+
+        :return: Text with basic HTML formatting.
+        :rtype: str
+        """
+        self.log.debug('Entering method "get_dict_xhtml"')
+        self.get_dict_text()
+        paragraphs = []  # Lists of tag and runs for each paragraph
+        for block in self.dicttext['blocks']:
+            if block['type'] != 0:
+                # Skip image blocks
+                continue
+            runs = self._dict_block_runs(block)
+            if not runs:
+                continue
+            if paragraphs and paragraphs[-1][1][-1][2].endswith('-'):
+                # Hyphenation at the end of a block, join the paragraphs. The 
+                # hyphen is removed from the text of the run before the XHTML 
+                # tags are added.
+                paragraphs[-1][1][-1][2] = paragraphs[-1][1][-1][2][:-1]
+                self._dict_join_runs(paragraphs[-1][1], runs)
+            elif paragraphs and paragraphs[-1][1][-1][2].endswith(' '):
+                # Fix multi-column-layout like _xhtml_replacements()
+                self._dict_join_runs(paragraphs[-1][1], runs)
+            else:
+                paragraphs.append([self._dict_block_tag(block), runs])
+        self.textblocks = [''.join([run_text for _, _, run_text in runs])
+                           for _, runs in paragraphs]
+        self.xhtml = ''
+        for tag, runs in paragraphs:
+            xhtml = ''.join([self._dict_run_xhtml(bold, italic, run_text)
+                             for bold, italic, run_text in runs if run_text])
+            self.xhtml += f'<{tag}>{xhtml}</{tag}>\n'
+        self.text = ''.join([text+'\n' for text in self.textblocks])
+        if self.xhtml == '':
+            self.log.warning('Could not detect any text in dictionary format ' +
+                             'on page %s with index %s',
+                             self.pagenumber, self.index)
+        self.executed['get_dict_xhtml'] = True
+        return self.xhtml
+
+    @staticmethod
+    def _dict_block_runs(block: dict):
+        """
+        _dict_block_runs joins the spans of all lines of a text block into runs 
+        with identical formatting. Helper method for get_dict_xhtml().
+
+        :param block: Text block of a dictionary extraction
+        :type block: dict
+        :return: List of tuples with bold flag, italic flag, and text
+        :rtype: list
+        """
+        runs = []
+        for line in block['lines']:
+            if runs and runs[-1][2].endswith('-'):
+                # Hyphenation at the end of a line, removed like MuPDF does it 
+                # for XHTML extractions with fitz.TEXT_DEHYPHENATE
+                runs[-1][2] = runs[-1][2][:-1]
+            elif runs and not runs[-1][2].endswith(' '):
+                # Lines within a paragraph are separated by a space
+                runs[-1][2] += ' '
+            for span in line['spans']:
+                text = LIGATURE_PATTERN.sub(lambda m: LIGATURES[m.group(1)], span['text'])
+                text = text.translate(DICT_CHARACTERS)
+                if not text:
+                    continue
+                bold = bool(span['flags'] & fitz.TEXT_FONT_BOLD)
+                italic = bool(span['flags'] & fitz.TEXT_FONT_ITALIC)
+                if text.isspace() and runs:
+                    # Formatting of spaces is not needed
+                    runs[-1][2] += text
+                elif runs and runs[-1][0] == bold and runs[-1][1] == italic:
+                    runs[-1][2] += text
+                else:
+                    runs.append([bold, italic, text])
+        if runs and runs[-1][2].isspace():
+            runs.pop()
+        return runs
+
+    @staticmethod
+    def _dict_join_runs(runs: list, more_runs: list):
+        """
+        _dict_join_runs appends the runs of a text block to the runs of the 
+        previous paragraph. A word that continues with the same formatting stays 
+        in one run. Helper method for get_dict_xhtml().
+
+        :param runs: Runs of the previous paragraph, changed in place
+        :type runs: list
+        :param more_runs: Runs of the following text block
+        :type more_runs: list
+        """
+        if runs[-1][0] == more_runs[0][0] and runs[-1][1] == more_runs[0][1]:
+            runs[-1][2] += more_runs[0][2]
+            more_runs = more_runs[1:]
+        runs.extend(more_runs)
+
+    @staticmethod
+    def _dict_run_xhtml(bold: bool, italic: bool, text: str):
+        """
+        _dict_run_xhtml creates the XHTML code for a run of text with identical 
+        formatting. Helper method for get_dict_xhtml().
+
+        :param bold: True for bold text
+        :type bold: bool
+        :param italic: True for italic text
+        :type italic: bool
+        :param text: Text of the run
+        :type text: str
+        :return: XHTML code of the run
+        :rtype: str
+        """
+        xhtml = text.translate(DICT_XHTML_CHARACTERS)
+        if text.isspace():
+            return xhtml
+        if italic:
+            xhtml = f'<i>{xhtml}</i>'
+        if bold:
+            xhtml = f'<b>{xhtml}</b>'
+        return xhtml
+
+    @staticmethod
+    def _dict_block_tag(block: dict):
+        """
+        _dict_block_tag determines the XHTML tag for a text block by the font 
+        size of its first span with the same limits that MuPDF uses for XHTML 
+        extractions. Helper method for get_dict_xhtml().
+
+        :param block: Text block of a dictionary extraction
+        :type block: dict
+        :return: Tag name, e.g. "p" or "h2"
+        :rtype: str
+        """
+        size = block['lines'][0]['spans'][0]['size'] if block['lines'][0]['spans'] else 0
+        if size >= 20:
+            return 'h1'
+        if size >= 15:
+            return 'h2'
+        if size >= 12:
+            return 'h3'
+        return 'p'
+
     def get_xhtml(self):
         """
         get_xhtml extracts text from a PDF document in XHTML format.
@@ -425,17 +985,12 @@ class Fitzpage():
             self.log.warning(
                 'No xhtml data available, aborting remove_xhtml_page_number')
             return self.xhtml
-        xhtml = ''
-        for line in self.xhtml.split('\n'):
-            if line == str(self.index):
-                continue
-            elif '>'+str(self.index)+'<' in line:
-                continue
-            elif line == '':
-                continue
-            else:
-                xhtml += line+'\n'
-        self.xhtml = xhtml
+        index = str(self.index)
+        tagged_index = '>'+index+'<'
+        # Collect the remaining lines and join them once
+        lines = [line for line in self.xhtml.split('\n')
+                 if line and line != index and tagged_index not in line]
+        self.xhtml = ''.join([line+'\n' for line in lines])
         self.executed['remove_xhtml_page_number'] = True
         return self.xhtml
 
@@ -458,17 +1013,7 @@ class Fitzpage():
         _xhtml_inline_headings adds additional line breaks for in-line headings 
         in HTML format. Helper method for fix_xhtml_line_breaks().
         """
-        missing_line_breaks = [(hits.start(0), hits.end(0))
-                               for hits in re.finditer(r'</h[1-6]><p>', self.xhtml)]
-        out = ''
-        if len(missing_line_breaks) > 0:
-            start = 0
-            for first, last in missing_line_breaks:
-                out += self.xhtml[start:first+5]+'\n'
-                start = first+5
-            out += self.xhtml[start:]
-        if out != '':
-            self.xhtml = out
+        self.xhtml = INLINE_HEADING_PATTERN.sub('\\1\n', self.xhtml)
         # splithtml = self.xhtml.split('\n')
         # inline_heading_count = self.xhtml.count('><p>')
         # # Fix in-line headings in text
@@ -513,19 +1058,17 @@ class Fitzpage():
         :return: False if there was an error during paragraph recovery
         :rtype: bool
         """
-        # Column breaks with hyphenation between them
-        # The fitz.TEXT_DEHYPHENATE will merge the columns together on text
-        # extraction but not for XHTML extraction. Column breaks without
-        # hyphenation stay separate in both and must be treated later
-        self.xhtml = self.xhtml.replace('-</i></p>\n<p><i>', '')
-        self.xhtml = self.xhtml.replace('-</b></p>\n<p><b>', '')
-        self.xhtml = self.xhtml.replace('-</p>\n<p>', '')
         # Analyze the text line by line
         html_len = len(self.xhtml)
         text_len = len(self.text)
         character_count = max(text_len, html_len)
         self.text_new = ''
         self.xhtml_new = ''
+        self.i_text = 0
+        self.i_html = 0
+        self.ct = ''
+        self.ch = ''
+        self.mismatch = False
         # Go through the text
         self.html_offset = 0
         self.text_offset = 0
@@ -582,6 +1125,37 @@ class Fitzpage():
         self.text = self.text_new
         return True
 
+    def _xhtml_join_column_hyphens(self):
+        """
+        _xhtml_join_column_hyphens joins paragraphs that are split by a column 
+        break with hyphenation. Helper method for fix_xhtml_line_breaks().
+        """
+        # Column breaks with hyphenation between them
+        # The fitz.TEXT_DEHYPHENATE will merge the columns together on text
+        # extraction but not for XHTML extraction. Column breaks without
+        # hyphenation stay separate in both and must be treated later
+        self.xhtml = self.xhtml.replace('-</i></p>\n<p><i>', '')
+        self.xhtml = self.xhtml.replace('-</b></p>\n<p><b>', '')
+        self.xhtml = self.xhtml.replace('-</p>\n<p>', '')
+
+    def _xhtml_line_breaks_aligned(self):
+        """
+        _xhtml_line_breaks_aligned checks if the XHTML code and the block text 
+        have the same paragraphs already. This is the case when both have the 
+        same number of line breaks and the XHTML code without tags is identical 
+        to the text apart from spaces. The block text loses the space where two 
+        lines of a paragraph are joined, the recovery keeps the spaces of the 
+        XHTML code anyway. The character-wise recovery of the paragraphs would 
+        not change anything in that case and can be skipped.
+
+        :return: True if the paragraphs of XHTML and text are identical
+        :rtype: bool
+        """
+        if self.xhtml.count('\n') != self.text.count('\n'):
+            return False
+        return (XHTML_TAG_PATTERN.sub('', self.xhtml).replace(' ', '') ==
+                self.text.replace(' ', ''))
+
     def _add_characters(self):
         """
         _add_characters assembles the new text and XHTML variables and handles some 
@@ -769,7 +1343,13 @@ class Fitzpage():
         # self._xhtml_line_breaks_text_processing()
         self.get_block_text(False)
         self.fix_text_ligature_spaces()
-        self._xhtml_line_breaks_recover_breaks()
+        self._xhtml_join_column_hyphens()
+        if self._xhtml_line_breaks_aligned():
+            self.log.debug('Paragraphs of text and XHTML match on page %s, ' +
+                           'skipping paragraph recovery', self.pagenumber)
+            self.executed['fix_xhtml_line_breaks_aligned'] = True
+        else:
+            self._xhtml_line_breaks_recover_breaks()
         # splithtml = self._xhtml_line_breaks_recover_breaks()
         # self._xhtml_line_breaks_assemble_html(splithtml)
         self._xhtml_inline_headings()
@@ -800,317 +1380,9 @@ class Fitzpage():
                 'No xhtml data available, aborting fix_xhtml_utf_characters')
             return self.xhtml
         # Replacements: https://de.wikipedia.org/wiki/Hilfe:Sonderzeichenreferenz
+        # All HTML codes are replaced in a single pass over the XHTML code
         self.xhtml = self.xhtml.replace('&amp;', '&')
-        self.xhtml = self.xhtml.replace('&#x21;', '!')
-        self.xhtml = self.xhtml.replace('&#x23;', '#')
-        self.xhtml = self.xhtml.replace('&#x24;', '$')
-        self.xhtml = self.xhtml.replace('&#x25;', '%')
-        self.xhtml = self.xhtml.replace('&#x26;', '&')
-        self.xhtml = self.xhtml.replace('&#x27;', "'")
-        self.xhtml = self.xhtml.replace('&#x28;', '(')
-        self.xhtml = self.xhtml.replace('&#x29;', ')')
-        self.xhtml = self.xhtml.replace('&#x2a;', '*')
-        self.xhtml = self.xhtml.replace('&#x2b;', '+')
-        self.xhtml = self.xhtml.replace('&#x2c;', ',')
-        self.xhtml = self.xhtml.replace('&#x2e;', '.')
-        self.xhtml = self.xhtml.replace('&#x2f;', '/')
-        self.xhtml = self.xhtml.replace('&#x3a;', ':')
-        self.xhtml = self.xhtml.replace('&#x3b;', ';')
-        self.xhtml = self.xhtml.replace('&#x3d;', '=')
-        self.xhtml = self.xhtml.replace('&#x3f;', '?')
-        self.xhtml = self.xhtml.replace('&#x40;', '@')
-        self.xhtml = self.xhtml.replace('&#x5b;', '[')
-        self.xhtml = self.xhtml.replace('&#x5d;', ']')
-        self.xhtml = self.xhtml.replace('&#x5c;', '\\')
-        self.xhtml = self.xhtml.replace('&#xa0;', ' ')
-        self.xhtml = self.xhtml.replace('&#xa1;', '¡')
-        self.xhtml = self.xhtml.replace('&#xa2;', '¢')
-        self.xhtml = self.xhtml.replace('&#xa3;', '£')
-        self.xhtml = self.xhtml.replace('&#xa4;', '¤')
-        self.xhtml = self.xhtml.replace('&#xa5;', '¥')
-        self.xhtml = self.xhtml.replace('&#xa6;', '¦')
-        self.xhtml = self.xhtml.replace('&#xa7;', '§')
-        self.xhtml = self.xhtml.replace('&#xa8;', '¨')
-        self.xhtml = self.xhtml.replace('&#xa9;', '©')
-        self.xhtml = self.xhtml.replace('&#xaa;', 'ª')
-        self.xhtml = self.xhtml.replace('&#xab;', '«')
-        self.xhtml = self.xhtml.replace('&#xac;', '¬')
-        self.xhtml = self.xhtml.replace('&#xae;', '®')
-        self.xhtml = self.xhtml.replace('&#xaf;', '¯')
-        self.xhtml = self.xhtml.replace('&#xb0;', '°')
-        self.xhtml = self.xhtml.replace('&#xb1;', '±')
-        self.xhtml = self.xhtml.replace('&#xb2;', '²')
-        self.xhtml = self.xhtml.replace('&#xb3;', '³')
-        self.xhtml = self.xhtml.replace('&#xb4;', '´')
-        self.xhtml = self.xhtml.replace('&#xb5;', 'µ')
-        self.xhtml = self.xhtml.replace('&#xb6;', '¶')
-        self.xhtml = self.xhtml.replace('&#xb7;', '·')
-        self.xhtml = self.xhtml.replace('&#xb8;', '¸')
-        self.xhtml = self.xhtml.replace('&#xb9;', '¹')
-        self.xhtml = self.xhtml.replace('&#xba;', 'º')
-        self.xhtml = self.xhtml.replace('&#xbb;', '»')
-        self.xhtml = self.xhtml.replace('&#xbc;', '¼')
-        self.xhtml = self.xhtml.replace('&#xbd;', '½')
-        self.xhtml = self.xhtml.replace('&#xbe;', '¾')
-        self.xhtml = self.xhtml.replace('&#xbf;', '¿')
-        self.xhtml = self.xhtml.replace('&#xc0;', 'À')
-        self.xhtml = self.xhtml.replace('&#xc1;', 'Á')
-        self.xhtml = self.xhtml.replace('&#xc2;', 'Â')
-        self.xhtml = self.xhtml.replace('&#xc3;', 'Ã')
-        self.xhtml = self.xhtml.replace('&#xc4;', 'Ä')
-        self.xhtml = self.xhtml.replace('&#xc5;', 'Å')
-        self.xhtml = self.xhtml.replace('&#xc6;', 'Æ')
-        self.xhtml = self.xhtml.replace('&#xc7;', 'Ç')
-        self.xhtml = self.xhtml.replace('&#xc8;', 'È')
-        self.xhtml = self.xhtml.replace('&#xc9;', 'É')
-        self.xhtml = self.xhtml.replace('&#xca;', 'Ê')
-        self.xhtml = self.xhtml.replace('&#xcb;', 'Ë')
-        self.xhtml = self.xhtml.replace('&#xcc;', 'Ì')
-        self.xhtml = self.xhtml.replace('&#xcd;', 'Í')
-        self.xhtml = self.xhtml.replace('&#xce;', 'Î')
-        self.xhtml = self.xhtml.replace('&#xcf;', 'Ï')
-        self.xhtml = self.xhtml.replace('&#xd0;', 'Ð')
-        self.xhtml = self.xhtml.replace('&#xd1;', 'Ñ')
-        self.xhtml = self.xhtml.replace('&#xd2;', 'Ò')
-        self.xhtml = self.xhtml.replace('&#xd3;', 'Ó')
-        self.xhtml = self.xhtml.replace('&#xd4;', 'Ô')
-        self.xhtml = self.xhtml.replace('&#xd5;', 'Õ')
-        self.xhtml = self.xhtml.replace('&#xd6;', 'Ö')
-        self.xhtml = self.xhtml.replace('&#xd7;', '×')
-        self.xhtml = self.xhtml.replace('&#xd8;', 'Ø')
-        self.xhtml = self.xhtml.replace('&#xd9;', 'Ù')
-        self.xhtml = self.xhtml.replace('&#xda;', 'Ú')
-        self.xhtml = self.xhtml.replace('&#xdb;', 'Û')
-        self.xhtml = self.xhtml.replace('&#xdc;', 'Ü')
-        self.xhtml = self.xhtml.replace('&#xdd;', 'Ý')
-        self.xhtml = self.xhtml.replace('&#xde;', 'Þ')
-        self.xhtml = self.xhtml.replace('&#xdf;', 'ß')
-        self.xhtml = self.xhtml.replace('&#xe0;', 'à')
-        self.xhtml = self.xhtml.replace('&#xe1;', 'á')
-        self.xhtml = self.xhtml.replace('&#xe2;', 'â')
-        self.xhtml = self.xhtml.replace('&#xe3;', 'ã')
-        self.xhtml = self.xhtml.replace('&#xe4;', 'ä')
-        self.xhtml = self.xhtml.replace('&#xe5;', 'å')
-        self.xhtml = self.xhtml.replace('&#xe6;', 'æ')
-        self.xhtml = self.xhtml.replace('&#xe7;', 'ç')
-        self.xhtml = self.xhtml.replace('&#xe8;', 'è')
-        self.xhtml = self.xhtml.replace('&#xe9;', 'é')
-        self.xhtml = self.xhtml.replace('&#xea;', 'ê')
-        self.xhtml = self.xhtml.replace('&#xeb;', 'ë')
-        self.xhtml = self.xhtml.replace('&#xec;', 'ì')
-        self.xhtml = self.xhtml.replace('&#xed;', 'í')
-        self.xhtml = self.xhtml.replace('&#xee;', 'î')
-        self.xhtml = self.xhtml.replace('&#xef;', 'ï')
-        self.xhtml = self.xhtml.replace('&#xf0;', 'ð')
-        self.xhtml = self.xhtml.replace('&#xf1;', 'ñ')
-        self.xhtml = self.xhtml.replace('&#xf2;', 'ò')
-        self.xhtml = self.xhtml.replace('&#xf3;', 'ó')
-        self.xhtml = self.xhtml.replace('&#xf4;', 'ô')
-        self.xhtml = self.xhtml.replace('&#xf5;', 'õ')
-        self.xhtml = self.xhtml.replace('&#xf6;', 'ö')
-        self.xhtml = self.xhtml.replace('&#xf7;', '÷')
-        self.xhtml = self.xhtml.replace('&#xf8;', 'ø')
-        self.xhtml = self.xhtml.replace('&#xf9;', 'ù')
-        self.xhtml = self.xhtml.replace('&#xfa;', 'ú')
-        self.xhtml = self.xhtml.replace('&#xfb;', 'û')
-        self.xhtml = self.xhtml.replace('&#xfc;', 'ü')
-        self.xhtml = self.xhtml.replace('&#xfd;', 'ý')
-        self.xhtml = self.xhtml.replace('&#xfe;', 'þ')
-        self.xhtml = self.xhtml.replace('&#xff;', 'ÿ')
-        self.xhtml = self.xhtml.replace('&#x152;', 'Œ')
-        self.xhtml = self.xhtml.replace('&#x153;', 'œ')
-        self.xhtml = self.xhtml.replace('&#x101;', 'ā')
-        self.xhtml = self.xhtml.replace('&#x113;', 'ē')
-        self.xhtml = self.xhtml.replace('&#x11b;', 'ě')
-        self.xhtml = self.xhtml.replace('&#x12b;', 'ī')
-        self.xhtml = self.xhtml.replace('&#x14d;', 'ō')
-        self.xhtml = self.xhtml.replace('&#x16b;', 'ū')
-        self.xhtml = self.xhtml.replace('&#x1ce;', 'ǎ')
-        self.xhtml = self.xhtml.replace('&#x1d0;', 'ǐ')
-        self.xhtml = self.xhtml.replace('&#x1d2;', 'ǒ')
-        self.xhtml = self.xhtml.replace('&#x1d4;', 'ǔ')
-        self.xhtml = self.xhtml.replace('&#x1d6;', 'ǖ')
-        self.xhtml = self.xhtml.replace('&#x1d8;', 'ǘ')
-        self.xhtml = self.xhtml.replace('&#x1da;', 'ǚ')
-        self.xhtml = self.xhtml.replace('&#x1dc;', 'ǜ')
-        self.xhtml = self.xhtml.replace('&#x391;', 'Α')
-        self.xhtml = self.xhtml.replace('&#x392;', 'Β')
-        self.xhtml = self.xhtml.replace('&#x393;', 'Γ')
-        self.xhtml = self.xhtml.replace('&#x394;', 'Δ')
-        self.xhtml = self.xhtml.replace('&#x395;', 'Ε')
-        self.xhtml = self.xhtml.replace('&#x396;', 'Ζ')
-        self.xhtml = self.xhtml.replace('&#x397;', 'Η')
-        self.xhtml = self.xhtml.replace('&#x398;', 'Θ')
-        self.xhtml = self.xhtml.replace('&#x399;', 'Ι')
-        self.xhtml = self.xhtml.replace('&#x39a;', 'Κ')
-        self.xhtml = self.xhtml.replace('&#x39b;', 'Λ')
-        self.xhtml = self.xhtml.replace('&#x39c;', 'Μ')
-        self.xhtml = self.xhtml.replace('&#x39d;', 'Ν')
-        self.xhtml = self.xhtml.replace('&#x39e;', 'Ξ')
-        self.xhtml = self.xhtml.replace('&#x39f;', 'Ο')
-        self.xhtml = self.xhtml.replace('&#x3a0;', 'Π')
-        self.xhtml = self.xhtml.replace('&#x3a1;', 'Ρ')
-        self.xhtml = self.xhtml.replace('&#x3a3;', 'Σ')
-        self.xhtml = self.xhtml.replace('&#x3a4;', 'Τ')
-        self.xhtml = self.xhtml.replace('&#x3a5;', 'Υ')
-        self.xhtml = self.xhtml.replace('&#x3a6;', 'Φ')
-        self.xhtml = self.xhtml.replace('&#x3a7;', 'Χ')
-        self.xhtml = self.xhtml.replace('&#x3a8;', 'Ψ')
-        self.xhtml = self.xhtml.replace('&#x3a9;', 'Ω')
-        self.xhtml = self.xhtml.replace('&#x3b1;', 'α')
-        self.xhtml = self.xhtml.replace('&#x3b2;', 'β')
-        self.xhtml = self.xhtml.replace('&#x3b3;', 'γ')
-        self.xhtml = self.xhtml.replace('&#x3b4;', 'δ')
-        self.xhtml = self.xhtml.replace('&#x3b5;', 'ε')
-        self.xhtml = self.xhtml.replace('&#x3b6;', 'ζ')
-        self.xhtml = self.xhtml.replace('&#x3b7;', 'η')
-        self.xhtml = self.xhtml.replace('&#x3b8;', 'θ')
-        self.xhtml = self.xhtml.replace('&#x3b9;', 'ι')
-        self.xhtml = self.xhtml.replace('&#x3ba;', 'κ')
-        self.xhtml = self.xhtml.replace('&#x3bb;', 'λ')
-        self.xhtml = self.xhtml.replace('&#x3bc;', 'μ')
-        self.xhtml = self.xhtml.replace('&#x3bd;', 'ν')
-        self.xhtml = self.xhtml.replace('&#x3be;', 'ξ')
-        self.xhtml = self.xhtml.replace('&#x3bf;', 'ο')
-        self.xhtml = self.xhtml.replace('&#x3c0;', 'π')
-        self.xhtml = self.xhtml.replace('&#x3c1;', 'ρ')
-        self.xhtml = self.xhtml.replace('&#x3c2;', 'ς')
-        self.xhtml = self.xhtml.replace('&#x3c3;', 'σ')
-        self.xhtml = self.xhtml.replace('&#x3c4;', 'τ')
-        self.xhtml = self.xhtml.replace('&#x3c5;', 'υ')
-        self.xhtml = self.xhtml.replace('&#x3c6;', 'φ')
-        self.xhtml = self.xhtml.replace('&#x3c7;', 'χ')
-        self.xhtml = self.xhtml.replace('&#x3c8;', 'ψ')
-        self.xhtml = self.xhtml.replace('&#x3c9;', 'ω')
-        self.xhtml = self.xhtml.replace('&#x3d0;', 'ϐ')
-        self.xhtml = self.xhtml.replace('&#x3d1;', 'ϑ')
-        self.xhtml = self.xhtml.replace('&#x3d2;', 'ϒ')
-        self.xhtml = self.xhtml.replace('&#x3d5;', 'ϕ')
-        self.xhtml = self.xhtml.replace('&#x3d6;', 'ϖ')
-        self.xhtml = self.xhtml.replace('&#x3d7;', 'ϗ')
-        self.xhtml = self.xhtml.replace('&#x3d8;', 'Ϙ')
-        self.xhtml = self.xhtml.replace('&#x3d9;', 'ϙ')
-        self.xhtml = self.xhtml.replace('&#x3da;', 'Ϛ')
-        self.xhtml = self.xhtml.replace('&#x3db;', 'ϛ')
-        self.xhtml = self.xhtml.replace('&#x3dc;', 'Ϝ')
-        self.xhtml = self.xhtml.replace('&#x3dd;', 'ϝ')
-        self.xhtml = self.xhtml.replace('&#x3de;', 'Ϟ')
-        self.xhtml = self.xhtml.replace('&#x3df;', 'ϟ')
-        self.xhtml = self.xhtml.replace('&#x3f0;', 'ϰ')
-        self.xhtml = self.xhtml.replace('&#x3f1;', 'ϱ')
-        self.xhtml = self.xhtml.replace('&#x3f7;', 'Ϸ')
-        self.xhtml = self.xhtml.replace('&#x3f8;', 'ϸ')
-        self.xhtml = self.xhtml.replace('&#x3ba;', 'Ϻ')
-        self.xhtml = self.xhtml.replace('&#x3fb;', 'ϻ')
-        self.xhtml = self.xhtml.replace('&#x2032;', '′')
-        self.xhtml = self.xhtml.replace('&#x2033;', '″')
-        self.xhtml = self.xhtml.replace('&#x2044;', '⁄')
-        self.xhtml = self.xhtml.replace('&#x2111;', 'ℑ')
-        self.xhtml = self.xhtml.replace('&#x2118;', '℘')
-        self.xhtml = self.xhtml.replace('&#x211c;', 'ℜ')
-        self.xhtml = self.xhtml.replace('&#x2135;', 'ℵ')
-        self.xhtml = self.xhtml.replace('&#x2200;', '∀')
-        self.xhtml = self.xhtml.replace('&#x2202;', '∂')
-        self.xhtml = self.xhtml.replace('&#x2203;', '∃')
-        self.xhtml = self.xhtml.replace('&#x2205;', '∅')
-        self.xhtml = self.xhtml.replace('&#x2207;', '∇')
-        self.xhtml = self.xhtml.replace('&#x2208;', '∈')
-        self.xhtml = self.xhtml.replace('&#x2209;', '∉')
-        self.xhtml = self.xhtml.replace('&#x220b;', '∋')
-        self.xhtml = self.xhtml.replace('&#x220f;', '∏')
-        self.xhtml = self.xhtml.replace('&#x2211;', '∑')
-        self.xhtml = self.xhtml.replace('&#x2212;', '−')
-        self.xhtml = self.xhtml.replace('&#x2217;', '∗')
-        self.xhtml = self.xhtml.replace('&#x221a;', '√')
-        self.xhtml = self.xhtml.replace('&#x221d;', '∝')
-        self.xhtml = self.xhtml.replace('&#x221e;', '∞')
-        self.xhtml = self.xhtml.replace('&#x2220;', '∠')
-        self.xhtml = self.xhtml.replace('&#x2227;', '∧')
-        self.xhtml = self.xhtml.replace('&#x2228;', '∨')
-        self.xhtml = self.xhtml.replace('&#x2229;', '∩')
-        self.xhtml = self.xhtml.replace('&#x222a;', '∪')
-        self.xhtml = self.xhtml.replace('&#x222b;', '∫')
-        self.xhtml = self.xhtml.replace('&#x2234;', '∴')
-        self.xhtml = self.xhtml.replace('&#x223c;', '∼')
-        self.xhtml = self.xhtml.replace('&#x2245;', '≅')
-        self.xhtml = self.xhtml.replace('&#x2248;', '≈')
-        self.xhtml = self.xhtml.replace('&#x2260;', '≠')
-        self.xhtml = self.xhtml.replace('&#x2261;', '≡')
-        self.xhtml = self.xhtml.replace('&#x2264;', '≤')
-        self.xhtml = self.xhtml.replace('&#x2265;', '≥')
-        self.xhtml = self.xhtml.replace('&#x2282;', '⊂')
-        self.xhtml = self.xhtml.replace('&#x2283;', '⊃')
-        self.xhtml = self.xhtml.replace('&#x2284;', '⊄')
-        self.xhtml = self.xhtml.replace('&#x2286;', '⊆')
-        self.xhtml = self.xhtml.replace('&#x2287;', '⊇')
-        self.xhtml = self.xhtml.replace('&#x2295;', '⊕')
-        self.xhtml = self.xhtml.replace('&#x2297;', '⊗')
-        self.xhtml = self.xhtml.replace('&#x22a5;', '⊥')
-        self.xhtml = self.xhtml.replace('&#x22c5;', '⋅')
-        self.xhtml = self.xhtml.replace('&#x25ca;', '◊')
-        self.xhtml = self.xhtml.replace('&#x2011;', '‑')
-        self.xhtml = self.xhtml.replace('&#x2013;', '–')
-        self.xhtml = self.xhtml.replace('&#x2014;', '—')
-        self.xhtml = self.xhtml.replace('&#x2018;', '‘')
-        self.xhtml = self.xhtml.replace('&#x2019;', '’')
-        self.xhtml = self.xhtml.replace('&#x201a;', '‚')
-        self.xhtml = self.xhtml.replace('&#x201c;', '“')
-        self.xhtml = self.xhtml.replace('&#x201d;', '”')
-        self.xhtml = self.xhtml.replace('&#x201e;', '„')
-        self.xhtml = self.xhtml.replace('&#x2020;', '†')
-        self.xhtml = self.xhtml.replace('&#x2021;', '‡')
-        self.xhtml = self.xhtml.replace('&#x2022;', '•')
-        self.xhtml = self.xhtml.replace('&#x202f;', ' ')
-        self.xhtml = self.xhtml.replace('&#x2030;', '‰')
-        self.xhtml = self.xhtml.replace('&#x2039;', '‹')
-        self.xhtml = self.xhtml.replace('&#x203a;', '›')
-        self.xhtml = self.xhtml.replace('&#x20ac;', '€')
-        self.xhtml = self.xhtml.replace('&#x2122;', '™')
-        self.xhtml = self.xhtml.replace('&#x25cf;', '♠')
-        self.xhtml = self.xhtml.replace('&#x2663;', '♣')
-        self.xhtml = self.xhtml.replace('&#x2665;', '♥')
-        self.xhtml = self.xhtml.replace('&#x2666;', '♦')
-        self.xhtml = self.xhtml.replace('&#x2026;', '...')
-        self.xhtml = self.xhtml.replace('&#x10c;', 'Č')
-        self.xhtml = self.xhtml.replace('&#x25a0;', '■')
-        self.xhtml = self.xhtml.replace('&#x2009;', ' ')
-        self.xhtml = self.xhtml.replace('&lt;', '‹')
-        self.xhtml = self.xhtml.replace('&gt;', '›')
-        self.xhtml = self.xhtml.replace('&#x25ba;', '►')
-        self.xhtml = self.xhtml.replace('&#xfffd;', '.')
-        self.xhtml = self.xhtml.replace('&#x2751;', '❑')
-        self.xhtml = self.xhtml.replace('&#x25c6;', '◆')
-        self.xhtml = self.xhtml.replace('&#x2c7;', 'ˇ')
-        self.xhtml = self.xhtml.replace('&#x17d;', 'Ž')
-        self.xhtml = self.xhtml.replace('&#x17e;', 'ž')
-        self.xhtml = self.xhtml.replace('&#x2bc;', 'ʼ')
-        self.xhtml = self.xhtml.replace('&#x18f;', 'Ə')
-        self.xhtml = self.xhtml.replace('&#x2752;', '❒')
-        self.xhtml = self.xhtml.replace('&#x141;', 'Ł')
-        # This is a soft-hyphen but needs a symbol to handle it during paragraph recovery
-        self.xhtml = self.xhtml.replace('&#xad;', '※')
-        # Private use, could be anything, replaced during paragraph recovery
-        self.xhtml = self.xhtml.replace('&#xf0e9;', '⊂')
-        # Private use, could be anything, replaced during paragraph recovery
-        self.xhtml = self.xhtml.replace('&#xf0ea;', '⊂')
-        self.xhtml = self.xhtml.replace('&#xf051;', '⊂')
-        self.xhtml = self.xhtml.replace('&#xf0a1;', '⊂')
-        self.xhtml = self.xhtml.replace('&#xf04e;', '⊂')
-        # Ligatures
-        self.xhtml = self.xhtml.replace('&#xfb00; ', 'ff')
-        self.xhtml = self.xhtml.replace('&#xfb01; ', 'fi')
-        self.xhtml = self.xhtml.replace('&#xfb02; ', 'fl')
-        self.xhtml = self.xhtml.replace('&#xfb03; ', 'ffi')
-        self.xhtml = self.xhtml.replace('&#xfb04; ', 'ffl')
-        self.xhtml = self.xhtml.replace('&#xfb05; ', 'ft')
-        self.xhtml = self.xhtml.replace('&#xfb06; ', 'st')
-        self.xhtml = self.xhtml.replace('&#xfb00;', 'ff')
-        self.xhtml = self.xhtml.replace('&#xfb01;', 'fi')
-        self.xhtml = self.xhtml.replace('&#xfb02;', 'fl')
-        self.xhtml = self.xhtml.replace('&#xfb03;', 'ffi')
-        self.xhtml = self.xhtml.replace('&#xfb04;', 'ffl')
-        self.xhtml = self.xhtml.replace('&#xfb05;', 'ft')
-        self.xhtml = self.xhtml.replace('&#xfb06;', 'st')
+        self.xhtml = XHTML_CHARACTER_PATTERN.sub(_replace_xhtml_character, self.xhtml)
         self.executed['fix_xhtml_utf_characters'] = True
         return self.xhtml
 
@@ -0,0 +1,91 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ hashlib for stable hashes of text blocks
+ heapq for finding the smallest counter
+"""
+import hashlib
+import heapq
+
+
+class SpaceSaving():
+    """
+    SpaceSaving counts the most frequent items of a stream with the
+    space-saving algorithm by Metwally et al. The memory is limited to a fixed
+    number of counters regardless of the length of the stream.
+    Every item that occurs more often than n/capacity times in a stream of n
+    items is guaranteed to be kept. The counts are upper bounds and must be
+    confirmed with a second pass if exact numbers are needed.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.counters = {}  # Item to estimated count
+        self.errors = {}  # Item to maximum overestimation of its count
+        self.heap = []  # Lazy min-heap of (count, item), may hold outdated entries
+
+    def add(self, item):
+        """
+        add counts a single item of the stream. If all counters are in use, the
+        item with the smallest count is replaced by the new item.
+
+        :param item: Hashable item, ideally a small one like an integer hash
+        :type item: Hashable
+        """
+        if item in self.counters:
+            self.counters[item] += 1
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = 1
+            self.errors[item] = 0
+        else:
+            count, victim = heapq.heappop(self.heap)
+            # Skip heap entries that are outdated by later increments
+            while self.counters.get(victim) != count:
+                count, victim = heapq.heappop(self.heap)
+            del self.counters[victim]
+            del self.errors[victim]
+            self.counters[item] = count + 1
+            self.errors[item] = count
+        heapq.heappush(self.heap, (self.counters[item], item))
+        if len(self.heap) > 4 * self.capacity:
+            # Drop the outdated entries to keep the memory bounded
+            self.heap = [(count, key) for key, count in self.counters.items()]
+            heapq.heapify(self.heap)
+
+    def candidates(self, threshold: int):
+        """
+        candidates returns all items whose estimated count exceeds the threshold.
+
+        :param threshold: Minimum estimated count (exclusive)
+        :type threshold: int
+        :return: Set of candidate items
+        :rtype: set
+        """
+        return {item for item, count in self.counters.items() if count > threshold}
+
+
+def normalize_text(text: str):
+    """
+    normalize_text collapses all whitespace of a text block that the same text
+    with a different layout is counted as the same block.
+
+    :param text: Text block
+    :type text: str
+    :return: Normalized text
+    :rtype: str
+    """
+    return ' '.join(text.split())
+
+
+def text_hash(text: str):
+    """
+    text_hash creates a stable 64 bit hash of a normalized text block.
+
+    :param text: Text block
+    :type text: str
+    :return: Hash of the normalized text
+    :rtype: int
+    """
+    digest = hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little')
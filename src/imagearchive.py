@@ -0,0 +1,115 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ zipfile for uncompressed ZIP archives
+ tarfile for tar archives
+ io for passing image data to tarfile
+ json for the index of the archive
+ logging for logging and debugging
+ pathlib to access the file system
+"""
+import zipfile
+import tarfile
+import io
+import json
+import logging
+from pathlib import Path
+
+
+class ImageArchive():
+    """
+    ImageArchive streams the images of a document into a single uncompressed ZIP
+    or tar file instead of one file per image. The images are stored without
+    compression, so every image is a contiguous byte range of the archive.
+    An index file lists the cross reference, member name, width, height, offset
+    and size of each image, readers can use read_archive_image to access an
+    image directly without extracting the archive.
+    """
+    def __init__(self, path:Path, archive_format:str='zip'):
+        self.log = logging.getLogger('file')
+        self.path = path
+        self.format = archive_format
+        self.index = []  # One entry per image
+        self.fp = open(path, 'wb')
+        if archive_format == 'tar':
+            self.archive = tarfile.open(fileobj=self.fp, mode='w', format=tarfile.PAX_FORMAT)
+        else:
+            self.archive = zipfile.ZipFile(self.fp, 'w', compression=zipfile.ZIP_STORED)
+
+    def add(self, imgdata:bytes, imgname:str, xref:int, width:int, height:int):
+        """
+        add appends an image to the archive.
+
+        :param imgdata: Binary image data
+        :type imgdata: bytes
+        :param imgname: Member name in the archive
+        :type imgname: str
+        :param xref: Cross reference of the image in the PDF document
+        :type xref: int
+        :param width: Width of the image
+        :type width: int
+        :param height: Height of the image
+        :type height: int
+        """
+        if self.format == 'tar':
+            info = tarfile.TarInfo(imgname)
+            info.size = len(imgdata)
+            self.archive.addfile(info, io.BytesIO(imgdata))
+            # The data is padded to full blocks and ends at the archive position
+            blocks = -(-len(imgdata) // tarfile.BLOCKSIZE)
+            offset = self.archive.offset - blocks * tarfile.BLOCKSIZE
+        else:
+            self.archive.writestr(zipfile.ZipInfo(imgname), imgdata)
+            # Stored data ends at the current position of the archive file
+            offset = self.fp.tell() - len(imgdata)
+        self.index.append({'xref': xref,
+                           'name': imgname,
+                           'width': width,
+                           'height': height,
+                           'offset': offset,
+                           'size': len(imgdata)})
+
+    def remove(self, xrefs:set):
+        """
+        remove drops images from the index. The data stays in the archive, as
+        members of a streamed archive cannot be deleted.
+
+        :param xrefs: Cross references of the images
+        :type xrefs: set
+        :return: Number of removed index entries
+        :rtype: int
+        """
+        count = len(self.index)
+        self.index = [entry for entry in self.index if entry['xref'] not in xrefs]
+        return count - len(self.index)
+
+    def close(self):
+        """
+        close finishes the archive and writes the index next to it as
+        ARCHIVE.json.
+        """
+        self.archive.close()
+        self.fp.close()
+        index_path = self.path.with_name(self.path.name + '.json')
+        with open(index_path, 'w', encoding='utf-8') as fp:
+            json.dump({'archive': self.path.name,
+                       'format': self.format,
+                       'images': self.index}, fp, indent=1)
+        self.log.info('Archive "%s" saved with %d images', self.path, len(self.index))
+
+
+def read_archive_image(archive_path:Path, entry:dict):
+    """
+    read_archive_image reads a single image of an archive by its offset.
+
+    :param archive_path: Path of the archive
+    :type archive_path: Path
+    :param entry: Entry of the image from the index of the archive
+    :type entry: dict
+    :return: Binary image data
+    :rtype: bytes
+    """
+    with open(archive_path, 'rb') as fp:
+        fp.seek(entry['offset'])
+        return fp.read(entry['size'])
@@ -19,15 +19,19 @@ class Logger():
     debugoutput = True  # Should be set to False after implementation is complete
 
     def __init__(self, cfg:Config):
-        self.restore_default_settings()
+        # The logging configuration is applied once by set_logging_level
+        self.restore_default_settings(apply=False)
         self.local_settings_dir = Path('.')
         self.local_settings_file = Path(self.local_settings_dir, 'log.json')
         self.cfg = cfg
         self.set_logging_level()
 
-    def restore_default_settings(self):
+    def restore_default_settings(self, apply:bool=True):
         """
         restore_default_settings Initializes the root logger and applies default settings for the individual components
+
+        :param apply: False to only restore the configuration dictionary without applying it
+        :type apply: bool
         """
         logging.basicConfig(level=logging.NOTSET)
         self.config = {'version': 1,
@@ -57,11 +61,12 @@ class Logger():
                                            'propagate': False},
                                    'config': {'handlers': ['console', 'file'],
                                               'propagate': False}}}
-        logging.config.dictConfig(self.config)
+        if apply:
+            logging.config.dictConfig(self.config)
 
     def set_logging_level(self):
         """
-        set_logging_level sets the console logging level based
+        set_logging_level sets the console logging level and stream based
         on the program configuration setting.
         The file logging level is not changed!
         """
@@ -78,6 +83,8 @@ class Logger():
             case 4:
                 level = logging.DEBUG
         self.config['handlers']['console']['level'] = level
+        # stdout is reserved for the output in the pipe mode
+        self.config['handlers']['console']['stream'] = f'ext://sys.{self.cfg.cfg.config.log_stream}'
         logging.config.dictConfig(self.config)
 
     def print_config(self):
@@ -5,35 +5,158 @@
  pathlib to access the file system
  logging for log files
  os for file system access
+ json for JSON Lines output
+ hashlib for hashed directory sharding
  config for program settings
+ pageresult for the results of single pages
+ corpusdb for the SQLite corpus database
+ streamwriter for compressed output written in the background
+ imagearchive for images packed into a single archive
+ checkpoint for resuming interrupted documents
 """
 from pathlib import Path
 import logging
 import os
+import json
+import hashlib
 from config import Config
+from pageresult import PageResult
+from corpusdb import CorpusWriter
+from streamwriter import BackgroundWriter, resolve_compression, compressed_path
+from imagearchive import ImageArchive
+from checkpoint import Checkpoint, checkpoint_key
+
+
+class JSONLWriter():
+    """
+    JSONLWriter streams page results as JSON Lines into a file, one record per 
+    page. The file is replaced like the text and HTML files, with append the 
+    records are appended, e.g. to collect several documents in one file. 
+    Compressed files are then written as additional gzip members or zstd 
+    frames by a BackgroundWriter, which are still valid files.
+    """
+    def __init__(self, path:Path, document_id:str, compression:str='', level:int=6,
+                 append:bool=False):
+        self.log = logging.getLogger('file')
+        self.path = path
+        self.document_id = document_id
+        self.records = 0
+        mode = 'a' if append else 'w'
+        if compression:
+            self.fp = BackgroundWriter(path, mode, compression, level)
+        else:
+            self.fp = open(path, mode, encoding='utf-8')
+
+    def write(self, result:PageResult):
+        """
+        write appends the record of a single page.
+
+        :param result: Result of a processed page
+        :type result: PageResult
+        """
+        self.fp.write(json.dumps(result.to_record(self.document_id),
+                                 ensure_ascii=False) + '\n')
+        self.records += 1
+
+    def close(self):
+        """
+        close closes the file after all records are written.
+        """
+        self.fp.close()
+        self.log.info('File "%s" saved with %d pages', self.path, self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+MANIFEST_NAME = 'chaospdf-manifest.jsonl'
+
+
+def shard_dirs(name:str, levels:int=2):
+    """
+    shard_dirs creates the hashed subdirectories for a name or path, e.g. "3f/a2" 
+    for two levels. Each level has at most 256 directories, however many documents 
+    or images are stored.
+
+    :param name: Name of a document or file
+    :type name: str
+    :param levels: Number of directory levels
+    :type levels: int
+    :return: Relative path of the subdirectories
+    :rtype: Path
+    """
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return Path(*(digest[2*i:2*i+2] for i in range(levels)))
+
+
+def corpus_writer(cfg:Config, messages=None):
+    """
+    corpus_writer starts the writer of the corpus database that is shared by 
+    all documents of a session. A relative database path is located in the 
+    output directory.
+
+    :param cfg: Program configuration
+    :type cfg: Config
+    :param messages: Multiprocessing queue for worker processes or None
+    :type messages: queue.Queue
+    :raises sqlite3.Error: when the database cannot be opened
+    :return: Started writer thread
+    :rtype: CorpusWriter
+    """
+    export = cfg.snapshot().fitz.export
+    path = Path(export.corpus_file)
+    if not path.is_absolute():
+        path = Path(export.output_dir, path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = CorpusWriter(path, export.corpus_batch_size, messages)
+    writer.start()
+    return writer
+
 
 class Outfile():
     """
     Outfile has methods for output file handling while considering the
     program settings.
+    The document_id replaces the file name for the output files, documents in 
+    memory without input_file are written into the output directory.
     """
-    def __init__(self, input_file:Path, cfg:Config):
+    def __init__(self, input_file:Path, cfg:Config, document_id:str=None):
         self.log = logging.getLogger('file')
         self.log.debug('Startung outfiles initialization')
         self.cfg = cfg
-        self.basename = input_file.stem
-        if self.cfg.cfg.fitz.export.use_pdf_output_dir:
-            if self.cfg.cfg.fitz.export.create_sub_dirs:
-                self.location = Path(input_file.absolute().parent,
-                                     self.basename)
-            else:
-                self.location = Path(input_file.absolute().parent)
+        # Resolve the settings once per document
+        export = cfg.snapshot().fitz.export
+        self.use_pdf_output_dir = export.use_pdf_output_dir
+        self.create_sub_dirs = export.create_sub_dirs
+        self.compression = resolve_compression(export.compression)
+        self.compression_level = export.compression_level
+        # The JSON Lines file is compressed with the general setting or gzip
+        self.jsonl_compression = self.compression or ('gzip' if export.compress_jsonl else '')
+        self.image_archive_format = cfg.snapshot().fitz.images.archive
+        self.sharded = export.layout == 'sharded'
+        self.shard_levels = export.shard_levels
+        self.written_images = {}  # Image name to path, for the sharded layout
+        self.basename = document_id or input_file.stem
+        if self.use_pdf_output_dir and input_file is not None:
+            self.root = Path(input_file.absolute().parent)
+        else:
+            self.root = Path(export.output_dir)
+        if self.sharded:
+            # ROOT/ab/cd/BASENAME-0123abcd, images in ROOT/ab/cd/BASENAME-0123abcd/ef.
+            # The hash of the source path keeps documents with the same name
+            # in different directories apart.
+            source = str(input_file.absolute()) if input_file is not None else self.basename
+            digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+            suffix = digest[2*self.shard_levels:2*self.shard_levels+8]
+            self.location = Path(self.root, shard_dirs(source, self.shard_levels),
+                                 f'{self.basename}-{suffix}')
+        elif self.create_sub_dirs:
+            self.location = Path(self.root, self.basename)
         else:
-            if self.cfg.cfg.fitz.export.create_sub_dirs:
-                self.location = Path(self.cfg.cfg.fitz.export.output_dir,
-                                     self.basename)
-            else:
-                self.location = Path(self.cfg.cfg.fitz.export.output_dir)
+            self.location = self.root
 
     def create_directory(self):
         """
@@ -50,7 +173,8 @@ class Outfile():
 
     def save_text(self, text:str, ext:str):
         """
-        save_text saves a string as UTF-8 encoded text file
+        save_text saves a string as UTF-8 encoded text file, compressed files 
+        are written in the background
 
         :param text: String to be saved to file
         :type text: str
@@ -58,9 +182,17 @@ class Outfile():
         :type ext: str
         """
         self.log.debug('Entering method "save_text"')
-        if self.cfg.cfg.fitz.export.use_pdf_output_dir:
+        if self.use_pdf_output_dir or self.sharded:
             self.create_directory()
         outfile = Path(self.location, self.basename+'.'+ext)
+        if self.compression:
+            # Compress in the background while the next document is processed,
+            # wait_for_writers waits for the file
+            writer = BackgroundWriter(compressed_path(outfile, self.compression), 'w',
+                                      self.compression, self.compression_level)
+            writer.write(text)
+            writer.finish()
+            return
         try:
             with open(outfile, 'w', encoding='utf-8') as fp:
                 fp.write(text)
@@ -69,6 +201,74 @@ class Outfile():
             print('Error (over)writing the file', outfile)
             self.log.error('Could not write file "%s"', outfile)
 
+    def record_manifest(self, input_file:Path):
+        """
+        record_manifest appends the location of the document to the manifest 
+        in the output root if the sharded layout is used.
+
+        :param input_file: Path of the PDF file or None for documents in memory
+        :type input_file: Path
+        """
+        if not self.sharded:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        record = {'doc': self.basename,
+                  'source': str(input_file.absolute()) if input_file else None,
+                  'location': self.location.relative_to(self.root).as_posix(),
+                  'image_shard_levels': 1}
+        with open(Path(self.root, MANIFEST_NAME), 'a', encoding='utf-8') as fp:
+            fp.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def jsonl_writer(self, append:bool=False):
+        """
+        jsonl_writer opens a writer for the per-page JSON Lines output.
+
+        :param append: True to keep the records of an earlier run
+        :type append: bool
+        :return: Writer for BASENAME.jsonl, .jsonl.gz or .jsonl.zst
+        :rtype: JSONLWriter
+        """
+        self.log.debug('Entering method "jsonl_writer"')
+        self.create_directory()
+        outfile = compressed_path(Path(self.location, self.basename+'.jsonl'),
+                                  self.jsonl_compression)
+        return JSONLWriter(outfile, self.basename, self.jsonl_compression,
+                           self.compression_level, append)
+
+    def checkpoint(self, input_file:Path, part:int=None):
+        """
+        checkpoint opens the checkpoint of the document or of a chunk of its 
+        pages next to the output files.
+
+        :param input_file: Path of the PDF file
+        :type input_file: Path
+        :param part: Number of the chunk or None for the document
+        :type part: int
+        :return: Checkpoint BASENAME.checkpoint.jsonl or 
+        BASENAME.partNNNN.checkpoint.jsonl, resumed if it is still valid
+        :rtype: Checkpoint
+        """
+        self.log.debug('Entering method "checkpoint"')
+        settings = self.cfg.snapshot()
+        name = self.basename if part is None else f'{self.basename}.part{part:04d}'
+        return Checkpoint(Path(self.location, name+'.checkpoint.jsonl'), input_file,
+                          checkpoint_key(settings), settings.batch.checkpoint_interval)
+
+    def image_archive(self):
+        """
+        image_archive opens the archive for the images of the document if the 
+        images are not written as single files.
+
+        :return: Archive BASENAME.images.zip or .tar or None for single files
+        :rtype: ImageArchive
+        """
+        self.log.debug('Entering method "image_archive"')
+        if self.image_archive_format not in ('zip', 'tar'):
+            return None
+        self.create_directory()
+        outfile = Path(self.location, self.basename+'.images.'+self.image_archive_format)
+        return ImageArchive(outfile, self.image_archive_format)
+
     def save_fitz_image(self, imgdata, imgname):
         """
         save_fitz_image saves an image file for PyMuPDF
@@ -79,9 +279,16 @@ class Outfile():
         :type imgname: str
         """
         self.log.debug('Entering method "save_fitz_image"')
-        if self.cfg.cfg.fitz.export.create_sub_dirs:
-            self.create_directory()
-        outfile = Path(self.location, imgname)
+        if self.sharded:
+            # One level of 256 directories bounds the images per directory
+            directory = Path(self.location, shard_dirs(imgname, 1))
+            directory.mkdir(parents=True, exist_ok=True)
+            outfile = Path(directory, imgname)
+            self.written_images[imgname] = outfile
+        else:
+            if self.create_sub_dirs:
+                self.create_directory()
+            outfile = Path(self.location, imgname)
         with open(outfile, 'wb') as fp:
             fp.write(imgdata)
 
@@ -94,6 +301,17 @@ class Outfile():
         :return: Number of removed files
         :rtype: int
         """
+        if self.sharded:
+            # The written images are known, no need to list the directories
+            remove_count = 0
+            for softmask in softmasks:
+                img = str(softmask)
+                for imgname, path in list(self.written_images.items()):
+                    if imgname.split('.')[0] == img and path.exists():
+                        path.unlink()
+                        del self.written_images[imgname]
+                        remove_count += 1
+            return remove_count
         filelist = os.listdir(self.location)
         remove_count = 0
         for softmask in softmasks:
@@ -0,0 +1,65 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ The module has no dependencies that it can be imported cheaply by worker
+ processes and consumers of extraction results.
+"""
+
+
+class PageResult():
+    """
+    PageResult holds the extraction result of a single page. It is the unit
+    that is passed between the processing stages and worker processes, while
+    Fitzpage only holds the transient state during the processing of a page.
+    """
+    __slots__ = ('index', 'number', 'text', 'xhtml', 'page_class', 'aligned',
+                 'printed_number', 'image_xrefs')
+
+    def __init__(self, index: int, number: int, text: str = '', xhtml: str = '',
+                 page_class: str = '', aligned: bool = False,
+                 printed_number: int = None, image_xrefs: tuple = ()):
+        self.index = index  # Page index in the PDF document, starting with 0
+        self.number = number  # Page number including offset
+        self.text = text  # Extracted plain text
+        self.xhtml = xhtml  # Extracted XHTML code
+        self.page_class = page_class  # Content class detected by classify_page
+        self.aligned = aligned  # True if the paragraph recovery was skipped
+        self.printed_number = printed_number  # Detected page number printed on the page
+        self.image_xrefs = image_xrefs  # Cross references of the images on the page
+
+    def to_record(self, document_id: str):
+        """
+        to_record creates a dictionary of the result for JSON output.
+
+        :param document_id: Identifier of the document, e.g. the file name
+        :type document_id: str
+        :return: Dictionary with the document identifier and all page data
+        :rtype: dict
+        """
+        return {'doc': document_id,
+                'index': self.index,
+                'page': self.printed_number,
+                'class': self.page_class,
+                'text': self.text,
+                'xhtml': self.xhtml,
+                'images': list(self.image_xrefs)}
+
+    def __repr__(self):
+        return (f'PageResult(index={self.index}, number={self.number}, ' +
+                f'text={len(self.text)} chars, xhtml={len(self.xhtml)} chars, ' +
+                f'page_class={self.page_class!r}, aligned={self.aligned}, ' +
+                f'printed_number={self.printed_number}, image_xrefs={self.image_xrefs})')
+
+    def __eq__(self, other):
+        if not isinstance(other, PageResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
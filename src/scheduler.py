@@ -0,0 +1,255 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ heapq for the queue of ready jobs and the simulated workers
+ math for the number of chunks
+ os for the number of CPUs
+ time for measuring the makespan
+ logging for logging and debugging
+ concurrent.futures for the process pool
+ pathlib to access the file system
+ config for the cost model settings
+ fitzdoc for probing the PDF files
+"""
+import heapq
+import math
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from config import Config
+from fitzdoc import Fitzdoc
+
+
+class Job():
+    """
+    Job is a whole document or a chunk of pages of a document with its
+    predicted cost in seconds. The document job of a chunked document runs
+    after its last chunk and merges the results of the chunks.
+    """
+    def __init__(self, file:Path, cost:float, pages:list=None, part:int=None,
+                 offset:int=0, parts:int=0):
+        self.file = file
+        self.cost = cost
+        self.pages = pages  # Page indices of a chunk, None for a document
+        self.part = part  # Number of the chunk, None for a document
+        self.offset = offset  # Page offset of all chunks of the document
+        self.parts = parts  # Number of chunks of a document
+
+    @property
+    def name(self):
+        """
+        name returns a name of the job for log messages.
+
+        :return: File name and chunk number
+        :rtype: str
+        """
+        if self.part is None:
+            return Path(self.file).name
+        return f'{Path(self.file).name} part {self.part + 1}'
+
+
+class BatchScheduler():
+    """
+    BatchScheduler processes a batch of documents with a pool of worker
+    processes, longest job first, that a large document does not start last
+    and stretch the end of the batch. Each PDF file is probed cheaply (file
+    size, number of selected pages and optionally the number of images) and
+    its cost is estimated with the cost model of the batch settings. Documents
+    with more than chunk_pages pages are split into page chunks that run on
+    several workers, the document job merges their results afterwards.
+    The predicted makespan is reported next to the actual one, the cost model
+    can be calibrated with the logged durations of the jobs.
+    """
+    def __init__(self, cfg:Config):
+        self.log = logging.getLogger('main')
+        self.settings = cfg.snapshot()
+        batch = self.settings.batch
+        self.workers = self.settings.config.workers or os.cpu_count() or 1
+        self.chunk_pages = batch.chunk_pages if self.workers > 1 else 0
+        self.count_images = batch.count_images
+        self.cost_per_page = batch.cost_per_page
+        self.cost_per_mib = batch.cost_per_mib
+        self.cost_per_image = batch.cost_per_image
+        self.makespan = 0.0  # Actual makespan of the last run
+
+    def probe(self, file:Path):
+        """
+        probe estimates the cost of a document and splits it into chunks if it
+        is too large.
+
+        :param file: Path of the PDF file
+        :type file: Path
+        :return: Jobs of the document, chunks before the document job
+        :rtype: list
+        """
+        size_cost = Path(file).stat().st_size / (1024 * 1024) * self.cost_per_mib
+        try:
+            doc = Fitzdoc(file, self.settings)
+        except RuntimeError as err:
+            # Processing reports the error
+            self.log.warning('Cannot probe "%s": %s', file, err)
+            return [Job(file, size_cost)]
+        try:
+            if doc.encryption:
+                return [Job(file, size_cost)]
+            pages = doc.selected_pages
+            if self.count_images:
+                images = len({img[0] for pn, page in doc.iter_selected_pages()
+                              for img in page.get_images()})
+                size_cost += images * self.cost_per_image
+            if not self.chunk_pages or len(pages) <= self.chunk_pages:
+                return [Job(file, size_cost + len(pages) * self.cost_per_page)]
+            # All chunks need the page offset of the whole document
+            if self.settings.fitz.text.detect_page_offset:
+                offset = doc.detect_page_offset()
+            else:
+                offset = self.settings.fitz.text.page_offset
+        finally:
+            doc.doc.close()
+        parts = math.ceil(len(pages) / self.chunk_pages)
+        size = math.ceil(len(pages) / parts)
+        jobs = [Job(file, len(chunk) * self.cost_per_page, chunk, part, offset)
+                for part, chunk in enumerate(pages[i:i + size]
+                                             for i in range(0, len(pages), size))]
+        # The document job only writes the outputs and extracts the images
+        jobs.append(Job(file, size_cost, offset=offset, parts=parts))
+        self.log.info('Split "%s" with %d pages into %d chunks', file, len(pages), parts)
+        return jobs
+
+    def plan(self, filelist:list):
+        """
+        plan probes all files and returns the jobs of the batch.
+
+        :param filelist: Paths of the PDF files
+        :type filelist: list
+        :return: Jobs of all documents
+        :rtype: list
+        """
+        jobs = []
+        for file in filelist:
+            jobs.extend(self.probe(file))
+        return jobs
+
+    @staticmethod
+    def _ready_jobs(jobs:list):
+        """
+        _ready_jobs splits the jobs into the jobs that can run immediately and
+        the document jobs that wait for their chunks.
+
+        :param jobs: Jobs from plan
+        :type jobs: list
+        :return: Heap of ready jobs and dictionary of waiting document jobs
+        :rtype: tuple
+        """
+        ready = []
+        waiting = {}  # File to [document job, number of unfinished chunks]
+        for seq, job in enumerate(jobs):
+            if job.parts:
+                waiting[job.file] = [job, job.parts]
+            else:
+                # Longest job first, the original order for equal costs
+                heapq.heappush(ready, (-job.cost, seq, job))
+        return ready, waiting
+
+    @staticmethod
+    def _finished(job:Job, ready:list, waiting:dict, seq:int):
+        """
+        _finished releases the document job after the last chunk.
+
+        :param job: Finished job
+        :type job: Job
+        :param ready: Heap of ready jobs
+        :type ready: list
+        :param waiting: Waiting document jobs
+        :type waiting: dict
+        :param seq: Sequence number for the heap
+        :type seq: int
+        """
+        if job.part is None:
+            return
+        waiting[job.file][1] -= 1
+        if not waiting[job.file][1]:
+            document, _ = waiting.pop(job.file)
+            heapq.heappush(ready, (-document.cost, seq, document))
+
+    def predict_makespan(self, jobs:list):
+        """
+        predict_makespan simulates the run with the predicted costs.
+
+        :param jobs: Jobs from plan
+        :type jobs: list
+        :return: Predicted makespan in seconds
+        :rtype: float
+        """
+        ready, waiting = self._ready_jobs(jobs)
+        running = []  # Heap of (finish time, sequence number, job)
+        now = 0.0
+        seq = len(jobs)
+        while ready or running:
+            while ready and len(running) < self.workers:
+                _, _, job = heapq.heappop(ready)
+                heapq.heappush(running, (now + job.cost, seq, job))
+                seq += 1
+            now, _, job = heapq.heappop(running)
+            self._finished(job, ready, waiting, seq)
+            seq += 1
+        return now
+
+    def run(self, jobs:list, document_target, chunk_target, args:tuple=(), initializer=None):
+        """
+        run processes the jobs in the process pool, the longest ready job first.
+        Document jobs are called with document_target(file, *args, parts) and
+        chunks with chunk_target(file, args[0], pages, offset, part).
+
+        :param jobs: Jobs from plan
+        :type jobs: list
+        :param document_target: Function that processes a document
+        :type document_target: Callable
+        :param chunk_target: Function that processes a chunk of pages
+        :type chunk_target: Callable
+        :param args: Additional arguments of document_target, the first one
+        are the settings
+        :type args: tuple
+        :param initializer: Function that prepares each worker process
+        :type initializer: Callable
+        :return: Number of successfully processed documents
+        :rtype: int
+        """
+        ready, waiting = self._ready_jobs(jobs)
+        running = {}  # Future to (job, start time)
+        processed = 0
+        seq = len(jobs)
+        begin = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=initializer) as pool:
+            while ready or running:
+                while ready and len(running) < self.workers:
+                    _, _, job = heapq.heappop(ready)
+                    if job.part is None:
+                        future = pool.submit(document_target, job.file, *args, job.parts)
+                    else:
+                        future = pool.submit(chunk_target, job.file, args[0], job.pages,
+                                             job.offset, job.part)
+                    running[future] = (job, time.monotonic())
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, start = running.pop(future)
+                    self.log.info('Job "%s" took %.1f s, predicted %.1f s',
+                                  job.name, time.monotonic() - start, job.cost)
+                    try:
+                        result = future.result()
+                    except Exception as err:  # pylint: disable=broad-except
+                        # The document job processes the pages of a failed chunk
+                        self.log.error('Processing "%s" failed: %s', job.name, err)
+                    else:
+                        if job.part is None:
+                            processed += 1
+                            if result is False:
+                                self.log.error('Not all output files of "%s" could be written',
+                                               job.file)
+                    self._finished(job, ready, waiting, seq)
+                    seq += 1
+        self.makespan = time.monotonic() - begin
+        return processed
@@ -0,0 +1,376 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ asyncio for the HTTP server
+ json for JSON responses
+ logging for logging and debugging
+ os for the number of CPUs
+ time for metrics and timeouts
+ urllib.parse for the request parameters
+ multiprocessing for one process per request that can be killed
+ signal for ignoring Ctrl+C in the request processes
+ concurrent.futures for waiting for the request processes in threads
+ pathlib to access PDF files
+ config for the service settings
+
+ Imported by the worker processes:
+ fitzdoc for handling PDF documents with PyMuPDF
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import urllib.parse
+import multiprocessing
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from config import Config
+
+FORMATS = {'jsonl': 'application/x-ndjson; charset=utf-8',
+           'text': 'text/plain; charset=utf-8',
+           'xhtml': 'text/html; charset=utf-8',
+           'images': 'application/json; charset=utf-8'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 422: 'Unprocessable Entity',
+           500: 'Internal Server Error', 503: 'Service Unavailable',
+           504: 'Gateway Timeout'}
+
+
+def extract_document(source, settings, output_format:str, document_id:str):
+    """
+    extract_document extracts a PDF file in a worker process and renders the
+    response body.
+
+    :param source: Path of the PDF file or the uploaded PDF file
+    :type source: Path | bytes
+    :param settings: Snapshot of the program configuration
+    :type settings: FrozenSettings
+    :param output_format: One of jsonl, text, xhtml or images
+    :type output_format: str
+    :param document_id: Identifier of the document in the JSON records
+    :type document_id: str
+    :raises ValueError: when the document is encrypted or no page is selected
+    :return: Response body and number of processed pages
+    :rtype: tuple
+    """
+    from fitzdoc import Fitzdoc  # pylint: disable=import-outside-toplevel
+    doc = Fitzdoc(source, settings, document_id)
+    if doc.encryption:
+        raise ValueError('Document is encrypted')
+    if not doc.selected_pages:
+        raise ValueError('No pages selected')
+    if output_format == 'images':
+        # The image manifest does not need any text extraction
+        images = [{'page': pn, 'xref': img[0], 'width': img[2], 'height': img[3]}
+                  for pn, page in doc.iter_selected_pages()
+                  for img in page.get_images(full=True)]
+        return json.dumps({'doc': document_id, 'images': images}), len(doc.selected_pages)
+    doc.collect_image_xrefs = output_format == 'jsonl'
+    if settings.fitz.text.detect_page_offset:
+        offset = doc.detect_page_offset()
+    else:
+        offset = settings.fitz.text.page_offset
+    if settings.fitz.text.page_separator:
+        doc.process_pages_separately(offset)
+    else:
+        doc.process_pages(offset)
+    if output_format == 'text':
+        body = doc.text
+    elif output_format == 'xhtml':
+        body = doc.html
+    else:
+        body = ''.join(json.dumps(result.to_record(document_id), ensure_ascii=False) + '\n'
+                       for result in doc.page_results)
+    return body, len(doc.page_results)
+
+
+def run_request(source, settings, output_format:str, document_id:str, conn):
+    """
+    run_request runs extract_document in the process of a request and sends 
+    the result to the service.
+
+    :param source: Path of the PDF file or the uploaded PDF file
+    :type source: Path | bytes
+    :param settings: Snapshot of the program configuration
+    :type settings: FrozenSettings
+    :param output_format: One of jsonl, text, xhtml or images
+    :type output_format: str
+    :param document_id: Identifier of the document in the JSON records
+    :type document_id: str
+    :param conn: Pipe to send the result to the service
+    :type conn: multiprocessing.connection.Connection
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        conn.send(('ok', extract_document(source, settings, output_format, document_id)))
+    except ValueError as err:
+        conn.send(('invalid', str(err)))
+    except Exception as err:  # pylint: disable=broad-except
+        conn.send(('error', f'{type(err).__name__}: {err}'))
+    conn.close()
+
+
+def receive_result(receiver):
+    """
+    receive_result waits for the result of a request process.
+
+    :param receiver: Pipe of the request process
+    :type receiver: multiprocessing.connection.Connection
+    :return: Status and result, None if the process ended without a result
+    :rtype: tuple
+    """
+    try:
+        return receiver.recv()
+    except EOFError:
+        return None
+    finally:
+        receiver.close()
+
+
+class ExtractionService():
+    """
+    ExtractionService is a small HTTP server for extraction on demand.
+    POST /extract takes a PDF file as request body or a local file with the
+    parameter path and returns the result in the format given by the parameter
+    format (jsonl, text, xhtml or images). Each document is processed in its
+    own process, at most workers at the same time. The process of a request
+    that times out is killed, that a hanging document never blocks a worker.
+    If all workers are busy and the queue is full, new requests are rejected
+    with 503 instead of piling up. GET /metrics returns counters for
+    throughput and the queue depth in the Prometheus text format.
+    """
+    def __init__(self, cfg:Config):
+        self.log = logging.getLogger('main')
+        self.settings = cfg.snapshot()
+        service = self.settings.service
+        self.host = service.host
+        self.port = service.port
+        self.workers = service.workers or self.settings.config.workers or os.cpu_count() or 1
+        self.capacity = self.workers + service.queue_size  # Running and queued requests
+        self.timeout = service.timeout
+        self.max_upload = service.max_upload
+        self.context = multiprocessing.get_context()
+        self.slots = None  # Semaphore for the running requests
+        self.executor = None  # Threads that wait for the request processes
+        self.running = set()  # Processes of the running requests
+        self.in_flight = 0  # Requests running or queued
+        self.started = time.monotonic()
+        self.metrics = {'requests_total': 0,
+                        'requests_completed_total': 0,
+                        'requests_failed_total': 0,
+                        'requests_rejected_total': 0,
+                        'requests_timeout_total': 0,
+                        'workers_killed_total': 0,
+                        'pages_total': 0,
+                        'processing_seconds_total': 0.0}
+
+    def run(self, prepare=None):
+        """
+        run serves requests until the program is interrupted.
+
+        :param prepare: Function that is called once before serving, e.g. to 
+        import PyMuPDF that the forked request processes start warm
+        :type prepare: Callable
+        """
+        if prepare:
+            prepare()
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print('\nStopping the extraction service')
+            for process in list(self.running):
+                process.kill()
+                process.join()
+
+    async def serve(self):
+        """
+        serve accepts connections until the program is interrupted.
+        """
+        self.slots = asyncio.Semaphore(self.workers)
+        # One thread receives the result and one joins the process of a request
+        self.executor = ThreadPoolExecutor(max_workers=2 * self.workers,
+                                           thread_name_prefix='request')
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print(f'Serving on http://{self.host}:{self.port} with {self.workers} workers, ' +
+              'press Ctrl+C to stop')
+        self.log.info('Extraction service listening on %s:%d', self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        """
+        handle_connection reads a single request and writes the response.
+
+        :param reader: Stream of the request
+        :type reader: asyncio.StreamReader
+        :param writer: Stream for the response
+        :type writer: asyncio.StreamWriter
+        """
+        try:
+            status, content_type, body, headers = await self.handle_request(reader)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            status, content_type, body, headers = 400, 'text/plain', 'Malformed request\n', {}
+        except ConnectionError:
+            writer.close()
+            return
+        data = body.encode('utf-8')
+        head = [f'HTTP/1.1 {status} {REASONS.get(status, "")}',
+                f'Content-Type: {content_type}',
+                f'Content-Length: {len(data)}',
+                'Connection: close']
+        head.extend(f'{key}: {value}' for key, value in headers.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def handle_request(self, reader:asyncio.StreamReader):
+        """
+        handle_request parses the request and dispatches it to the endpoint.
+
+        :param reader: Stream of the request
+        :type reader: asyncio.StreamReader
+        :raises ValueError: when the request cannot be parsed
+        :return: Status code, content type, body and additional headers
+        :rtype: tuple
+        """
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+        url = urllib.parse.urlsplit(target)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == '/metrics':
+            return 200, 'text/plain; version=0.0.4', self.render_metrics(), {}
+        if url.path != '/extract':
+            return 404, 'text/plain', 'Not found\n', {}
+        if method != 'POST':
+            return 405, 'text/plain', 'Use POST\n', {'Allow': 'POST'}
+        length = int(headers.get('content-length', 0))
+        if length > self.max_upload:
+            return 413, 'text/plain', 'PDF file too large\n', {}
+        body = await reader.readexactly(length) if length else b''
+        return await self.extract(params, body)
+
+    async def extract(self, params:dict, body:bytes):
+        """
+        extract processes a document in a request process.
+
+        :param params: Request parameters format, path and doc
+        :type params: dict
+        :param body: Uploaded PDF file or empty
+        :type body: bytes
+        :return: Status code, content type, body and additional headers
+        :rtype: tuple
+        """
+        self.metrics['requests_total'] += 1
+        output_format = params.get('format', 'jsonl')
+        if output_format not in FORMATS:
+            return 400, 'text/plain', f'Unknown format, use one of {", ".join(FORMATS)}\n', {}
+        if self.in_flight >= self.capacity:
+            # Backpressure: the client should retry later
+            self.metrics['requests_rejected_total'] += 1
+            return 503, 'text/plain', 'Too many requests in progress\n', {'Retry-After': '1'}
+        if 'path' in params:
+            source = Path(params['path'])
+            if not source.is_file():
+                return 404, 'text/plain', f'File {source} not found\n', {}
+            document_id = params.get('doc', source.stem)
+        elif body:
+            # The uploaded PDF file is passed to the worker in memory
+            source = body
+            document_id = params.get('doc', 'upload')
+        else:
+            return 400, 'text/plain', 'Send a PDF file or the parameter path\n', {}
+        self.in_flight += 1
+        try:
+            async with self.slots:
+                # The timeout starts when the request runs, not while it is queued
+                begin = time.monotonic()
+                status, value = await asyncio.wait_for(
+                    self.run_process(source, output_format, document_id), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics['requests_timeout_total'] += 1
+            return 504, 'text/plain', 'Extraction timed out\n', {}
+        finally:
+            self.in_flight -= 1
+        if status == 'invalid':
+            self.metrics['requests_failed_total'] += 1
+            return 422, 'text/plain', f'{value}\n', {}
+        if status != 'ok':
+            self.metrics['requests_failed_total'] += 1
+            self.log.error('Extraction of "%s" failed: %s', document_id, value)
+            return 500, 'text/plain', 'Extraction failed\n', {}
+        result, pages = value
+        self.metrics['requests_completed_total'] += 1
+        self.metrics['pages_total'] += pages
+        self.metrics['processing_seconds_total'] += time.monotonic() - begin
+        return 200, FORMATS[output_format], result, {}
+
+    async def run_process(self, source, output_format:str, document_id:str):
+        """
+        run_process runs the request in its own process. The result is received 
+        in a thread, that a large result does not block the event loop. The 
+        process is killed when the request is cancelled, e.g. after the timeout.
+
+        :param source: Path of the PDF file or the uploaded PDF file
+        :type source: Path | bytes
+        :param output_format: One of jsonl, text, xhtml or images
+        :type output_format: str
+        :param document_id: Identifier of the document in the JSON records
+        :type document_id: str
+        :return: Status (ok, invalid or error) and result or error message
+        :rtype: tuple
+        """
+        loop = asyncio.get_running_loop()
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=run_request,
+                                       args=(source, self.settings, output_format,
+                                             document_id, sender),
+                                       name=f'request-{document_id}', daemon=True)
+        process.start()
+        sender.close()
+        self.running.add(process)
+        receiving = loop.run_in_executor(self.executor, receive_result, receiver)
+        result = None
+        try:
+            # Shielded, the thread ends with EOFError when the process is killed
+            result = await asyncio.shield(receiving)
+        finally:
+            if result is None and process.is_alive():
+                # Cancelled, e.g. after the timeout
+                process.kill()
+                self.metrics['workers_killed_total'] += 1
+            await loop.run_in_executor(self.executor, process.join)
+            self.running.discard(process)
+        if result is None:
+            # The process ended without a result
+            return 'error', f'crashed with exit code {process.exitcode}'
+        return result
+
+    def render_metrics(self):
+        """
+        render_metrics creates the metrics in the Prometheus text format.
+
+        :return: Metrics, one per line
+        :rtype: str
+        """
+        uptime = time.monotonic() - self.started
+        metrics = dict(self.metrics)
+        metrics['in_flight'] = self.in_flight
+        metrics['workers_busy'] = len(self.running)
+        metrics['queue_depth'] = max(0, self.in_flight - len(self.running))
+        metrics['capacity'] = self.capacity
+        metrics['workers'] = self.workers
+        metrics['uptime_seconds'] = round(uptime, 3)
+        metrics['pages_per_second'] = round(self.metrics['pages_total'] / uptime, 3) if uptime else 0
+        return ''.join(f'chaospdf_{name} {value}\n' for name, value in metrics.items())
@@ -0,0 +1,176 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ gzip for compressed output files
+ io for text output on compressed binary streams
+ logging for logging and debugging
+ queue for passing text to the writer thread
+ threading for compressing in the background
+ pathlib to access the file system
+ zstandard (optional) for zstd compressed output files
+"""
+import gzip
+import io
+import logging
+import queue
+import threading
+from pathlib import Path
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_EXTENSIONS = {'gzip': 'gz', 'zstd': 'zst'}
+running_writers = []  # BackgroundWriter threads that were not waited for yet
+
+
+def resolve_compression(compression:str):
+    """
+    resolve_compression checks if a compression method is available. zstd
+    falls back to gzip if the zstandard package is not installed.
+
+    :param compression: Compression method: '' (none), 'gzip' or 'zstd'
+    :type compression: str
+    :return: Available compression method
+    :rtype: str
+    """
+    if compression == 'zstd' and zstandard is None:
+        logging.getLogger('file').warning('Package zstandard is not installed, using gzip compression')
+        return 'gzip'
+    if compression and compression not in COMPRESSION_EXTENSIONS:
+        logging.getLogger('file').error('Unknown compression "%s", using gzip compression', compression)
+        return 'gzip'
+    return compression
+
+
+def compressed_path(path:Path, compression:str):
+    """
+    compressed_path appends the file extension of the compression method.
+
+    :param path: Path of the uncompressed file
+    :type path: Path
+    :param compression: Available compression method or ''
+    :type compression: str
+    :return: Path of the compressed file
+    :rtype: Path
+    """
+    if not compression:
+        return path
+    return path.with_name(path.name + '.' + COMPRESSION_EXTENSIONS[compression])
+
+
+def open_text(path:Path, mode:str, compression:str='', level:int=6):
+    """
+    open_text opens a UTF-8 text file for writing with optional compression. In
+    append mode compressed data is written as a new gzip member or zstd frame,
+    the file stays valid for the standard tools.
+
+    :param path: Path of the file including the compression extension
+    :type path: Path
+    :param mode: 'w' to overwrite or 'a' to append
+    :type mode: str
+    :param compression: Available compression method or ''
+    :type compression: str
+    :param level: Compression level, 1-9 for gzip and 1-22 for zstd
+    :type level: int
+    :return: Text file object
+    :rtype: io.TextIOBase
+    """
+    if compression == 'gzip':
+        return gzip.open(path, mode+'t', compresslevel=min(max(level, 1), 9),
+                         encoding='utf-8')
+    if compression == 'zstd':
+        raw = open(path, mode+'b')
+        compressor = zstandard.ZstdCompressor(level=min(max(level, 1), 22))
+        return io.TextIOWrapper(compressor.stream_writer(raw, closefd=True),
+                                encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class BackgroundWriter(threading.Thread):
+    """
+    BackgroundWriter writes and compresses text on a separate thread. zlib and
+    zstd release the GIL while compressing, so the compression overlaps the
+    extraction of the following pages or documents. The queue is bounded that a
+    slow disk limits the memory instead of letting the text pile up.
+    """
+    def __init__(self, path:Path, mode:str='w', compression:str='gzip', level:int=6,
+                 queue_size:int=64):
+        super().__init__(name=f'writer-{path.name}', daemon=True)
+        self.log = logging.getLogger('file')
+        self.path = path
+        self.mode = mode
+        self.compression = compression
+        self.level = level
+        self.chunks = queue.Queue(maxsize=queue_size)
+        self.error = None
+        running_writers.append(self)
+        self.start()
+
+    def run(self):
+        """
+        run writes the queued text until finish is called.
+        """
+        chunk = ''
+        try:
+            with open_text(self.path, self.mode, self.compression, self.level) as fp:
+                chunk = self.chunks.get()
+                while chunk is not None:
+                    fp.write(chunk)
+                    chunk = self.chunks.get()
+            self.log.info('File "%s" saved', self.path)
+        except Exception as err:  # pylint: disable=broad-except
+            # Any error ends the thread, close raises it in the producer
+            self.error = err
+            self.log.error('Could not write file "%s": %s', self.path, err)
+            # Drain the queue that write never blocks
+            while chunk is not None:
+                chunk = self.chunks.get()
+
+    def write(self, text:str):
+        """
+        write queues text for the file. After an error the text is discarded.
+
+        :param text: Text to be written
+        :type text: str
+        """
+        if self.error is None:
+            self.chunks.put(text)
+
+    def finish(self):
+        """
+        finish lets the thread close the file after the queued text without
+        waiting for it.
+        """
+        self.chunks.put(None)
+
+    def close(self):
+        """
+        close writes the queued text, closes the file and waits for the thread.
+
+        :raises Exception: the error that stopped the thread
+        """
+        self.finish()
+        self.join()
+        try:
+            running_writers.remove(self)
+        except ValueError:
+            pass  # Already waited for by wait_for_writers
+        if self.error is not None:
+            raise self.error
+
+
+def wait_for_writers():
+    """
+    wait_for_writers waits until all background writers are finished.
+
+    :return: False if a file could not be written
+    :rtype: bool
+    """
+    success = True
+    while running_writers:
+        writer = running_writers.pop()
+        writer.join()
+        success = success and writer.error is None
+    return success
@@ -0,0 +1,173 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ multiprocessing for one supervised process per document
+ os for the number of CPUs
+ time for the wall-clock limit
+ json for the failures list
+ logging for logging and debugging
+ signal for ignoring Ctrl+C in the worker processes
+ pathlib to access the file system
+ resource (Unix only) for the memory limit
+"""
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+import json
+import logging
+import signal
+from pathlib import Path
+try:
+    import resource
+except ImportError:
+    resource = None
+from config import Config
+
+
+def run_supervised(target, args:tuple, memory_limit:int, conn):
+    """
+    run_supervised runs a task in a supervised process and reports the result.
+
+    :param target: Function to run
+    :type target: Callable
+    :param args: Arguments of the function
+    :type args: tuple
+    :param memory_limit: Limit of the address space in MiB, 0 for no limit
+    :type memory_limit: int
+    :param conn: Pipe to send the result to the supervisor
+    :type conn: multiprocessing.connection.Connection
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_limit and resource is not None:
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        conn.send(('ok', target(*args)))
+    except MemoryError:
+        conn.send(('error', f'memory limit of {memory_limit} MiB exceeded'))
+    except Exception as err:  # pylint: disable=broad-except
+        conn.send(('error', f'{type(err).__name__}: {err}'))
+    conn.close()
+
+
+class DocumentSupervisor():
+    """
+    DocumentSupervisor processes each document in its own process with a
+    wall-clock and memory limit. A document that hangs, e.g. in an endless loop,
+    is killed after the timeout, and a crash of MuPDF only ends the process of
+    its document. Failed documents are retried once in a fresh process and then
+    quarantined: they are listed with the reason in the failures file, while
+    the other documents continue to run on all workers.
+    Processes are forked where possible, PyMuPDF should be imported before run
+    that the processes start warm.
+    """
+    def __init__(self, cfg:Config):
+        self.log = logging.getLogger('main')
+        settings = cfg.snapshot()
+        batch = settings.batch
+        self.workers = settings.config.workers or os.cpu_count() or 1
+        self.timeout = batch.timeout
+        self.memory_limit = batch.memory_limit
+        self.retries = batch.retries
+        self.failures_file = Path(batch.failures_file).absolute()
+        self.context = multiprocessing.get_context()
+        self.failures = []  # Quarantined documents with reason
+
+    def run(self, files:list, target, args:tuple=()):
+        """
+        run processes all files with target(file, *args) and returns after the
+        last document is finished or quarantined.
+
+        :param files: Paths of the PDF files
+        :type files: list
+        :param target: Function that processes a single document
+        :type target: Callable
+        :param args: Additional arguments of the function
+        :type args: tuple
+        :return: Number of successfully processed documents
+        :rtype: int
+        """
+        pending = [(file, 1) for file in files]  # File and attempt
+        pending.reverse()
+        running = {}  # Process to (file, attempt, start time, pipe)
+        processed = 0
+        while pending or running:
+            while pending and len(running) < self.workers:
+                file, attempt = pending.pop()
+                receiver, sender = self.context.Pipe(duplex=False)
+                process = self.context.Process(target=run_supervised,
+                                               args=(target, (file,) + args,
+                                                     self.memory_limit, sender),
+                                               name=f'document-{Path(file).name}')
+                process.start()
+                sender.close()
+                running[process] = (file, attempt, time.monotonic(), receiver)
+            # Wait for the first process to finish, but not longer than the
+            # first timeout
+            now = time.monotonic()
+            deadline = min(start for _, _, start, _ in running.values()) + self.timeout
+            multiprocessing.connection.wait([process.sentinel for process in running],
+                                            timeout=max(0, deadline - now))
+            for process in list(running):
+                file, attempt, start, receiver = running[process]
+                reason = None
+                if not process.is_alive():
+                    process.join()
+                    try:
+                        status = receiver.recv() if receiver.poll() else None
+                    except EOFError:
+                        # The process ended without a result
+                        status = None
+                    if status and status[0] == 'ok':
+                        processed += 1
+                        if status[1] is False:
+                            self.log.error('Not all output files of "%s" could be written', file)
+                    elif status:
+                        reason = status[1]
+                    elif process.exitcode and process.exitcode < 0:
+                        reason = f'crashed with signal {-process.exitcode}'
+                    else:
+                        reason = f'crashed with exit code {process.exitcode}'
+                elif time.monotonic() - start > self.timeout:
+                    process.kill()
+                    process.join()
+                    reason = f'timeout after {self.timeout} s'
+                else:
+                    continue
+                receiver.close()
+                del running[process]
+                if reason:
+                    self.failed(file, attempt, reason, pending)
+        return processed
+
+    def failed(self, file:Path, attempt:int, reason:str, pending:list):
+        """
+        failed retries a failed document or quarantines it.
+
+        :param file: Path of the PDF file
+        :type file: Path
+        :param attempt: Number of the failed attempt
+        :type attempt: int
+        :param reason: Reason of the failure
+        :type reason: str
+        :param pending: Documents waiting for a worker
+        :type pending: list
+        """
+        if attempt <= self.retries:
+            self.log.warning('Processing "%s" failed (%s), retrying', file, reason)
+            # Retry after the documents that are waiting already
+            pending.insert(0, (file, attempt + 1))
+            return
+        self.log.error('Processing "%s" failed (%s), quarantined', file, reason)
+        failure = {'file': str(file),
+                   'reason': reason,
+                   'attempts': attempt,
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.failures.append(failure)
+        try:
+            with open(self.failures_file, 'a', encoding='utf-8') as fp:
+                fp.write(json.dumps(failure, ensure_ascii=False) + '\n')
+        except OSError as err:
+            self.log.error('Cannot write failures file "%s": %s', self.failures_file, err)
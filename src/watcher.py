@@ -0,0 +1,112 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ os for cheap directory scans
+ time for the settle time of new files
+ json for the list of processed files
+ logging for logging and debugging
+ pathlib to access the file system
+"""
+import os
+import time
+import json
+import logging
+from pathlib import Path
+
+
+class FolderWatcher():
+    """
+    FolderWatcher polls input directories for new or changed PDF files. A file
+    is ready when its size and modification time did not change for the settle
+    time, that files are not processed while they are still copied. The
+    signatures of processed files are stored in a state file, unchanged files
+    are not processed again, also after a restart.
+    A poll only reads directory entries with os.scandir and does not open any
+    file, which keeps the idle load low even for large inboxes.
+    """
+    def __init__(self, directories:list, settle_time:float=2.0, state_file:Path=None):
+        self.log = logging.getLogger('file')
+        self.directories = [Path(directory).absolute() for directory in directories]
+        self.settle_time = settle_time
+        self.state_file = state_file
+        self.pending = {}  # Path to (signature, time the signature was first seen)
+        self.processed = {}  # Path to signature of the processed version
+        if state_file and Path(state_file).exists():
+            try:
+                with open(state_file, 'r', encoding='utf-8') as fp:
+                    self.processed = {path: tuple(signature)
+                                      for path, signature in json.load(fp).items()}
+            except (OSError, ValueError) as err:
+                self.log.error('Cannot read watch state "%s": %s', state_file, err)
+
+    def scan_directory(self, directory:Path, found:dict):
+        """
+        scan_directory collects the signatures of all PDF files of a directory
+        tree.
+
+        :param directory: Directory to scan
+        :type directory: Path
+        :param found: Dictionary that receives path and (size, mtime) of each file
+        :type found: dict
+        """
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        self.scan_directory(entry.path, found)
+                    elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as err:
+            self.log.warning('Cannot scan directory "%s": %s', directory, err)
+
+    def poll(self):
+        """
+        poll scans the directories and returns the files that are new or
+        changed and stable for the settle time.
+
+        :return: List of (path, signature) tuples ready for processing
+        :rtype: list
+        """
+        now = time.monotonic()
+        found = {}
+        for directory in self.directories:
+            self.scan_directory(directory, found)
+        ready = []
+        for path, signature in found.items():
+            if self.processed.get(path) == signature:
+                self.pending.pop(path, None)
+                continue
+            seen = self.pending.get(path)
+            if seen is None or seen[0] != signature:
+                # New or still changing, restart the settle time
+                self.pending[path] = (signature, now)
+            elif now - seen[1] >= self.settle_time:
+                del self.pending[path]
+                ready.append((Path(path), signature))
+        for path in list(self.pending):
+            if path not in found:
+                del self.pending[path]
+        return ready
+
+    def mark_processed(self, path:Path, signature:tuple):
+        """
+        mark_processed remembers the processed version of a file and saves
+        the state file.
+
+        :param path: Path of the PDF file
+        :type path: Path
+        :param signature: Size and modification time from poll
+        :type signature: tuple
+        """
+        self.processed[str(path)] = signature
+        if not self.state_file:
+            return
+        try:
+            temp_file = Path(str(self.state_file) + '.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as fp:
+                json.dump(self.processed, fp)
+            os.replace(temp_file, self.state_file)
+        except OSError as err:
+            self.log.error('Cannot write watch state "%s": %s', self.state_file, err)
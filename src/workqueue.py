@@ -0,0 +1,235 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ os for exclusive lock files
+ socket for the name of the node
+ time for the lease expiry
+ json for the content of lock and done files
+ hashlib for stable hashes of the relative paths
+ logging for logging and debugging
+ threading for renewing the leases in the background
+ pathlib to access the file system
+"""
+import os
+import socket
+import time
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+
+def relative_key(file:Path, roots:list):
+    """
+    relative_key returns the path of a file relative to the input directory it
+    was found in, that all nodes use the same key regardless of the mount point
+    of the shared directory. For nested input directories, e.g. the current
+    directory and a directory given with -p, the most specific one is used.
+
+    :param file: Path of the PDF file
+    :type file: Path
+    :param roots: Input directories
+    :type roots: list
+    :return: Relative path with forward slashes
+    :rtype: str
+    """
+    file = Path(file).absolute()
+    matches = [Path(root).absolute() for root in roots
+               if file.is_relative_to(Path(root).absolute())]
+    if not matches:
+        return file.name
+    root = max(matches, key=lambda root: len(root.parts))
+    return file.relative_to(root).as_posix()
+
+
+def in_shard(key:str, index:int, count:int):
+    """
+    in_shard checks if a file belongs to a shard. The hash does not depend on
+    the Python process, every node computes the same partition.
+
+    :param key: Relative path from relative_key
+    :type key: str
+    :param index: Number of the shard, starting with 1
+    :type index: int
+    :param count: Number of shards
+    :type count: int
+    :return: True if the file belongs to the shard
+    :rtype: bool
+    """
+    digest = hashlib.sha1(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count == index - 1
+
+
+class WorkQueue():
+    """
+    WorkQueue lets several nodes claim documents dynamically from a directory
+    on a shared file system. A document is claimed by creating its lock file
+    exclusively, which is atomic also on NFS. The lock is a lease: it is
+    renewed by a background thread while the document is processed, a lock
+    that was not renewed for lease_time seconds belongs to a dead node and is
+    taken over. Finished documents get a done file and are not claimed again.
+    The clocks of the nodes should be synchronized, the lease time must be
+    much larger than the clock difference.
+    """
+    def __init__(self, directory:Path, lease_time:float=300, node:str=''):
+        self.log = logging.getLogger('main')
+        self.lock_dir = Path(directory, 'locks')
+        self.done_dir = Path(directory, 'done')
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.done_dir.mkdir(parents=True, exist_ok=True)
+        self.lease_time = lease_time
+        self.node = node or f'{socket.gethostname()}-{os.getpid()}'
+        self.held = {}  # Key to lock file of the claimed documents
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat = None
+
+    def _paths(self, key:str):
+        """
+        _paths returns the lock and the done file of a document.
+
+        :param key: Relative path of the document
+        :type key: str
+        :return: Lock file and done file
+        :rtype: tuple
+        """
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return Path(self.lock_dir, name+'.lock'), Path(self.done_dir, name+'.json')
+
+    def claim(self, key:str):
+        """
+        claim tries to take the lease of a document.
+
+        :param key: Relative path of the document
+        :type key: str
+        :return: True if this node processes the document
+        :rtype: bool
+        """
+        lock, done = self._paths(key)
+        if done.exists():
+            return False
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            if not self._break_expired(lock, key):
+                return False
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            json.dump({'key': key, 'node': self.node, 'time': time.time()}, fp)
+        if done.exists():
+            # Finished by another node between the checks
+            lock.unlink(missing_ok=True)
+            return False
+        with self.lock:
+            self.held[key] = lock
+        return True
+
+    def _break_expired(self, lock:Path, key:str):
+        """
+        _break_expired removes the lock of a dead node. The lock is renamed
+        first, that only one node can break it.
+
+        :param lock: Lock file
+        :type lock: Path
+        :param key: Relative path of the document
+        :type key: str
+        :return: True if the lock was removed
+        :rtype: bool
+        """
+        try:
+            if time.time() - lock.stat().st_mtime < self.lease_time:
+                return False
+            stale = Path(str(lock) + '.' + self.node)
+            os.rename(lock, stale)
+        except OSError:
+            # Released or broken by another node
+            return False
+        if time.time() - stale.stat().st_mtime < self.lease_time:
+            # Another node took the lock over in the meantime, put it back
+            try:
+                os.link(stale, lock)
+            except OSError:
+                pass
+            stale.unlink(missing_ok=True)
+            return False
+        try:
+            owner = json.loads(stale.read_text(encoding='utf-8')).get('node')
+        except (OSError, ValueError):
+            owner = 'unknown'
+        stale.unlink(missing_ok=True)
+        self.log.warning('Lease of "%s" held by node %s expired, taking it over', key, owner)
+        return True
+
+    def complete(self, key:str, status:str='done'):
+        """
+        complete marks a document as finished and releases its lease.
+
+        :param key: Relative path of the document
+        :type key: str
+        :param status: done or failed
+        :type status: str
+        """
+        lock, done = self._paths(key)
+        temp_file = Path(str(done) + '.' + self.node)
+        with open(temp_file, 'w', encoding='utf-8') as fp:
+            json.dump({'key': key, 'node': self.node, 'status': status,
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S')}, fp)
+        os.replace(temp_file, done)
+        self.release(key)
+
+    def release(self, key:str):
+        """
+        release gives up the lease of a document without marking it as
+        finished, e.g. when the program is interrupted.
+
+        :param key: Relative path of the document
+        :type key: str
+        """
+        with self.lock:
+            lock = self.held.pop(key, None)
+        if lock:
+            lock.unlink(missing_ok=True)
+
+    def renew(self):
+        """
+        renew extends the leases of all claimed documents.
+        """
+        with self.lock:
+            held = dict(self.held)
+        for key, lock in held.items():
+            try:
+                os.utime(lock)
+            except OSError:
+                self.log.warning('Lost the lease of "%s"', key)
+
+    def start(self):
+        """
+        start renews the leases in a background thread.
+        """
+        def run():
+            while not self.stopped.wait(self.lease_time / 3):
+                self.renew()
+        self.heartbeat = threading.Thread(target=run, name='lease-heartbeat', daemon=True)
+        self.heartbeat.start()
+
+    def stop(self):
+        """
+        stop ends the background thread and releases all leases.
+        """
+        self.stopped.set()
+        if self.heartbeat:
+            self.heartbeat.join()
+        for key in list(self.held):
+            self.release(key)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
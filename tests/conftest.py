@@ -0,0 +1,59 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Shared fixtures for the tests. The PDF files are generated with PyMuPDF,
+ no binary files are stored in the repository.
+"""
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import fitz  # pylint: disable=wrong-import-position
+from config import Config  # pylint: disable=wrong-import-position
+
+LOREM = ('Lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+         'tempor incididunt ut labore et dolore magna aliqua')
+
+
+def make_pdf(path:Path, pages:int=5, first_number:int=1, paragraphs:int=2):
+    """
+    make_pdf writes a simple book with wrapped paragraphs and a printed page
+    number at the bottom of each page, no page numbers if first_number is None.
+    """
+    doc = fitz.open()
+    for pn in range(pages):
+        page = doc.new_page()
+        y = 72
+        for paragraph in range(paragraphs):
+            text = f'Page {pn} paragraph {paragraph}. ' + LOREM + ' ' + LOREM
+            rect = fitz.Rect(72, y, 400, y + 120)
+            page.insert_textbox(rect, text, fontsize=11)
+            y += 140
+        if first_number is not None:
+            page.insert_text((290, 800), str(pn + first_number), fontsize=10)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def cfg(tmp_path):
+    """
+    cfg returns a configuration with default settings that writes into tmp_path.
+    """
+    config = Config(read_file=False)
+    config.cfg.fitz.export.output_dir = str(tmp_path / 'out')
+    config.cfg.config.interactive = False
+    return config
+
+
+@pytest.fixture
+def book(tmp_path):
+    """
+    book returns the path of a generated five page PDF file.
+    """
+    return make_pdf(tmp_path / 'book.pdf')
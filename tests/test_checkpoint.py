@@ -0,0 +1,66 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for resuming documents from checkpoints
+"""
+import shutil
+import pytest
+from fitzdoc import Fitzdoc
+from chaospdf import process_document
+from conftest import make_pdf
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    pages = []
+    interruptions = []
+    extract_page = Fitzdoc.extract_page
+    def interrupted(self, page):
+        if page.pagenumber == 3 and not interruptions:
+            interruptions.append(page.pagenumber)
+            raise Interrupted
+        pages.append(page.pagenumber)
+        return extract_page(self, page)
+    monkeypatch.setattr(Fitzdoc, 'extract_page', interrupted)
+    return pages
+
+
+def outputs(directory):
+    return {path.name: path.read_text(encoding='utf-8') for path in directory.iterdir()
+            if path.suffix in ('.txt', '.html', '.jsonl')}
+
+
+def test_resume_after_an_interruption(cfg, tmp_path, extracted):
+    book = make_pdf(tmp_path / 'resumed' / 'book.pdf')
+    shutil.copy(book, tmp_path / 'book.pdf')
+    cfg.cfg.fitz.export.write_jsonl = True
+    cfg.cfg.batch.checkpoint = True
+    cfg.cfg.batch.checkpoint_interval = 1
+    with pytest.raises(Interrupted):
+        process_document(book, cfg)
+    checkpoint = book.parent / 'book' / 'book.checkpoint.jsonl'
+    assert checkpoint.exists()
+    del extracted[:]
+    process_document(book, cfg)
+    # Only the pages after the checkpoint are extracted again
+    assert extracted == [3, 4]
+    assert not checkpoint.exists()
+    cfg.cfg.batch.checkpoint = False
+    process_document(tmp_path / 'book.pdf', cfg)
+    assert outputs(book.parent / 'book') == outputs(tmp_path / 'book')
+
+
+def test_changed_settings_start_from_the_first_page(cfg, book, extracted):
+    cfg.cfg.batch.checkpoint = True
+    cfg.cfg.batch.checkpoint_interval = 1
+    with pytest.raises(Interrupted):
+        process_document(book, cfg)
+    del extracted[:]
+    cfg.cfg.fitz.text.tier = 'dict'
+    process_document(book, cfg)
+    assert extracted == [0, 1, 2, 3, 4]
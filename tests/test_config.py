@@ -0,0 +1,67 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the configuration
+"""
+import json
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from config import Config, FrozenSettings
+
+
+def test_snapshot_is_immutable(cfg):
+    settings = cfg.snapshot()
+    with pytest.raises(AttributeError):
+        settings.fitz.text.tier = 'fast'
+    cfg.cfg.fitz.text.tier = 'fast'
+    assert settings.fitz.text.tier == 'quality'
+    assert cfg.snapshot().fitz.text.tier == 'fast'
+
+
+def test_snapshot_digest(cfg):
+    settings = cfg.snapshot()
+    assert settings.digest == cfg.snapshot().digest
+    assert settings == cfg.snapshot()
+    assert hash(settings) == hash(cfg.snapshot())
+    changed = settings.replace({'fitz.text.tier': 'fast'})
+    assert changed.fitz.text.tier == 'fast'
+    assert changed.digest != settings.digest
+    with pytest.raises(KeyError):
+        settings.replace({'fitz.text.no_such_setting': 1})
+
+
+def test_snapshot_pickle(cfg):
+    settings = cfg.snapshot()
+    copy = pickle.loads(pickle.dumps(settings))
+    assert isinstance(copy, FrozenSettings)
+    assert copy == settings
+    assert copy.fitz.export.output_dir == settings.fitz.export.output_dir
+    assert isinstance(copy.to_dict()['fitz'], dict)
+
+
+def test_old_configuration_file_keeps_new_defaults(tmp_path):
+    (tmp_path / 'chaospdf.json').write_text(
+        json.dumps({'fitz': {'text': {'tier': 'dict'}, 'export': {'write_toc': False}}}),
+        encoding='utf-8')
+    config = Config(read_file=False)
+    config.cfg.config.config_dir = str(tmp_path)
+    config.read_config()
+    assert config.cfg.fitz.text.tier == 'dict'
+    assert config.cfg.fitz.export.write_toc is False
+    # Settings that are missing in the file keep their defaults
+    assert config.cfg.fitz.export.write_html is True
+    assert config.cfg.fitz.text.offset_sample_pages == 40
+    assert config.cfg.batch.chunk_pages == 500
+
+
+def test_startup_does_not_import_pymupdf():
+    src = Path(__file__).resolve().parent.parent / 'src'
+    code = ('import sys; import chaospdf; '
+            'print(sorted(m for m in ("fitz", "pymupdf", "fitzdoc", "sqlite3") if m in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=src, capture_output=True,
+                            text=True, check=True).stdout
+    assert output.strip() == '[]'
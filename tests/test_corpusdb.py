@@ -0,0 +1,39 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the corpus database
+"""
+import sqlite3
+import pytest
+from corpusdb import CorpusStore
+from outfile import corpus_writer
+from chaospdf import process_document
+from conftest import make_pdf
+
+
+def test_documents_with_the_same_name(cfg, tmp_path):
+    first = make_pdf(tmp_path / 'a' / 'book.pdf', pages=2)
+    second = make_pdf(tmp_path / 'b' / 'book.pdf', pages=3)
+    cfg.cfg.fitz.export.write_corpus = True
+    corpus = corpus_writer(cfg)
+    for file in (first, second, first):
+        process_document(file, cfg, corpus)
+    corpus.close()
+    with sqlite3.connect(tmp_path / 'out' / 'chaospdf.sqlite') as con:
+        documents = con.execute('SELECT name, path FROM documents ORDER BY path').fetchall()
+        assert documents == [('book', str(first)), ('book', str(second))]
+        # Processing a document again replaces its pages
+        pages = con.execute('SELECT d.path, COUNT(*) FROM pages p JOIN documents d ' +
+                            'ON p.doc_id = d.id GROUP BY d.path ORDER BY d.path').fetchall()
+        assert pages == [(str(first), 2), (str(second), 3)]
+        hits = con.execute("SELECT rowid FROM pages_fts WHERE pages_fts MATCH 'paragraph'").fetchall()
+        assert len(hits) == 5
+
+
+def test_database_of_an_older_version(tmp_path):
+    path = tmp_path / 'old.sqlite'
+    with sqlite3.connect(path) as con:
+        con.execute('CREATE TABLE documents (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+    with pytest.raises(sqlite3.OperationalError):
+        CorpusStore(path)
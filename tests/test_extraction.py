@@ -0,0 +1,48 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the library interface
+"""
+import threading
+import pytest
+from extraction import iter_pages
+from fitzdoc import Fitzdoc
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    pages = []
+    extract_page = Fitzdoc.extract_page
+    def counting(self, page):
+        pages.append(page.pagenumber)
+        return extract_page(self, page)
+    monkeypatch.setattr(Fitzdoc, 'extract_page', counting)
+    return pages
+
+
+def test_break_stops_the_extraction(book, extracted):
+    for result in iter_pages(book, {'fitz.text.tier': 'fast'}):
+        if result.index == 1:
+            break
+    assert extracted == [0, 1]
+    assert 'Page 1 paragraph 0.' in result.text
+    assert result.xhtml == ''
+
+
+def test_cancel_from_another_thread(book, extracted):
+    cancel = threading.Event()
+    results = []
+    for result in iter_pages(book.read_bytes(), document_id='book', cancel=cancel):
+        results.append(result)
+        cancel.set()
+    assert [result.index for result in results] == [0]
+    assert extracted == [0]
+
+
+def test_options(book):
+    results = list(iter_pages(str(book), {'fitz.pages.ranges': '4-'}))
+    assert [result.index for result in results] == [3, 4]
+    assert not list(iter_pages(book, {'fitz.pages.ranges': '9-'}))
+    with pytest.raises(KeyError):
+        list(iter_pages(book, {'fitz.text.no_such_setting': True}))
@@ -0,0 +1,132 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the document processing
+"""
+import argparse
+import random
+import fitz
+import pytest
+from fitzdoc import Fitzdoc, parse_page_ranges, sample_page_indices
+from outfile import Outfile
+from fitzpage import Fitzpage, PAGE_EMPTY, PAGE_IMAGE, PAGE_TEXT, PAGE_MIXED
+from chaospdf import page_ranges, process_document
+from conftest import make_pdf, LOREM
+
+
+def test_page_offset_from_a_sample(cfg, tmp_path, monkeypatch):
+    doc = Fitzdoc(make_pdf(tmp_path / 'long.pdf', pages=60, first_number=11, paragraphs=1), cfg)
+    probed = []
+    candidate = Fitzdoc._page_offset_candidate
+    monkeypatch.setattr(Fitzdoc, '_page_offset_candidate',
+                        lambda self, pn: probed.append(pn) or candidate(self, pn))
+    assert doc.detect_page_offset() == -11
+    # Stops after the minimum number of votes, spread over the document
+    assert probed == [0, 32, 16, 48, 8]
+
+
+def test_page_offset_without_page_numbers(cfg, tmp_path):
+    cfg.cfg.fitz.text.offset_sample_pages = 4
+    doc = Fitzdoc(make_pdf(tmp_path / 'plain.pdf', pages=10, first_number=None), cfg)
+    assert doc.detect_page_offset() == 0
+
+
+def test_spread_page_order():
+    assert list(Fitzdoc._spread_page_order(6)) == [0, 4, 2, 1, 3, 5]
+
+
+def paragraph(pn, number):
+    return f'Page {pn} paragraph {number}. {LOREM} {LOREM}\n'
+
+
+def test_fast_tier_skips_the_xhtml(cfg, tmp_path, monkeypatch):
+    def no_xhtml(self):
+        raise AssertionError('XHTML extracted in the fast tier')
+    monkeypatch.setattr(Fitzpage, 'get_xhtml', no_xhtml)
+    cfg.cfg.fitz.text.tier = 'fast'
+    doc = Fitzdoc(make_pdf(tmp_path / 'book.pdf', pages=2, first_number=0), cfg)
+    doc.process_pages(0)
+    # Lines are joined with spaces and the page numbers are removed
+    assert doc.text == ''.join(paragraph(pn, number) for pn in range(2) for number in range(2))
+    assert doc.html == ''
+
+
+def test_page_classes(cfg, tmp_path):
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 16, 16), False)
+    pixmap.clear_with(128)
+    doc = fitz.open()
+    doc.new_page()
+    doc.new_page().insert_image(fitz.Rect(72, 72, 200, 200), pixmap=pixmap)
+    doc.new_page().insert_text((72, 72), 'Only text')
+    page = doc.new_page()
+    page.insert_text((72, 72), 'Text and an image')
+    page.insert_image(fitz.Rect(72, 100, 200, 228), pixmap=pixmap)
+    doc.save(tmp_path / 'classes.pdf')
+    doc = Fitzdoc(tmp_path / 'classes.pdf', cfg)
+    doc.process_pages(0)
+    assert [result.page_class for result in doc.page_results] == [
+        PAGE_EMPTY, PAGE_IMAGE, PAGE_TEXT, PAGE_MIXED]
+    assert doc.page_classes == {PAGE_EMPTY: 1, PAGE_IMAGE: 1, PAGE_TEXT: 1, PAGE_MIXED: 1}
+    # Pages without text are not extracted
+    assert [result.xhtml for result in doc.page_results[:2]] == ['', '']
+    assert 'Text and an image' in doc.page_results[3].text
+
+
+def test_page_ranges():
+    assert parse_page_ranges('1-3, 8-', 10) == [0, 1, 2, 7, 8, 9]
+    assert parse_page_ranges('-2,5,5,20-30', 10) == [0, 1, 4]
+    assert parse_page_ranges('12-', 10) == []
+    for ranges in ('0-2', '5-3', 'a'):
+        with pytest.raises(ValueError):
+            parse_page_ranges(ranges, 10)
+    with pytest.raises(argparse.ArgumentTypeError):
+        page_ranges('5-3')
+    assert page_ranges('1-20,300-') == '1-20,300-'
+
+
+def test_sample_page_indices():
+    assert sample_page_indices(list(range(100)), 4) == [0, 25, 50, 75]
+    assert sample_page_indices([3, 4], 5) == [3, 4]
+
+
+def test_selected_pages_are_processed(cfg, tmp_path):
+    cfg.cfg.fitz.pages.ranges = '2-9'
+    cfg.cfg.fitz.pages.sample = 2
+    doc = Fitzdoc(make_pdf(tmp_path / 'book.pdf', pages=10, paragraphs=1), cfg)
+    assert doc.selected_pages == [1, 5]
+    doc.process_pages(0)
+    assert [result.index for result in doc.page_results] == [1, 5]
+
+
+def test_document_without_selected_pages_is_skipped(cfg, book):
+    cfg.cfg.fitz.pages.ranges = '50-60'
+    process_document(book, cfg)
+    assert not (book.parent / 'book').exists()
+
+
+def test_document_in_memory(cfg, book, tmp_path):
+    with pytest.raises(ValueError):
+        Fitzdoc(book.read_bytes(), cfg)
+    in_memory = Fitzdoc(book.read_bytes(), cfg, 'upload')
+    assert in_memory.file is None
+    in_memory.process_pages(0)
+    from_file = Fitzdoc(book, cfg)
+    from_file.process_pages(0)
+    assert in_memory.page_results == from_file.page_results
+    out = Outfile(None, cfg, 'upload')
+    assert out.location == tmp_path / 'out' / 'upload'
+
+
+def test_images_in_memory_are_passed_to_the_sink(cfg, tmp_path):
+    rng = random.Random(1)
+    samples = bytes(rng.randrange(256) for _ in range(200 * 200 * 3))
+    doc = fitz.open()
+    doc.new_page().insert_image(fitz.Rect(72, 72, 272, 272),
+                                pixmap=fitz.Pixmap(fitz.csRGB, 200, 200, samples, False))
+    images = []
+    in_memory = Fitzdoc(doc.tobytes(), cfg, 'upload')
+    in_memory.extract_images(lambda data, name, xref, width, height: images.append(
+        (name, width, height)))
+    assert [(width, height) for name, width, height in images] == [(200, 200)]
+    assert not (tmp_path / 'out').exists()
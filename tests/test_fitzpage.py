@@ -0,0 +1,58 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the page processing
+"""
+import fitz
+from fitzpage import Fitzpage
+
+
+def line_breaks(page):
+    fitzpage = Fitzpage(page, page.number)
+    fitzpage.get_xhtml()
+    fitzpage.fix_xhtml_utf_characters()
+    fitzpage.fix_xhtml_line_breaks()
+    return fitzpage
+
+
+def test_wrapped_paragraphs_take_the_fast_path(book, monkeypatch):
+    with fitz.open(book) as doc:
+        fast = [line_breaks(page) for page in doc]
+        assert all(page.executed['fix_xhtml_line_breaks_aligned'] for page in fast)
+        monkeypatch.setattr(Fitzpage, '_xhtml_line_breaks_aligned', lambda self: False)
+        slow = [line_breaks(page) for page in doc]
+    assert [page.xhtml for page in fast] == [page.xhtml for page in slow]
+    assert all(page.xhtml.count('<p>') >= 2 for page in fast)
+
+
+def cleaned(page, xhtml):
+    fitzpage = Fitzpage(page, 7)
+    fitzpage.xhtml = xhtml
+    fitzpage.fix_xhtml_utf_characters()
+    fitzpage._xhtml_inline_headings()
+    fitzpage._xhtml_replacements()
+    fitzpage.remove_xhtml_page_number()
+    return fitzpage.xhtml
+
+
+def test_xhtml_cleanup_steps(book):
+    with fitz.open(book) as doc:
+        xhtml = cleaned(doc[0], '<h2>Title</h2><p>e&#xfb03; cient &amp; &lt;b&gt; </p>\n'
+                                '<p>more<b> </b></p>\n\n<p><b>7</b></p>\n7\n<p>17</p>\n')
+    assert xhtml == '<h2>Title</h2>\n<p>efficient & \u2039b\u203a more</p>\n<p>17</p>\n'
+
+
+def test_dict_tier_joins_hyphenated_words():
+    doc = fitz.open()
+    page = doc.new_page()
+    # Hyphenation within a block and at the end of a block
+    page.insert_text((72, 72), 'Plain start bold-\nface continues here.', fontname='hebo')
+    page.insert_text((72, 120), 'Now italic hyph-', fontname='heit')
+    page.insert_text((72, 220), 'enation plain end.', fontname='helv')
+    fitzpage = Fitzpage(page, 0)
+    fitzpage.get_dict_xhtml()
+    assert fitzpage.xhtml == ('<p><b>Plain start boldface continues here.</b></p>\n'
+                              '<p><i>Now italic hyph</i>enation plain end.</p>\n')
+    assert fitzpage.text == ('Plain start boldface continues here.\n'
+                             'Now italic hyphenation plain end.\n')
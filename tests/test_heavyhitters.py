@@ -0,0 +1,41 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the repeating text detection
+"""
+import random
+import fitz
+from heavyhitters import SpaceSaving, text_hash
+from fitzdoc import Fitzdoc
+from conftest import make_pdf
+
+
+def test_frequent_items_are_kept_with_bounded_memory():
+    rng = random.Random(1)
+    stream = [rng.randrange(100000) for _ in range(20000)] + [-1] * 500
+    rng.shuffle(stream)
+    summary = SpaceSaving(50)
+    for item in stream:
+        summary.add(item)
+    assert len(summary.counters) == 50
+    assert len(summary.heap) <= 4 * 50 + 1
+    assert -1 in summary.candidates(5)
+    # Counts are upper bounds
+    assert summary.counters[-1] >= 500
+
+
+def test_text_hash_ignores_the_layout():
+    assert text_hash('Chapter  one\nTitle') == text_hash('Chapter one Title')
+    assert text_hash('Chapter one') != text_hash('Chapter two')
+
+
+def test_repeating_header_is_detected(cfg, tmp_path):
+    path = make_pdf(tmp_path / 'book.pdf', pages=8, paragraphs=1)
+    with fitz.open(path) as doc:
+        for page in doc:
+            page.insert_text((72, 40), 'The Running Header', fontsize=9)
+        doc.save(tmp_path / 'header.pdf')
+    cfg.cfg.fitz.text.repeating_text_capacity = 4
+    repeating = Fitzdoc(tmp_path / 'header.pdf', cfg).detect_repeating_text()
+    assert [(text.strip(), count) for text, count in repeating] == [('The Running Header', 8)]
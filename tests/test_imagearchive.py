@@ -0,0 +1,57 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the image archives
+"""
+import json
+import random
+import tarfile
+import zipfile
+import fitz
+import pytest
+from imagearchive import ImageArchive, read_archive_image
+from chaospdf import process_document
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'tar'])
+def test_images_are_read_by_offset(tmp_path, archive_format):
+    images = {f'image{i}.png': bytes(range(i, 256)) * (i + 1) for i in range(3)}
+    path = tmp_path / f'images.{archive_format}'
+    archive = ImageArchive(path, archive_format)
+    for xref, (name, data) in enumerate(images.items()):
+        archive.add(data, name, xref, 10, 20)
+    assert archive.remove({1}) == 1
+    archive.close()
+    index = json.loads(path.with_name(path.name + '.json').read_text(encoding='utf-8'))
+    assert [entry['name'] for entry in index['images']] == ['image0.png', 'image2.png']
+    for entry in index['images']:
+        assert read_archive_image(path, entry) == images[entry['name']]
+    # The archive is valid for the standard tools
+    if archive_format == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            assert zf.read('image2.png') == images['image2.png']
+    else:
+        with tarfile.open(path) as tf:
+            assert tf.extractfile('image2.png').read() == images['image2.png']
+
+
+def test_document_images_in_one_archive(cfg, tmp_path):
+    rng = random.Random(1)
+    doc = fitz.open()
+    for value in range(2):
+        # Noise that the images pass the size and compression limits
+        samples = bytes(rng.randrange(256) for _ in range(200 * 200 * 3))
+        pixmap = fitz.Pixmap(fitz.csRGB, 200, 200, samples, False)
+        page = doc.new_page()
+        page.insert_text((72, 72), f'Image {value}')
+        page.insert_image(fitz.Rect(72, 100, 200, 228), pixmap=pixmap)
+    doc.save(tmp_path / 'images.pdf')
+    cfg.cfg.fitz.images.archive = 'zip'
+    process_document(tmp_path / 'images.pdf', cfg)
+    location = tmp_path / 'images'
+    index = json.loads((location / 'images.images.zip.json').read_text(encoding='utf-8'))
+    assert len(index['images']) == 2
+    assert sorted(path.name for path in location.iterdir()
+                  if path.suffix not in ('.html', '.txt')) == ['images.images.zip',
+                                                              'images.images.zip.json']
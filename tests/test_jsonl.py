@@ -0,0 +1,31 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the JSON Lines output
+"""
+import json
+from chaospdf import process_document
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_rerun_replaces_the_records(cfg, book):
+    cfg.cfg.fitz.export.write_jsonl = True
+    process_document(book, cfg)
+    process_document(book, cfg)
+    records = read_records(book.parent / 'book' / 'book.jsonl')
+    assert [record['index'] for record in records] == [0, 1, 2, 3, 4]
+    assert records[0]['doc'] == 'book'
+    assert records[0]['page'] == 1
+
+
+def test_append_is_opt_in(cfg, book):
+    cfg.cfg.fitz.export.write_jsonl = True
+    cfg.cfg.fitz.export.append_jsonl = True
+    process_document(book, cfg)
+    process_document(book, cfg)
+    assert len(read_records(book.parent / 'book' / 'book.jsonl')) == 10
@@ -0,0 +1,30 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the output file locations
+"""
+import json
+from outfile import Outfile, MANIFEST_NAME
+
+
+def test_sharded_layout_keeps_documents_with_the_same_name_apart(cfg, tmp_path):
+    cfg.cfg.fitz.export.layout = 'sharded'
+    cfg.cfg.fitz.export.use_pdf_output_dir = False
+    first = Outfile(tmp_path / 'a' / 'book.pdf', cfg)
+    second = Outfile(tmp_path / 'b' / 'book.pdf', cfg)
+    assert first.location != second.location
+    assert first.basename == second.basename == 'book'
+    first.record_manifest(tmp_path / 'a' / 'book.pdf')
+    second.record_manifest(tmp_path / 'b' / 'book.pdf')
+    with open(tmp_path / 'out' / MANIFEST_NAME, encoding='utf-8') as fp:
+        locations = [json.loads(line)['location'] for line in fp]
+    assert len(set(locations)) == 2
+
+
+def test_sharded_layout_is_stable(cfg, tmp_path):
+    cfg.cfg.fitz.export.layout = 'sharded'
+    cfg.cfg.fitz.export.use_pdf_output_dir = False
+    file = tmp_path / 'a' / 'book.pdf'
+    assert Outfile(file, cfg).location == Outfile(file, cfg).location
+    assert len(Outfile(file, cfg).location.relative_to(tmp_path / 'out').parts) == 3
@@ -0,0 +1,40 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the page results
+"""
+import pickle
+import fitz
+from pageresult import PageResult
+from fitzpage import Fitzpage
+
+
+def test_pickle_round_trip():
+    result = PageResult(3, 5, 'text', '<p>text</p>', 'text', True, 5, (12, 14))
+    assert not hasattr(result, '__dict__')
+    copy = pickle.loads(pickle.dumps(result))
+    assert copy == result
+    assert copy.image_xrefs == (12, 14)
+    assert copy != PageResult(3, 5, 'other text')
+
+
+def test_record():
+    result = PageResult(0, 1, 'text', '<p>text</p>', 'text', False, 1, (7,))
+    assert result.to_record('book') == {'doc': 'book', 'index': 0, 'page': 1, 'class': 'text',
+                                        'text': 'text', 'xhtml': '<p>text</p>', 'images': [7]}
+
+
+def test_result_of_a_processed_page(book):
+    with fitz.open(book) as doc:
+        page = Fitzpage(doc[2], 2)
+        assert not hasattr(page, '__dict__')
+        assert page.pagenumber == 2
+        page.get_xhtml()
+        page.fix_xhtml_utf_characters()
+        page.fix_xhtml_line_breaks()
+        result = page.result()
+    assert (result.index, result.number) == (2, 2)
+    assert result.xhtml == page.xhtml
+    assert result.text == page.text
+    assert result.aligned
@@ -0,0 +1,35 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the pipe mode
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+CHAOSPDF = Path(__file__).resolve().parent.parent / 'src' / 'chaospdf.py'
+
+
+def run_pipe(tmp_path, data, *args):
+    return subprocess.run([sys.executable, str(CHAOSPDF), '-', *args], input=data,
+                          capture_output=True, cwd=tmp_path, check=False, timeout=120)
+
+
+def test_jsonl_on_stdout(book, tmp_path):
+    process = run_pipe(tmp_path, book.read_bytes(), '--doc-id', 'piped', '--pages', '2-3')
+    assert process.returncode == 0
+    records = [json.loads(line) for line in process.stdout.decode('utf-8').splitlines()]
+    assert [(record['doc'], record['index']) for record in records] == [('piped', 1),
+                                                                        ('piped', 2)]
+    assert 'Page 1 paragraph 0.' in records[0]['text']
+    # No output files without an image directory
+    assert sorted(path.name for path in tmp_path.iterdir()
+                  if path.suffix != '.log') == ['book.pdf']
+
+
+def test_empty_input(tmp_path):
+    process = run_pipe(tmp_path, b'')
+    assert process.returncode == 1
+    assert process.stdout == b''
@@ -0,0 +1,58 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the batch scheduler
+"""
+import shutil
+from pathlib import Path
+from scheduler import BatchScheduler, Job
+from chaospdf import process_document, schedule
+from conftest import make_pdf
+
+
+def test_large_documents_are_split(cfg, tmp_path):
+    cfg.cfg.config.workers = 2
+    cfg.cfg.batch.chunk_pages = 5
+    small = make_pdf(tmp_path / 'small.pdf', pages=3)
+    large = make_pdf(tmp_path / 'large.pdf', pages=12, first_number=0)
+    jobs = BatchScheduler(cfg).plan([small, large])
+    assert [(Path(job.file).name, job.pages, job.part) for job in jobs] == [
+        ('small.pdf', None, None),
+        ('large.pdf', [0, 1, 2, 3], 0),
+        ('large.pdf', [4, 5, 6, 7], 1),
+        ('large.pdf', [8, 9, 10, 11], 2),
+        ('large.pdf', None, None)]
+    assert jobs[-1].parts == 3
+    # All chunks share the page offset of the whole document
+    assert {job.offset for job in jobs[1:]} == {0}
+
+
+def test_predicted_makespan(cfg):
+    cfg.cfg.config.workers = 2
+    scheduler = BatchScheduler(cfg)
+    # Longest job first: 5 + 1 and 3 + 3
+    jobs = [Job('a', 1), Job('b', 3), Job('c', 5), Job('d', 3)]
+    assert scheduler.predict_makespan(jobs) == 6
+    # The document job runs after its chunks
+    chunks = [Job('e', 2, [0], 0), Job('e', 2, [1], 1), Job('e', 1, parts=2)]
+    assert scheduler.predict_makespan(chunks) == 3
+
+
+def outputs(directory):
+    return {path.name: path.read_text(encoding='utf-8') for path in directory.iterdir()
+            if path.suffix in ('.txt', '.html', '.jsonl')}
+
+
+def test_chunks_give_the_same_outputs(cfg, tmp_path):
+    large = make_pdf(tmp_path / 'parallel' / 'large.pdf', pages=7)
+    shutil.copy(large, tmp_path / 'large.pdf')
+    cfg.cfg.fitz.export.write_jsonl = True
+    cfg.cfg.config.workers = 2
+    cfg.cfg.batch.chunk_pages = 3
+    schedule(cfg, [large])
+    process_document(tmp_path / 'large.pdf', cfg)
+    chunked = outputs(large.parent / 'large')
+    assert sorted(chunked) == ['large.html', 'large.jsonl', 'large.toc.txt', 'large.txt']
+    assert chunked == outputs(tmp_path / 'large')
+    assert not list((large.parent / 'large').glob('*.checkpoint.jsonl'))
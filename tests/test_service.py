@@ -0,0 +1,72 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the extraction service
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import service
+from service import ExtractionService
+
+
+def sleeping_request(source, settings, output_format, document_id, conn):
+    """
+    sleeping_request replaces run_request, it sleeps as many seconds as the
+    document identifier says.
+    """
+    time.sleep(float(document_id))
+    conn.send(('ok', (f'slept {document_id}', 1)))
+    conn.close()
+
+
+def run_requests(svc, params, body=b''):
+    async def requests():
+        svc.slots = asyncio.Semaphore(svc.workers)
+        svc.executor = ThreadPoolExecutor(max_workers=2 * svc.workers)
+        return await asyncio.gather(*(svc.extract(param, body) for param in params))
+    return asyncio.run(requests())
+
+
+def test_extracts_the_text(cfg, book):
+    svc = ExtractionService(cfg)
+    [(status, _, body, _)] = run_requests(svc, [{'path': str(book), 'format': 'text'}])
+    assert status == 200
+    assert 'Page 0 paragraph 0.' in body
+    assert svc.metrics['pages_total'] == 5
+
+
+def test_queued_requests_do_not_time_out(cfg, book, monkeypatch):
+    monkeypatch.setattr(service, 'run_request', sleeping_request)
+    cfg.cfg.service.workers = 1
+    cfg.cfg.service.timeout = 1.5
+    svc = ExtractionService(cfg)
+    # Each request runs for 1 s, the second one waits for the first
+    responses = run_requests(svc, [{'path': str(book), 'doc': '1'}] * 2)
+    assert [response[0] for response in responses] == [200, 200]
+
+
+def test_timed_out_request_is_killed(cfg, book, monkeypatch):
+    monkeypatch.setattr(service, 'run_request', sleeping_request)
+    cfg.cfg.service.timeout = 0.5
+    svc = ExtractionService(cfg)
+    begin = time.monotonic()
+    [(status, _, _, _)] = run_requests(svc, [{'path': str(book), 'doc': '30'}])
+    assert status == 504
+    assert time.monotonic() - begin < 10
+    assert svc.metrics['workers_killed_total'] == 1
+    assert not svc.running
+
+
+def test_uploaded_document(cfg, book):
+    svc = ExtractionService(cfg)
+    [(status, _, body, _)] = run_requests(svc, [{'doc': 'sent'}], book.read_bytes())
+    assert status == 200
+    records = [json.loads(line) for line in body.splitlines()]
+    assert [(record['doc'], record['index']) for record in records] == [
+        ('sent', index) for index in range(5)]
+    # Nothing is written to the file system
+    assert not Path(cfg.cfg.fitz.export.output_dir).exists()
@@ -0,0 +1,53 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the background writer
+"""
+import gzip
+import shutil
+import pytest
+from streamwriter import BackgroundWriter, wait_for_writers
+from chaospdf import process_document
+
+
+def test_compressed_text(tmp_path):
+    writer = BackgroundWriter(tmp_path / 'out.txt.gz', queue_size=2)
+    for i in range(10):
+        writer.write(f'line {i}\n')
+    writer.close()
+    with gzip.open(tmp_path / 'out.txt.gz', 'rt', encoding='utf-8') as fp:
+        assert fp.read().splitlines()[-1] == 'line 9'
+
+
+def test_error_does_not_block_the_producer(tmp_path):
+    writer = BackgroundWriter(tmp_path / 'out.txt.gz', queue_size=2)
+    writer.write(b'not text')
+    # More chunks than the queue can hold
+    for i in range(10):
+        writer.write(f'line {i}\n')
+    with pytest.raises(TypeError):
+        writer.close()
+    assert wait_for_writers()
+
+
+def test_missing_directory(tmp_path):
+    writer = BackgroundWriter(tmp_path / 'missing' / 'out.txt.gz')
+    writer.write('text')
+    writer.finish()
+    assert not wait_for_writers()
+    assert isinstance(writer.error, OSError)
+
+
+def test_compressed_document_outputs(cfg, book, tmp_path):
+    cfg.cfg.fitz.export.write_jsonl = True
+    process_document(book, cfg)
+    plain = {path.name: path.read_text(encoding='utf-8')
+             for path in (tmp_path / 'book').iterdir()}
+    shutil.rmtree(tmp_path / 'book')
+    cfg.cfg.fitz.export.compression = 'gzip'
+    process_document(book, cfg)
+    assert wait_for_writers()
+    for name, text in plain.items():
+        with gzip.open(tmp_path / 'book' / (name + '.gz'), 'rt', encoding='utf-8') as fp:
+            assert fp.read() == text
@@ -0,0 +1,53 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the supervised batch processing
+"""
+import json
+import os
+import signal
+import time
+from pathlib import Path
+from supervisor import DocumentSupervisor
+
+
+def fragile_task(file, attempts_dir):
+    """
+    fragile_task behaves like the name of the file says.
+    """
+    attempt = Path(attempts_dir, Path(file).name)
+    with open(attempt, 'a', encoding='utf-8') as fp:
+        fp.write('x')
+    name = Path(file).stem
+    if name == 'hang':
+        time.sleep(60)
+    if name == 'crash':
+        os.kill(os.getpid(), signal.SIGKILL)
+    if name == 'error':
+        raise RuntimeError('broken document')
+    if name == 'flaky' and attempt.stat().st_size == 1:
+        os._exit(3)
+    return True
+
+
+def test_failed_documents_are_retried_and_quarantined(cfg, tmp_path):
+    cfg.cfg.config.workers = 2
+    cfg.cfg.batch.timeout = 1
+    cfg.cfg.batch.retries = 1
+    cfg.cfg.batch.failures_file = str(tmp_path / 'failures.jsonl')
+    supervisor = DocumentSupervisor(cfg)
+    files = [tmp_path / f'{name}.pdf' for name in ('ok', 'hang', 'crash', 'error', 'flaky')]
+    begin = time.monotonic()
+    assert supervisor.run(files, fragile_task, (tmp_path,)) == 2
+    assert time.monotonic() - begin < 30
+    failures = [json.loads(line)
+                for line in (tmp_path / 'failures.jsonl').read_text(encoding='utf-8').splitlines()]
+    reasons = {Path(failure['file']).stem: failure['reason'] for failure in failures}
+    assert reasons == {'hang': 'timeout after 1 s',
+                       'crash': f'crashed with signal {signal.SIGKILL.value}',
+                       'error': 'RuntimeError: broken document'}
+    assert all(failure['attempts'] == 2 for failure in failures)
+    attempts = {path.stem: path.stat().st_size for path in tmp_path.iterdir()
+                if path.suffix == '.pdf'}
+    assert attempts == {'ok': 1, 'hang': 2, 'crash': 2, 'error': 2, 'flaky': 2}
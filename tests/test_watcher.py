@@ -0,0 +1,60 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the watch folder
+"""
+import watcher
+from watcher import FolderWatcher
+
+
+class Clock():
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_files_are_ready_after_the_settle_time(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watcher.time, 'monotonic', clock)
+    inbox = tmp_path / 'inbox'
+    (inbox / 'sub').mkdir(parents=True)
+    pdf = inbox / 'sub' / 'new.pdf'
+    pdf.write_bytes(b'%PDF-1.7 part')
+    (inbox / 'notes.txt').write_text('not a PDF', encoding='utf-8')
+    folder = FolderWatcher([inbox], settle_time=2.0)
+    assert folder.poll() == []
+    clock.now += 1
+    # Still copied, the settle time starts again
+    pdf.write_bytes(b'%PDF-1.7 part and more')
+    assert folder.poll() == []
+    clock.now += 1.5
+    assert folder.poll() == []
+    clock.now += 1
+    [(path, signature)] = folder.poll()
+    assert path == pdf
+    folder.mark_processed(path, signature)
+    clock.now += 5
+    assert folder.poll() == []
+
+
+def test_state_survives_a_restart(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watcher.time, 'monotonic', clock)
+    state = tmp_path / 'state.json'
+    pdf = tmp_path / 'inbox' / 'book.pdf'
+    pdf.parent.mkdir()
+    pdf.write_bytes(b'%PDF-1.7')
+    folder = FolderWatcher([pdf.parent], settle_time=0, state_file=state)
+    folder.poll()
+    [(path, signature)] = folder.poll()
+    folder.mark_processed(path, signature)
+    restarted = FolderWatcher([pdf.parent], settle_time=0, state_file=state)
+    restarted.poll()
+    assert restarted.poll() == []
+    # A changed file is processed again
+    pdf.write_bytes(b'%PDF-1.7 changed')
+    restarted.poll()
+    assert [path for path, _ in restarted.poll()] == [pdf]
@@ -0,0 +1,51 @@
+"""
+ GNU GPL V3
+ (c) 2023 Akram Radwan
+
+ Tests for the shards and the shared work queue
+"""
+import os
+import time
+from workqueue import WorkQueue, relative_key, in_shard
+
+
+def test_relative_key_uses_the_most_specific_root(tmp_path, monkeypatch):
+    corpus = tmp_path / 'share' / 'corpus'
+    monkeypatch.chdir(tmp_path)
+    # -p extends the default ['.']
+    assert relative_key(corpus / 'sub' / 'a.pdf', ['.', 'share/corpus']) == 'sub/a.pdf'
+    assert relative_key(corpus / 'sub' / 'a.pdf', [str(corpus), '.']) == 'sub/a.pdf'
+
+
+def test_relative_key_does_not_depend_on_the_mount_point(tmp_path):
+    first = relative_key(tmp_path / 'mnt1' / 'corpus' / 'x.pdf', ['.', tmp_path / 'mnt1' / 'corpus'])
+    second = relative_key(tmp_path / 'mnt2' / 'corpus' / 'x.pdf', ['.', tmp_path / 'mnt2' / 'corpus'])
+    assert first == second == 'x.pdf'
+
+
+def test_shards_partition_the_files():
+    keys = [f'dir{i % 7}/file{i}.pdf' for i in range(200)]
+    shards = [[key for key in keys if in_shard(key, index, 4)] for index in range(1, 5)]
+    assert sorted(key for shard in shards for key in shard) == sorted(keys)
+    assert all(shards)
+
+
+def test_claim_is_exclusive_and_done_is_final(tmp_path):
+    first = WorkQueue(tmp_path, lease_time=300, node='one')
+    second = WorkQueue(tmp_path, lease_time=300, node='two')
+    assert first.claim('a.pdf')
+    assert not second.claim('a.pdf')
+    first.complete('a.pdf')
+    assert not second.claim('a.pdf')
+    assert not first.claim('a.pdf')
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    dead = WorkQueue(tmp_path, lease_time=300, node='dead')
+    alive = WorkQueue(tmp_path, lease_time=300, node='alive')
+    assert dead.claim('a.pdf') and dead.claim('b.pdf')
+    lock, _ = dead._paths('a.pdf')  # pylint: disable=protected-access
+    old = time.time() - 3600
+    os.utime(lock, (old, old))
+    assert alive.claim('a.pdf')
+    assert not alive.claim('b.pdf')